@@ -1,83 +1,254 @@
 """Run this model in Python
 
 > pip install openai
+
+Recommends the next Microsoft exam for the learner in ``passed_exams.csv`` and
+writes it to ``partials/ai-recommendation.html``.
+
+Recommendations are memoized in ``.recommendation_cache.json`` keyed by a hash
+of the normalised transcript, the priority list, the model and the prompt
+(see ``recommendation_cache.py``).  When none of those changed since an
+earlier run the partial is written straight from the cache without calling
+the model.
+
+Before calling the model the deterministic engine in ``local_recommender.py``
+ranks the priority list; its answer is used directly whenever its confidence
+reaches ``--local-threshold``, so the model is only consulted for close calls.
+
+The transcript is compacted before it is sent (``prompt_builder.py``): exam
+codes and months only, optionally limited to the most recent exams, and
+capped at ``--token-budget`` tokens.
+
+``--batch`` recommends exams for many learners concurrently; see
+``batch_recommender.py``.
 """
-import os
-from openai import OpenAI
+import argparse
 import json
+import os
+import sys
+from typing import Any, Dict, List, Optional
 
-# To authenticate with the model you will need to generate a personal access token (PAT) in your GitHub settings. 
-# Create your PAT token by following instructions here: https://docs.github.com/en/authentication/keeping-your-account-and-data-secure/managing-your-personal-access-tokens
-client = OpenAI(
-    #base_url="https://models.github.ai/inference",
-    base_url="https://models.inference.ai.azure.com",
-
-    api_key=os.environ["GITHUB_TOKEN"],
-)
-
-# Read in the text from passed_exams.csv
-with open("passed_exams.csv", "r", encoding="utf-8") as f:
-    passed_exams_text = f.read()
-
-# Read in the text from priority_ARB_exams.csv
-with open("priority_ARB_exams.csv", "r", encoding="utf-8") as f:
-    priority_exams_text = [exam.strip() for exam in f.read().strip().split(",")]
-
-response = client.chat.completions.create(
-    messages=[
-        {
-            "role": "system",
-            "content": "You are an AI assistant, which recommends the next logical Microsoft exam, based on the Microsoft learner's existing transcript. Take into account only the most recent exams when considering their next step. Also take into account current technology trends. Ensure the exam you return is not already on their transcript, as an exam can't be taken twice.",
-        },
-        {
-            "role": "user",
-            "content": passed_exams_text,
-        }
-    ],
-    model="gpt-4o",
-    temperature=0,
-    max_tokens=4096,
-    top_p=1,
-    response_format={
-        "type": "json_schema",
-        "json_schema": {
-            "name": "exam_code",
-            "schema": {
-                "type": "object",
-                "properties": {
-                    "exam_code": {
-                        "type": "string",
-                        "description": "A valid Microsoft exam code; must be one from a pre-defined list.",
-                        "enum": priority_exams_text
-                    }
-                },
-                "required": [
-                    "exam_code"
-                ],
-                "additionalProperties": False
+from exam_catalog import ExamCatalog, is_retired
+from http_client import positive_float
+from local_recommender import DEFAULT_THRESHOLD, recommend_transcript
+from metrics import add_metrics_arguments, collect, count, stage
+from prompt_builder import DEFAULT_BUDGET, build_prompt, tokenizer_name
+from recommendation_cache import (DEFAULT_CACHE_FILE, DEFAULT_MAX_ENTRIES, DEFAULT_TTL,
+                                  RecommendationCache, recommendation_key)
+
+MODEL = "gpt-4o"
+SYSTEM_PROMPT = "You are an AI assistant, which recommends the next logical Microsoft exam, based on the Microsoft learner's existing transcript. Take into account only the most recent exams when considering their next step. Also take into account current technology trends. Ensure the exam you return is not already on their transcript, as an exam can't be taken twice."
+PARTIAL_PATH = "partials/ai-recommendation.html"
+
+
+def create_client():
+    """Create the OpenAI client for GitHub Models.
+
+    ``openai`` is imported here so that cache hits never pay for the import.
+    """
+    from openai import OpenAI
+
+    # To authenticate with the model you will need to generate a personal access token (PAT) in your GitHub settings.
+    # Create your PAT token by following instructions here: https://docs.github.com/en/authentication/keeping-your-account-and-data-secure/managing-your-personal-access-tokens
+    return OpenAI(
+        #base_url="https://models.github.ai/inference",
+        base_url="https://models.inference.ai.azure.com",
+
+        api_key=os.environ["GITHUB_TOKEN"],
+    )
+
+
+def read_priority_exams(path: str = "priority_ARB_exams.csv") -> List[str]:
+    """Read the comma-separated priority exam list, dropping retired exams."""
+    with open(path, "r", encoding="utf-8") as f:
+        priority_exams_text = [exam.strip() for exam in f.read().strip().split(",")]
+
+    # Never offer an exam that has been retired, even if the priority list is stale
+    return [exam for exam in priority_exams_text if not is_retired(exam)]
+
+
+def build_request(passed_exams_text: str, priority_exams_text: List[str], model: str = MODEL,
+                  system_prompt: str = SYSTEM_PROMPT) -> Dict[str, Any]:
+    """Return the chat completion arguments recommending one exam for a transcript."""
+    return dict(
+        messages=[
+            {
+                "role": "system",
+                "content": system_prompt,
             },
-            "strict": True
+            {
+                "role": "user",
+                "content": passed_exams_text,
+            }
+        ],
+        model=model,
+        temperature=0,
+        max_tokens=4096,
+        top_p=1,
+        response_format={
+            "type": "json_schema",
+            "json_schema": {
+                "name": "exam_code",
+                "schema": {
+                    "type": "object",
+                    "properties": {
+                        "exam_code": {
+                            "type": "string",
+                            "description": "A valid Microsoft exam code; must be one from a pre-defined list.",
+                            "enum": priority_exams_text
+                        }
+                    },
+                    "required": [
+                        "exam_code"
+                    ],
+                    "additionalProperties": False
+                },
+                "strict": True
+            }
         }
-    }
-)
-
-# Get the response content and parse it
-response_content = response.choices[0].message.content
-print(response_content)
-
-# Parse the JSON response and update the partial file
-try:
-    recommendation_data = json.loads(response_content)
-    exam_code = recommendation_data.get("exam_code", "-")
-    
-    # Update the partial file with the exam code
-    with open("partials/ai-recommendation.html", "w", encoding="utf-8") as f:
+    )
+
+
+def request_recommendation(client, passed_exams_text: str, priority_exams_text: List[str],
+                           model: str = MODEL, system_prompt: str = SYSTEM_PROMPT) -> str:
+    """Ask the model for the next exam and return the raw JSON response content."""
+    response = client.chat.completions.create(
+        **build_request(passed_exams_text, priority_exams_text, model, system_prompt)
+    )
+    return response.choices[0].message.content
+
+
+def write_partial(exam_code: str, path: str = PARTIAL_PATH) -> None:
+    """Write the recommended exam code into the dashboard partial."""
+    with open(path, "w", encoding="utf-8") as f:
         f.write(f'<span id="ai-recommendation">{exam_code}</span>')
-    
-    print(f"Updated partials/ai-recommendation.html with exam code: {exam_code}")
-    
-except (json.JSONDecodeError, KeyError) as e:
-    print(f"Error parsing recommendation response: {e}")
-    # Keep the default "-" in case of error
-    with open("partials/ai-recommendation.html", "w", encoding="utf-8") as f:
-        f.write('<span id="ai-recommendation">-</span>')
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    # Imported here because batch_recommender imports this module
+    from batch_recommender import DEFAULT_CONCURRENCY, DEFAULT_RPM, DEFAULT_TPM
+
+    parser = argparse.ArgumentParser(description="Recommend the next Microsoft exam for a learner.")
+    parser.add_argument("--transcript", default="passed_exams.csv", help="Passed exams CSV (default: passed_exams.csv)")
+    parser.add_argument("--priority", default="priority_ARB_exams.csv",
+                        help="Comma-separated list of exams that may be recommended (default: priority_ARB_exams.csv)")
+    parser.add_argument("--output", default=PARTIAL_PATH, help=f"Partial to write (default: {PARTIAL_PATH})")
+    parser.add_argument("--model", default=MODEL, help=f"Model name (default: {MODEL})")
+    parser.add_argument("--cache-file", default=DEFAULT_CACHE_FILE,
+                        help=f"Recommendation cache file (default: {DEFAULT_CACHE_FILE})")
+    parser.add_argument("--cache-ttl", type=float, default=DEFAULT_TTL,
+                        help="Seconds a cached recommendation stays valid (default: thirty days)")
+    parser.add_argument("--cache-max-entries", type=int, default=DEFAULT_MAX_ENTRIES,
+                        help=f"Cached recommendations kept, least recently used evicted first (default: {DEFAULT_MAX_ENTRIES})")
+    parser.add_argument("--no-cache", action="store_true", help="Always call the model")
+    parser.add_argument("--local-threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help=f"Confidence at which the local engine's answer is used without calling the model; "
+                             f"above 1 always calls the model (default: {DEFAULT_THRESHOLD})")
+    compaction = parser.add_argument_group("prompt compaction", "Shrink the transcript sent to the model (see prompt_builder.py)")
+    compaction.add_argument("--token-budget", type=int, default=DEFAULT_BUDGET,
+                            help=f"Maximum prompt tokens; the oldest exams are dropped to fit (default: {DEFAULT_BUDGET})")
+    compaction.add_argument("--recent", type=int, help="Only send the N most recent exams")
+    compaction.add_argument("--window-days", type=int, help="Only send exams passed in the last N days")
+    compaction.add_argument("--no-compact", action="store_true", help="Send the raw transcript CSV")
+    batch = parser.add_argument_group("batch mode", "Recommend exams for many learners at once (see batch_recommender.py)")
+    batch.add_argument("--batch", metavar="PATH",
+                       help="Directory of passed_exams_<id>.csv files or a combined CSV with a 'Share ID' column")
+    batch.add_argument("--batch-output", default="recommendations.csv",
+                       help="CSV of Learner, Exam Code, Status (default: recommendations.csv)")
+    batch.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY,
+                       help=f"Requests in flight at once (default: {DEFAULT_CONCURRENCY})")
+    batch.add_argument("--rpm", type=positive_float, default=DEFAULT_RPM,
+                       help=f"Requests-per-minute budget (default: {DEFAULT_RPM})")
+    batch.add_argument("--tpm", type=positive_float, default=DEFAULT_TPM,
+                       help=f"Tokens-per-minute budget (default: {DEFAULT_TPM})")
+    batch.add_argument("--pack", type=int, default=1,
+                       help="Learners packed into one structured request (default: 1, one request per learner)")
+    add_metrics_arguments(parser)
+    args = parser.parse_args(argv)
+
+    with collect(args, "ai_exam_recommender"):
+        return run(args)
+
+
+def run(args: argparse.Namespace) -> int:
+    """Recommend an exam for the parsed command line arguments."""
+    cache = None if args.no_cache else RecommendationCache(args.cache_file, args.cache_ttl, args.cache_max_entries)
+    prompt_options = dict(model=args.model, budget=args.token_budget, recent=args.recent,
+                          window_days=args.window_days, compact=not args.no_compact)
+
+    if args.batch:
+        from batch_recommender import run_batch
+
+        with stage("recommend.batch"):
+            return run_batch(args.batch, args.batch_output, read_priority_exams(args.priority), args.model, cache,
+                             args.concurrency, args.rpm, args.tpm, args.pack, args.local_threshold, prompt_options)
+
+    # Read in the text from passed_exams.csv
+    with open(args.transcript, "r", encoding="utf-8") as f:
+        passed_exams_text = f.read()
+
+    # Read in the text from priority_ARB_exams.csv
+    priority_exams_text = read_priority_exams(args.priority)
+
+    with stage("recommend.prompt"):
+        prompt = build_prompt(SYSTEM_PROMPT, passed_exams_text, priority_exams_text, **prompt_options)
+    if not prompt.candidates:
+        # An empty enum is not a valid schema, and there is nothing to choose from anyway
+        print("Every priority exam is already passed; nothing to recommend")
+        write_partial("-", args.output)
+        print(f"Updated {args.output} with exam code: -")
+        return 0
+    count("prompt_tokens", prompt.tokens)
+    print(f"Prompt size: {prompt.original_tokens} -> {prompt.tokens} tokens ({tokenizer_name(args.model)})")
+    key = recommendation_key(prompt.user, prompt.candidates, args.model, prompt.system)
+    exam_code = cache.get(key) if cache else None
+    local = None
+    if not exam_code:
+        with stage("recommend.local"):
+            local = recommend_transcript(passed_exams_text, priority_exams_text)
+    if exam_code:
+        count("recommendations_cached")
+        print(f"Recommendation cache hit: {exam_code}")
+    elif local.confidence >= args.local_threshold:
+        exam_code = local.exam_code
+        count("recommendations_local")
+        print(f"Local recommendation: {exam_code} (confidence {local.confidence:.2f})")
+    else:
+        print(f"Local recommendation {local.exam_code} below threshold "
+              f"(confidence {local.confidence:.2f} < {args.local_threshold}), asking the model")
+        # Get the response content and parse it
+        with stage("recommend.model"):
+            response_content = request_recommendation(create_client(), prompt.user, prompt.candidates, args.model,
+                                                      prompt.system)
+        count("recommendations_model")
+        print(response_content)
+
+        # Parse the JSON response
+        try:
+            recommendation_data = json.loads(response_content)
+            exam_code = recommendation_data.get("exam_code", "-")
+        except (json.JSONDecodeError, KeyError, AttributeError) as e:
+            print(f"Error parsing recommendation response: {e}")
+            # Keep the default "-" in case of error
+            write_partial("-", args.output)
+            return 0
+        if cache is not None and exam_code != "-":
+            cache.put(key, exam_code)
+
+    if cache is not None:
+        cache.save()
+
+    # Update the partial file with the exam code
+    write_partial(exam_code, args.output)
+    print(f"Updated {args.output} with exam code: {exam_code}")
+
+    # Enrich the log with the exam title when a catalog snapshot is on disk
+    catalog = ExamCatalog.load(offline=True)
+    exam = catalog.get(exam_code) if catalog else None
+    if exam:
+        print(f"{exam_code}: {exam.get('title')}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,336 @@
+#!/usr/bin/env python3
+"""
+Batch exam recommendations for many learners (``ai_exam_recommender.py --batch``).
+
+Transcripts are read either from a directory of ``passed_exams_<learner>.csv``
+files (as written by ``passed_exams.py --bulk --output-dir``) or from one
+combined CSV with a ``Share ID`` column (``passed_exams.py --bulk --output``).
+Learners whose inputs are in the recommendation cache, or for whom the local
+engine (``local_recommender.py``) is confident enough, are answered
+immediately; the rest are sent to the model concurrently through
+``AsyncOpenAI``:
+
+- at most ``concurrency`` requests are in flight at once
+- a requests-per-minute and tokens-per-minute budget is enforced before each
+  request is sent
+- ``429 Too Many Requests`` responses are retried with jittered exponential
+  backoff, honouring ``Retry-After`` when the service sends it
+
+With ``pack`` greater than one, several learners share a single structured
+output call, which cuts round trips at the cost of larger prompts.  Learners
+missing from a packed answer are retried on their own.
+
+Results for every learner are written to one CSV with the columns
+``Learner``, ``Exam Code`` and ``Status`` (``cached``, ``local``, ``model``
+or ``failed``).
+"""
+import asyncio
+import csv
+import io
+import json
+import os
+import random
+import sys
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from ai_exam_recommender import MODEL, SYSTEM_PROMPT, build_request
+from local_recommender import recommend_transcript
+from prompt_builder import Prompt, build_prompt
+from recommendation_cache import RecommendationCache, recommendation_key
+from records import ExamRecord
+
+DEFAULT_CONCURRENCY = 8
+DEFAULT_RPM = 15
+DEFAULT_TPM = 150000
+DEFAULT_MAX_RETRIES = 5
+# Rough upper bound of the structured answer for one learner
+COMPLETION_TOKENS_PER_LEARNER = 20
+
+PACKED_NOTE = " You will receive the transcripts of several learners, each introduced by a line 'Learner: <id>'. Return one recommendation for every learner."
+
+
+def load_transcripts(source: str) -> Dict[str, str]:
+    """Read per-learner transcript CSV text from a directory or a combined CSV.
+
+    :param source: Directory of ``passed_exams_<learner>.csv`` files, or a CSV
+        with ``Share ID``, ``Exam Title``, ``Exam Number`` and ``Exam Date`` columns
+    :return: Mapping of learner ID to transcript CSV text, in input order
+    """
+    transcripts: Dict[str, str] = {}
+    if os.path.isdir(source):
+        for name in sorted(os.listdir(source)):
+            if not name.endswith(".csv"):
+                continue
+            learner = name[:-len(".csv")]
+            if learner.startswith("passed_exams_"):
+                learner = learner[len("passed_exams_"):]
+            with open(os.path.join(source, name), encoding="utf-8") as f:
+                transcripts[learner] = f.read()
+        return transcripts
+
+    rows: Dict[str, List[Dict[str, str]]] = {}
+    with open(source, encoding="utf-8", newline="") as f:
+        for row in csv.DictReader(f):
+            rows.setdefault(row["Share ID"], []).append(row)
+    for learner, learner_rows in rows.items():
+        # Same layout as the per-learner passed_exams.csv written by passed_exams.py
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=ExamRecord.fieldnames(), extrasaction="ignore")
+        writer.writeheader()
+        writer.writerows(learner_rows)
+        transcripts[learner] = buffer.getvalue()
+    return transcripts
+
+
+class AsyncRateLimiter:
+    """Requests-per-minute and tokens-per-minute budget shared by concurrent tasks.
+
+    Both budgets refill continuously, so requests are spread evenly over the
+    minute instead of bursting at its start.
+    """
+
+    def __init__(self, rpm: float, tpm: float) -> None:
+        self.rpm = rpm
+        self.tpm = tpm
+        self._requests = float(rpm)
+        self._tokens = float(tpm)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        elapsed = now - self._updated
+        self._updated = now
+        self._requests = min(self.rpm, self._requests + elapsed * self.rpm / 60)
+        self._tokens = min(self.tpm, self._tokens + elapsed * self.tpm / 60)
+
+    async def acquire(self, tokens: int) -> None:
+        """Wait until one request and ``tokens`` tokens fit in the budget, then spend them."""
+        # A request larger than the whole budget would otherwise wait forever
+        tokens = min(tokens, int(self.tpm))
+        async with self._lock:
+            while True:
+                self._refill()
+                if self._requests >= 1 and self._tokens >= tokens:
+                    self._requests -= 1
+                    self._tokens -= tokens
+                    return
+                wait = max((1 - self._requests) * 60 / self.rpm,
+                           (tokens - self._tokens) * 60 / self.tpm)
+                await asyncio.sleep(max(wait, 0.01))
+
+
+def _retry_after(error: Exception) -> Optional[float]:
+    response = getattr(error, "response", None)
+    value = response.headers.get("retry-after") if response is not None else None
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+async def _complete(client, limiter: AsyncRateLimiter, semaphore: asyncio.Semaphore,
+                    request: Dict[str, Any], tokens: int, max_retries: int) -> str:
+    """Send one chat completion within the budgets, retrying rate-limited attempts."""
+    from openai import RateLimitError
+
+    attempt = 0
+    while True:
+        await limiter.acquire(tokens)
+        async with semaphore:
+            try:
+                response = await client.chat.completions.create(**request)
+                return response.choices[0].message.content
+            except RateLimitError as e:
+                if attempt >= max_retries:
+                    raise
+                delay = _retry_after(e)
+                if delay is None:
+                    delay = min(60.0, 2 ** attempt) * (0.5 + random.random())
+        # Sleep outside the semaphore so other learners can use the slot
+        attempt += 1
+        await asyncio.sleep(delay)
+
+
+def build_packed_request(prompts: Dict[str, Prompt], model: str = MODEL) -> Dict[str, Any]:
+    """Return chat completion arguments recommending one exam for each of several learners.
+
+    The allowed answers are the union of the learners' candidates; answers
+    outside a learner's own candidates are rejected by ``recommend_batch``.
+    """
+    first = next(iter(prompts.values()))
+    allowed = list(dict.fromkeys(exam for prompt in prompts.values() for exam in prompt.candidates))
+    request = build_request("", allowed, model)
+    request["messages"] = [
+        {"role": "system", "content": first.system + PACKED_NOTE},
+        {"role": "user", "content": "\n".join(
+            f"Learner: {learner}\n{prompt.user.strip()}\n" for learner, prompt in prompts.items()
+        )},
+    ]
+    request["response_format"] = {
+        "type": "json_schema",
+        "json_schema": {
+            "name": "exam_codes",
+            "schema": {
+                "type": "object",
+                "properties": {
+                    "recommendations": {
+                        "type": "array",
+                        "items": {
+                            "type": "object",
+                            "properties": {
+                                "learner": {"type": "string", "enum": list(prompts)},
+                                "exam_code": {
+                                    "type": "string",
+                                    "description": "A valid Microsoft exam code; must be one from a pre-defined list.",
+                                    "enum": allowed,
+                                },
+                            },
+                            "required": ["learner", "exam_code"],
+                            "additionalProperties": False,
+                        },
+                    }
+                },
+                "required": ["recommendations"],
+                "additionalProperties": False,
+            },
+            "strict": True,
+        },
+    }
+    return request
+
+
+async def recommend_batch(client, prompts: Dict[str, Prompt], model: str = MODEL, concurrency: int = DEFAULT_CONCURRENCY,
+                          rpm: float = DEFAULT_RPM, tpm: float = DEFAULT_TPM, pack: int = 1,
+                          max_retries: int = DEFAULT_MAX_RETRIES) -> Dict[str, Tuple[str, Optional[str]]]:
+    """Recommend an exam for every learner, issuing requests concurrently.
+
+    :param client: ``AsyncOpenAI``-compatible client
+    :param prompts: Mapping of learner ID to the prompt built by ``prompt_builder.build_prompt``
+    :param model: Model name
+    :param concurrency: Maximum requests in flight
+    :param rpm: Requests-per-minute budget
+    :param tpm: Tokens-per-minute budget
+    :param pack: Learners per request; 1 sends one request per learner
+    :param max_retries: Retries of a rate-limited request
+    :return: Mapping of learner ID to ``(exam_code, error)``; ``exam_code`` is "-" on error
+    """
+    limiter = AsyncRateLimiter(rpm, tpm)
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    results: Dict[str, Tuple[str, Optional[str]]] = {}
+
+    async def single(learner: str) -> None:
+        prompt = prompts[learner]
+        request = build_request(prompt.user, prompt.candidates, model, prompt.system)
+        try:
+            content = await _complete(client, limiter, semaphore, request,
+                                      prompt.tokens + COMPLETION_TOKENS_PER_LEARNER, max_retries)
+            results[learner] = (json.loads(content).get("exam_code", "-"), None)
+        except Exception as e:
+            results[learner] = ("-", f"{type(e).__name__}: {e}")
+
+    async def packed(learners: List[str]) -> None:
+        group = {learner: prompts[learner] for learner in learners}
+        request = build_packed_request(group, model)
+        # Each learner's prompt size includes the shared instructions, so this errs on the safe side
+        tokens = sum(prompt.tokens + COMPLETION_TOKENS_PER_LEARNER for prompt in group.values())
+        try:
+            content = await _complete(client, limiter, semaphore, request, tokens, max_retries)
+            for item in json.loads(content).get("recommendations", []):
+                learner = item.get("learner")
+                if (learner in group and learner not in results
+                        and item.get("exam_code") in group[learner].candidates):
+                    results[learner] = (item["exam_code"], None)
+        except Exception as e:
+            print(f"Packed request for {len(learners)} learners failed, retrying individually: {e}",
+                  file=sys.stderr)
+        await asyncio.gather(*(single(learner) for learner in learners if learner not in results))
+
+    learners = list(prompts)
+    if pack > 1:
+        groups = [learners[i:i + pack] for i in range(0, len(learners), pack)]
+        await asyncio.gather(*(packed(group) for group in groups))
+    else:
+        await asyncio.gather(*(single(learner) for learner in learners))
+    return results
+
+
+def create_async_client(max_retries: int = 0):
+    """Create the async OpenAI client for GitHub Models; 429 retries are handled here instead."""
+    from openai import AsyncOpenAI
+
+    return AsyncOpenAI(
+        base_url="https://models.inference.ai.azure.com",
+        api_key=os.environ["GITHUB_TOKEN"],
+        max_retries=max_retries,
+    )
+
+
+def run_batch(source: str, output: str, priority_exams: List[str], model: str = MODEL,
+              cache: Optional[RecommendationCache] = None, concurrency: int = DEFAULT_CONCURRENCY,
+              rpm: float = DEFAULT_RPM, tpm: float = DEFAULT_TPM, pack: int = 1,
+              local_threshold: Optional[float] = None, prompt_options: Optional[Dict[str, Any]] = None) -> int:
+    """Recommend exams for every learner in ``source`` and write them to ``output``.
+
+    Learners whose local recommendation reaches ``local_threshold`` are not
+    sent to the model; None sends every cache miss to the model.
+    ``prompt_options`` are passed on to ``prompt_builder.build_prompt``.
+
+    :return: Process exit code; 1 if any learner failed
+    """
+    transcripts = load_transcripts(source)
+    if not transcripts:
+        print(f"No transcripts found in {source}", file=sys.stderr)
+        return 1
+
+    results: Dict[str, Tuple[str, str]] = {}
+    prompts = {learner: build_prompt(SYSTEM_PROMPT, text, priority_exams, **(prompt_options or {"model": model}))
+               for learner, text in transcripts.items()}
+    keys = {learner: recommendation_key(prompt.user, prompt.candidates, model, prompt.system)
+            for learner, prompt in prompts.items()}
+    pending: Dict[str, Prompt] = {}
+    for learner, text in transcripts.items():
+        if not prompts[learner].candidates:
+            # Every priority exam is passed; an empty enum is not a valid request
+            results[learner] = ("-", "local")
+            continue
+        exam_code = cache.get(keys[learner]) if cache else None
+        local = (recommend_transcript(text, priority_exams)
+                 if not exam_code and local_threshold is not None else None)
+        if exam_code:
+            results[learner] = (exam_code, "cached")
+        elif local is not None and local.confidence >= local_threshold:
+            results[learner] = (local.exam_code, "local")
+        else:
+            pending[learner] = prompts[learner]
+
+    failures = 0
+    if pending:
+        original = sum(prompt.original_tokens for prompt in pending.values())
+        compacted = sum(prompt.tokens for prompt in pending.values())
+        print(f"Prompt size for {len(pending)} learners: {original} -> {compacted} tokens")
+        answers = asyncio.run(recommend_batch(create_async_client(), pending, model,
+                                              concurrency, rpm, tpm, pack))
+        for learner, (exam_code, error) in answers.items():
+            if error:
+                failures += 1
+                print(f"[{learner}] {error}", file=sys.stderr)
+                results[learner] = ("-", "failed")
+            else:
+                results[learner] = (exam_code, "model")
+                if cache is not None and exam_code != "-":
+                    cache.put(keys[learner], exam_code)
+    if cache is not None:
+        cache.save()
+
+    with open(output, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["Learner", "Exam Code", "Status"])
+        for learner in transcripts:
+            writer.writerow([learner, *results[learner]])
+    statuses = [status for _, status in results.values()]
+    print(f"Wrote recommendations for {len(transcripts)} learners to {output} "
+          f"({statuses.count('cached')} cached, {statuses.count('local')} local, "
+          f"{statuses.count('model')} from the model, {failures} failed)")
+    return 1 if failures else 0
@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+"""
+Measure how the fetchers scale, without network access.
+
+Every stage runs in its own child process against synthetic data, so its peak
+RSS is its own; the network stages run the real scripts against the local
+stub server (``stub_server.py``) through ``LEARN_BASE_URL`` and
+``CREDLY_BASE_URL``.  For each record count the report lists the stage wall
+time, records per second, peak RSS and the child process wall time.
+
+    python benchmarks/pipeline_bench.py                              # 10, 1000 and 100000 records
+    python benchmarks/pipeline_bench.py --scales 10 1e6 --stages extract_badges write_csv
+    python benchmarks/pipeline_bench.py --latency-ms 20 --output bench.json
+    python benchmarks/pipeline_bench.py --baseline bench.json        # exit 1 on regressions
+
+Stages:
+
+    extract_passed_exams   json.loads + passed_exams.extract_passed_exams
+    extract_badges         json.loads + fetch_credly_badges.extract_badges
+    write_csv              fetch_mslearn_credentials.write_csv (flatten_record per row) of a lazy catalog
+    passed_exams           passed_exams.py against the stub
+    passed_exams_stream    passed_exams.py --stream against the stub
+    fetch_credly_badges    fetch_credly_badges.py against the stub
+    fetch_credentials      fetch_mslearn_credentials.py paging through the stub catalog
+    certification_progress certification_progress.ProgressIndex over a 5000 credential catalog,
+                           for learners of 10 exams each
+    generate_timelines     generate_timelines.py rendering bundles for learners of 20 exams and
+                           10 badges each on a process pool, then an unchanged rerun
+"""
+import argparse
+import contextlib
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import synthetic  # noqa: E402
+from stub_server import StubData, StubServer  # noqa: E402
+
+DEFAULT_SCALES = [10, 1000, 100000]
+DEFAULT_TOLERANCE = 0.25
+DEFAULT_PAGE_SIZE = 100
+PROGRESS_CATALOG_SIZE = 5000
+PROGRESS_EXAMS_PER_LEARNER = 10
+TIMELINE_EXAMS_PER_LEARNER = 20
+TIMELINE_BADGES_PER_LEARNER = 10
+
+
+def _extract_passed_exams(records: int, workdir: str, args: argparse.Namespace) -> int:
+    from passed_exams import extract_passed_exams
+
+    body = json.dumps(synthetic.transcript(records))
+    with _timer():
+        return len(extract_passed_exams(json.loads(body)))
+
+
+def _extract_badges(records: int, workdir: str, args: argparse.Namespace) -> int:
+    from fetch_credly_badges import extract_badges
+
+    body = json.dumps(synthetic.badge_feed(records))
+    with _timer():
+        return len(extract_badges(json.loads(body)))
+
+
+def _write_csv(records: int, workdir: str, args: argparse.Namespace) -> int:
+    from fetch_mslearn_credentials import write_csv
+
+    # Records are generated lazily, as pages arrive in a real crawl; generation is part of the timing
+    with _timer():
+        return write_csv(synthetic.credentials(records), os.path.join(workdir, "credentials.csv"))
+
+
+def _passed_exams(records: int, workdir: str, args: argparse.Namespace, stream: bool = False) -> int:
+    import passed_exams
+
+    output = os.path.join(workdir, "passed_exams.csv")
+    argv = ["bench", "--output", output, "--no-cache", "--path-hint", os.path.join(workdir, "hint.json")]
+    with _timer():
+        if passed_exams.main(argv + (["--stream"] if stream else [])) != 0:
+            raise RuntimeError("passed_exams.py failed")
+    return _csv_rows(output)
+
+
+def _fetch_credly_badges(records: int, workdir: str, args: argparse.Namespace) -> int:
+    import fetch_credly_badges
+
+    output = os.path.join(workdir, "credly_badges.csv")
+    with _timer():
+        if fetch_credly_badges.main(["bench", "--output", output, "--no-cache"]) != 0:
+            raise RuntimeError("fetch_credly_badges.py failed")
+    return _csv_rows(output)
+
+
+def _fetch_credentials(records: int, workdir: str, args: argparse.Namespace) -> int:
+    import fetch_mslearn_credentials
+
+    output = os.path.join(workdir, "credentials.csv")
+    with _timer():
+        fetch_mslearn_credentials.main(["--output", output, "--no-cache", "--page-size", str(args.page_size),
+                                        "--max-workers", str(args.max_workers)])
+    return _csv_rows(output)
+
+
+def _certification_progress(records: int, workdir: str, args: argparse.Namespace) -> int:
+    from certification_progress import ProgressIndex
+
+    rng = random.Random(0)
+    pool = [synthetic.exam_code(i) for i in range(PROGRESS_CATALOG_SIZE)]
+    learners = {f"learner-{i}": rng.sample(pool, PROGRESS_EXAMS_PER_LEARNER)
+                for i in range(max(1, records // PROGRESS_EXAMS_PER_LEARNER))}
+    catalog = list(synthetic.credentials(PROGRESS_CATALOG_SIZE))
+    with _timer():
+        index = ProgressIndex(catalog)
+        for _ in index.bulk(learners):
+            pass
+    return len(learners) * PROGRESS_EXAMS_PER_LEARNER
+
+
+def _generate_timelines(records: int, workdir: str, args: argparse.Namespace) -> int:
+    from fetch_credly_badges import iter_badges, write_combined_csv as write_badges
+    from generate_timelines import main as generate_timelines
+    from passed_exams import iter_exams, write_combined_csv as write_exams
+
+    learners = [f"learner-{i}" for i in range(max(1, records // TIMELINE_EXAMS_PER_LEARNER))]
+    exams_path = os.path.join(workdir, "transcripts.csv")
+    badges_path = os.path.join(workdir, "badges.csv")
+    write_exams(((learner, list(iter_exams(synthetic.transcript(TIMELINE_EXAMS_PER_LEARNER, seed)
+                                           ["certificationData"]["passedExams"])))
+                 for seed, learner in enumerate(learners)), exams_path)
+    write_badges(((learner, list(iter_badges([synthetic.badge_feed(TIMELINE_BADGES_PER_LEARNER, seed)])))
+                  for seed, learner in enumerate(learners)), badges_path)
+    argv = ["--exams", exams_path, "--badges", badges_path, "--output-dir", os.path.join(workdir, "sites")]
+    with _timer():
+        generate_timelines(argv)
+        generate_timelines(argv)
+    return len(learners) * TIMELINE_EXAMS_PER_LEARNER
+
+
+STAGES: Dict[str, Callable[[int, str, argparse.Namespace], int]] = {
+    "extract_passed_exams": _extract_passed_exams,
+    "extract_badges": _extract_badges,
+    "write_csv": _write_csv,
+    "passed_exams": _passed_exams,
+    "passed_exams_stream": lambda records, workdir, args: _passed_exams(records, workdir, args, stream=True),
+    "fetch_credly_badges": _fetch_credly_badges,
+    "fetch_credentials": _fetch_credentials,
+    "certification_progress": _certification_progress,
+    "generate_timelines": _generate_timelines,
+}
+
+_timings: List[float] = []
+
+
+@contextlib.contextmanager
+def _timer():
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        _timings.append(time.perf_counter() - start)
+
+
+def _csv_rows(path: str) -> int:
+    if not os.path.exists(path):
+        return 0
+    with open(path, encoding="utf-8") as f:
+        return max(0, sum(1 for _ in f) - 1)
+
+
+def run_worker(args: argparse.Namespace) -> int:
+    """Run one stage in this process and print its record count and seconds as JSON."""
+    with tempfile.TemporaryDirectory() as workdir, contextlib.redirect_stdout(sys.stderr):
+        count = STAGES[args.worker](args.records, workdir, args)
+    print(json.dumps({"records": count, "seconds": sum(_timings)}))
+    return 0
+
+
+def _peak_rss_mib(rusage: Any) -> float:
+    # ru_maxrss is in KiB on Linux and in bytes on macOS
+    return rusage.ru_maxrss / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+def run_stage(stage: str, records: int, base_url: str, args: argparse.Namespace) -> Dict[str, Any]:
+    """Run ``stage`` for ``records`` records in a child process and return its measurements."""
+    env = dict(os.environ, LEARN_BASE_URL=base_url, CREDLY_BASE_URL=base_url, PYTHONHASHSEED="0")
+    command = [sys.executable, os.path.abspath(__file__), "--worker", stage, "--records", str(records),
+               "--page-size", str(args.page_size), "--max-workers", str(args.max_workers)]
+    start = time.perf_counter()
+    proc = subprocess.Popen(command, env=env, stdout=subprocess.PIPE,
+                            stderr=None if args.verbose else subprocess.DEVNULL, text=True)
+    out = proc.stdout.read()
+    peak_rss = None
+    if hasattr(os, "wait4"):
+        _, status, rusage = os.wait4(proc.pid, 0)
+        returncode = os.waitstatus_to_exitcode(status)
+        proc.returncode = returncode
+        peak_rss = round(_peak_rss_mib(rusage), 1)
+    else:
+        returncode = proc.wait()
+    process_seconds = time.perf_counter() - start
+    if returncode != 0 or not out.strip():
+        return {"stage": stage, "scale": records, "error": f"exit code {returncode}"}
+    result = json.loads(out.strip().splitlines()[-1])
+    seconds = result["seconds"]
+    return {
+        "stage": stage,
+        "scale": records,
+        "records": result["records"],
+        "seconds": round(seconds, 4),
+        "records_per_second": round(result["records"] / seconds) if seconds else None,
+        "peak_rss_mib": peak_rss,
+        "process_seconds": round(process_seconds, 3),
+    }
+
+
+def compare(results: List[Dict[str, Any]], baseline: List[Dict[str, Any]], tolerance: float) -> List[str]:
+    """Return a message for every stage that got slower or larger than ``baseline`` by more than ``tolerance``."""
+    previous = {(row["stage"], row["scale"]): row for row in baseline if "error" not in row}
+    regressions = []
+    for row in results:
+        before = previous.get((row["stage"], row["scale"]))
+        if before is None or "error" in row:
+            continue
+        if before.get("records_per_second") and row["records_per_second"] is not None \
+                and row["records_per_second"] < before["records_per_second"] * (1 - tolerance):
+            regressions.append(f"{row['stage']} @ {row['scale']}: {row['records_per_second']} records/s, "
+                               f"was {before['records_per_second']}")
+        if before.get("peak_rss_mib") and row["peak_rss_mib"] is not None \
+                and row["peak_rss_mib"] > before["peak_rss_mib"] * (1 + tolerance):
+            regressions.append(f"{row['stage']} @ {row['scale']}: peak RSS {row['peak_rss_mib']} MiB, "
+                               f"was {before['peak_rss_mib']} MiB")
+    return regressions
+
+
+def print_table(results: List[Dict[str, Any]]) -> None:
+    print(f"{'stage':<22} {'scale':>9} {'records':>9} {'wall s':>9} {'records/s':>11} {'peak MiB':>9} {'proc s':>8}")
+    for row in results:
+        if "error" in row:
+            print(f"{row['stage']:<22} {row['scale']:>9} {row['error']}")
+            continue
+        print(f"{row['stage']:<22} {row['scale']:>9} {row['records']:>9} {row['seconds']:>9.4f} "
+              f"{row['records_per_second'] or '-':>11} {row['peak_rss_mib'] or '-':>9} {row['process_seconds']:>8.3f}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the fetchers offline against synthetic data.")
+    parser.add_argument("--scales", nargs="+", type=synthetic.count_arg, default=DEFAULT_SCALES,
+                        help=f"Record counts to run, {synthetic.MIN_RECORDS} to {synthetic.MAX_RECORDS:,} "
+                             f"(default: {' '.join(map(str, DEFAULT_SCALES))})")
+    parser.add_argument("--stages", nargs="+", choices=list(STAGES), default=list(STAGES),
+                        help="Stages to run (default: all)")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Stub server delay per response")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="Extra random stub delay of up to this much")
+    parser.add_argument("--page-size", type=int, default=DEFAULT_PAGE_SIZE,
+                        help=f"Credentials page size for fetch_credentials (default: {DEFAULT_PAGE_SIZE})")
+    parser.add_argument("--max-workers", type=int, default=4, help="Concurrent credential pages (default: 4)")
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    parser.add_argument("--baseline", help="Results JSON of an earlier run; exit 1 if a stage regressed")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help=f"Allowed throughput drop / RSS growth against --baseline (default: {DEFAULT_TOLERANCE})")
+    parser.add_argument("--verbose", action="store_true", help="Show the output of the stage processes")
+    parser.add_argument("--worker", choices=list(STAGES), help=argparse.SUPPRESS)
+    parser.add_argument("--records", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.worker:
+        return run_worker(args)
+
+    results = []
+    for scale in args.scales:
+        data = StubData(scale, scale, scale, args.latency_ms / 1000, args.jitter_ms / 1000)
+        with StubServer(data) as server:
+            for stage in args.stages:
+                results.append(run_stage(stage, scale, server.base_url, args))
+    print_table(results)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    failed = [row for row in results if "error" in row]
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for message in regressions:
+            print(f"Regression: {message}", file=sys.stderr)
+        if regressions:
+            return 1
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
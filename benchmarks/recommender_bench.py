@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Compare the local recommendation engine with the model.
+
+For every transcript the local engine is timed and, when a model answer is
+available, the two answers are compared.  Model answers come either from an
+earlier ``ai_exam_recommender.py --batch`` output (``--reference``, no API
+calls) or from live requests (``--model-calls N``, needs ``GITHUB_TOKEN``).
+
+    python benchmarks/recommender_bench.py --synthetic 1000
+    python benchmarks/recommender_bench.py --transcripts transcripts/ --reference recommendations.csv
+    python benchmarks/recommender_bench.py --model-calls 20
+"""
+import argparse
+import csv
+import json
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import date, timedelta
+from typing import Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ai_exam_recommender import SYSTEM_PROMPT, create_client, read_priority_exams, request_recommendation  # noqa: E402
+from batch_recommender import load_transcripts  # noqa: E402
+from local_recommender import DEFAULT_THRESHOLD, PROGRESSION, recommend_transcript  # noqa: E402
+from prompt_builder import build_prompt  # noqa: E402
+
+
+def synthetic_transcripts(count: int, seed: int = 0) -> Dict[str, str]:
+    """Generate transcripts by walking ``PROGRESSION`` from random starting exams."""
+    rng = random.Random(seed)
+    starts = sorted(PROGRESSION)
+    transcripts = {}
+    for i in range(count):
+        code = rng.choice(starts)
+        day = date(2019, 1, 1) + timedelta(days=rng.randrange(1500))
+        rows = ["Exam Title,Exam Number,Exam Date"]
+        for _ in range(rng.randint(1, 8)):
+            rows.append(f"Exam {code},{code},{day.isoformat()}")
+            follow_on = PROGRESSION.get(code) or starts
+            code = rng.choice(follow_on)
+            day += timedelta(days=rng.randrange(10, 300))
+        transcripts[f"synthetic-{i}"] = "\n".join(rows) + "\n"
+    return transcripts
+
+
+def percentile(values: List[float], q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))] if values else 0.0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark local vs model exam recommendations.")
+    parser.add_argument("--transcripts", help="Directory of passed_exams_<id>.csv files or combined CSV "
+                                              "(default: passed_exams.csv as a single learner)")
+    parser.add_argument("--synthetic", type=int, default=0, help="Add N generated transcripts")
+    parser.add_argument("--priority", default="priority_ARB_exams.csv")
+    parser.add_argument("--reference", help="CSV with Learner and Exam Code columns holding model answers")
+    parser.add_argument("--model-calls", type=int, default=0, help="Ask the model for up to N transcripts")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    parser.add_argument("--repeat", type=int, default=20, help="Timed local runs per transcript (default: 20)")
+    parser.add_argument("--json", action="store_true", help="Print the summary as JSON")
+    args = parser.parse_args()
+
+    priority = read_priority_exams(args.priority)
+    if args.transcripts:
+        transcripts = load_transcripts(args.transcripts)
+    elif os.path.exists("passed_exams.csv"):
+        with open("passed_exams.csv", encoding="utf-8") as f:
+            transcripts = {"passed_exams": f.read()}
+    else:
+        transcripts = {}
+    transcripts.update(synthetic_transcripts(args.synthetic))
+    if not transcripts:
+        print("No transcripts to benchmark", file=sys.stderr)
+        return 1
+
+    local_times, local = [], {}
+    for learner, text in transcripts.items():
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            local[learner] = recommend_transcript(text, priority)
+            local_times.append(time.perf_counter() - start)
+
+    model: Dict[str, str] = {}
+    if args.reference:
+        with open(args.reference, encoding="utf-8", newline="") as f:
+            model = {row["Learner"]: row["Exam Code"] for row in csv.DictReader(f)
+                     if row.get("Status") in (None, "model", "cached")}
+    model_times = []
+    if args.model_calls:
+        client = create_client()
+        for learner in list(transcripts)[:args.model_calls]:
+            prompt = build_prompt(SYSTEM_PROMPT, transcripts[learner], priority)
+            start = time.perf_counter()
+            content = request_recommendation(client, prompt.user, prompt.candidates, system_prompt=prompt.system)
+            model_times.append(time.perf_counter() - start)
+            model[learner] = json.loads(content).get("exam_code", "-")
+
+    compared = [learner for learner in transcripts if learner in model]
+    confident = [learner for learner in compared if local[learner].confidence >= args.threshold]
+    summary = {
+        "transcripts": len(transcripts),
+        "local_p50_us": round(statistics.median(local_times) * 1e6, 1),
+        "local_p95_us": round(percentile(local_times, 0.95) * 1e6, 1),
+        "local_confident_share": round(sum(r.confidence >= args.threshold for r in local.values()) / len(local), 3),
+        "model_p50_ms": round(statistics.median(model_times) * 1e3, 1) if model_times else None,
+        "compared": len(compared),
+        "agreement": round(sum(local[l].exam_code == model[l] for l in compared) / len(compared), 3)
+        if compared else None,
+        "agreement_when_confident": round(sum(local[l].exam_code == model[l] for l in confident) / len(confident), 3)
+        if confident else None,
+    }
+    if args.json:
+        print(json.dumps(summary, indent=2))
+    else:
+        for name, value in summary.items():
+            print(f"{name:>26}: {value}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Compare the memory of the compact records with the per-row dicts they replaced.
+
+For each record count, synthetic API bodies are decoded and turned into the
+rows the fetchers keep: once into dicts as before ``records.py`` and once
+into ``ExamRecord`` / ``BadgeRecord`` / ``CredentialRecord`` through the
+fetchers' extraction functions.  The report lists the memory still allocated
+once all rows are built (measured with tracemalloc), per row and in total,
+and the build time.  Exams and badges are spread over learners of 50 exams
+and 48 badges each, so repeated codes, issuers and dates show up as they do
+across an organisation.
+
+    python benchmarks/records_bench.py                      # 10000 and 100000 rows
+    python benchmarks/records_bench.py --scales 1e6 --kinds credentials --output records.json
+"""
+import argparse
+import gc
+import json
+import os
+import sys
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import synthetic  # noqa: E402
+from fetch_credly_badges import iter_badges  # noqa: E402
+from passed_exams import iter_exams  # noqa: E402
+from records import CredentialRecord  # noqa: E402
+
+DEFAULT_SCALES = [10000, 100000]
+EXAMS_PER_LEARNER = 50
+BADGES_PER_USER = 48
+CREDENTIALS_PER_PAGE = 100
+
+
+def _exam_dict(exam: Dict[str, Any]) -> Dict[str, str]:
+    # The rows passed_exams.normalize_exams built before the records
+    taken = exam.get("examDateTaken") or ""
+    return {"Exam Title": exam.get("examTitle") or "", "Exam Number": exam.get("examNumber") or "",
+            "Exam Date": taken.split("T")[0] if taken else ""}
+
+
+def _badge_dict(badge: Dict[str, Any]) -> Dict[str, str]:
+    # The rows fetch_credly_badges.extract_badges built before the records
+    entities = badge.get("issuer", {}).get("entities", [])
+    return {"Badge Title": badge.get("badge_template", {}).get("name", ""),
+            "Issuer": entities[0].get("entity", {}).get("name", "") if entities else "",
+            "Badge Date": badge.get("issued_at", "").split("T")[0]}
+
+
+def exam_bodies(count: int) -> List[bytes]:
+    """Return transcript bodies of ``EXAMS_PER_LEARNER`` exams adding up to ``count`` exams."""
+    return [json.dumps(synthetic.transcript(EXAMS_PER_LEARNER, seed)).encode()
+            for seed in range(max(1, count // EXAMS_PER_LEARNER))]
+
+
+def badge_bodies(count: int) -> List[bytes]:
+    """Return Credly feeds of ``BADGES_PER_USER`` badges adding up to ``count`` badges."""
+    return [json.dumps(synthetic.badge_feed(BADGES_PER_USER, seed)).encode()
+            for seed in range(max(1, count // BADGES_PER_USER))]
+
+
+def credential_bodies(count: int) -> List[bytes]:
+    """Return catalog pages adding up to ``count`` credentials."""
+    return [json.dumps(synthetic.credential_page(count, skip, CREDENTIALS_PER_PAGE, [])).encode()
+            for skip in range(0, count, CREDENTIALS_PER_PAGE)]
+
+
+# Kind -> (bodies, rows as dicts, rows as records); the builders only keep the rows
+KINDS: Dict[str, Any] = {
+    "exams": (
+        exam_bodies,
+        lambda bodies: [_exam_dict(exam) for body in bodies
+                        for exam in json.loads(body)["certificationData"]["passedExams"]],
+        lambda bodies: [exam for body in bodies
+                        for exam in iter_exams(json.loads(body)["certificationData"]["passedExams"])],
+    ),
+    "badges": (
+        badge_bodies,
+        lambda bodies: [_badge_dict(badge) for body in bodies for badge in json.loads(body)["data"]],
+        lambda bodies: [badge for body in bodies for badge in iter_badges([json.loads(body)])],
+    ),
+    "credentials": (
+        credential_bodies,
+        # fetch_all_credentials used to keep the raw JSON of every record
+        lambda bodies: [record for body in bodies for record in json.loads(body)["results"]],
+        lambda bodies: [CredentialRecord.from_json(record) for body in bodies
+                        for record in json.loads(body)["results"]],
+    ),
+}
+
+
+def measure(build: Callable[[List[bytes]], List[Any]], bodies: List[bytes]) -> Dict[str, Any]:
+    """Return the rows built from ``bodies``, the bytes they retain and the build time."""
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    rows = build(bodies)
+    seconds = time.perf_counter() - start
+    gc.collect()
+    retained, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"rows": len(rows), "bytes": retained, "bytes_per_row": round(retained / max(1, len(rows)), 1),
+            "seconds": round(seconds, 3)}
+
+
+def run(kind: str, scale: int) -> Dict[str, Any]:
+    make_bodies, build_dicts, build_records = KINDS[kind]
+    bodies = make_bodies(scale)
+    dicts = measure(build_dicts, bodies)
+    records = measure(build_records, bodies)
+    return {"kind": kind, "scale": scale, "dicts": dicts, "records": records,
+            "saved": round(1 - records["bytes"] / dicts["bytes"], 3) if dicts["bytes"] else None}
+
+
+def print_table(results: List[Dict[str, Any]]) -> None:
+    print(f"{'kind':<12} {'rows':>9} {'dict B/row':>11} {'record B/row':>13} {'dict MiB':>9} "
+          f"{'record MiB':>11} {'saved':>6} {'dict s':>7} {'record s':>9}")
+    for row in results:
+        dicts, records = row["dicts"], row["records"]
+        print(f"{row['kind']:<12} {records['rows']:>9} {dicts['bytes_per_row']:>11} {records['bytes_per_row']:>13} "
+              f"{dicts['bytes'] / 2 ** 20:>9.1f} {records['bytes'] / 2 ** 20:>11.1f} {row['saved']:>6.0%} "
+              f"{dicts['seconds']:>7.3f} {records['seconds']:>9.3f}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Compare the memory of record types and per-row dicts.")
+    parser.add_argument("--scales", nargs="+", type=synthetic.count_arg, default=DEFAULT_SCALES,
+                        help=f"Row counts to build (default: {' '.join(map(str, DEFAULT_SCALES))})")
+    parser.add_argument("--kinds", nargs="+", choices=list(KINDS), default=list(KINDS),
+                        help="Row types to compare (default: all)")
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    args = parser.parse_args(argv)
+
+    results = [run(kind, scale) for scale in args.scales for kind in args.kinds]
+    print_table(results)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
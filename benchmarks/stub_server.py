@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Local HTTP stub of the Microsoft Learn and Credly endpoints.
+
+Serves the synthetic payloads from ``synthetic.py`` on the paths the fetchers
+request, after an optional artificial latency:
+
+    /api/profiles/transcript/share/<share_id>   transcript with --exams passed exams
+    /users/<username>/badges.json               Credly feed with --badges badges, in pages of
+                                                ``per`` (default 48) selected by ``?page=N``
+    /api/contentbrowser/search/credentials      --credentials records, paged by $top/$skip
+
+Point the fetchers at it with the ``LEARN_BASE_URL`` and ``CREDLY_BASE_URL``
+environment variables:
+
+    python benchmarks/stub_server.py --exams 1000 --badges 500 --credentials 100000 --latency-ms 20 &
+    LEARN_BASE_URL=http://127.0.0.1:8700 python fetch_mslearn_credentials.py --no-cache
+
+``pipeline_bench.py`` starts the same server in-process.
+"""
+import argparse
+import json
+import math
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlsplit
+
+import synthetic
+
+DEFAULT_PORT = 8700
+DEFAULT_BADGES_PER_PAGE = 48
+
+
+class StubData:
+    """Payload sizes and latency served by :class:`StubServer`; payloads are built once on first use."""
+
+    def __init__(self, exams: int = 100, badges: int = 100, credentials: int = 1000,
+                 latency: float = 0.0, jitter: float = 0.0) -> None:
+        self.exams = exams
+        self.badges = badges
+        self.credentials = credentials
+        self.latency = latency
+        self.jitter = jitter
+        self.requests = 0
+        self._transcript_body: Optional[bytes] = None
+        self._badge_list: Optional[List[Dict]] = None
+        self._lock = threading.Lock()
+
+    def _transcript(self) -> bytes:
+        with self._lock:
+            if self._transcript_body is None:
+                self._transcript_body = json.dumps(synthetic.transcript(self.exams), separators=(",", ":")).encode()
+            return self._transcript_body
+
+    def _badges_page(self, page: int, per: int) -> bytes:
+        with self._lock:
+            if self._badge_list is None:
+                self._badge_list = synthetic.badge_feed(self.badges)["data"]
+            data = self._badge_list
+        total_pages = max(1, math.ceil(len(data) / per))
+        return json.dumps({
+            "data": data[(page - 1) * per:page * per],
+            "metadata": {"count": min(per, max(0, len(data) - (page - 1) * per)), "current_page": page,
+                         "total_count": len(data), "total_pages": total_pages, "per": per},
+        }, separators=(",", ":")).encode()
+
+    def respond(self, path: str) -> Tuple[int, Optional[bytes]]:
+        """Return the status code and body for a request path with query string."""
+        parts = urlsplit(path)
+        query = parse_qsl(parts.query, keep_blank_values=True)
+        params = dict(query)
+        with self._lock:
+            self.requests += 1
+        if parts.path.startswith("/api/profiles/transcript/share/"):
+            return 200, self._transcript()
+        if parts.path.startswith("/users/") and parts.path.endswith("/badges.json"):
+            return 200, self._badges_page(max(1, int(params.get("page", 1))),
+                                          max(1, int(params.get("per", DEFAULT_BADGES_PER_PAGE))))
+        if parts.path == synthetic.CREDENTIALS_PATH:
+            page = synthetic.credential_page(self.credentials, int(params.get("$skip", 0)),
+                                             int(params.get("$top", 30)), query)
+            return 200, json.dumps(page, separators=(",", ":")).encode()
+        return 404, None
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, like the real endpoints
+
+    def log_message(self, format: str, *args) -> None:
+        pass
+
+    def do_GET(self) -> None:
+        data = self.server.data
+        if data.latency or data.jitter:
+            time.sleep(data.latency + random.uniform(0, data.jitter))
+        status, body = data.respond(self.path)
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body or b"")))
+        self.end_headers()
+        if body:
+            self.wfile.write(body)
+
+
+class StubServer(ThreadingHTTPServer):
+    """Threaded stub server; use as a context manager to serve in a background thread."""
+    daemon_threads = True
+
+    def __init__(self, data: StubData, host: str = "127.0.0.1", port: int = 0) -> None:
+        super().__init__((host, port), StubHandler)
+        self.data = data
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def __enter__(self) -> "StubServer":
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.shutdown()
+        self.server_close()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Serve synthetic Learn and Credly responses locally.")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help=f"Port (default: {DEFAULT_PORT})")
+    parser.add_argument("--exams", type=synthetic.count_arg, default=100, help="Exams in the transcript")
+    parser.add_argument("--badges", type=synthetic.count_arg, default=100, help="Badges in the Credly feed")
+    parser.add_argument("--credentials", type=synthetic.count_arg, default=1000,
+                        help="Records in the credentials catalog")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Delay before every response")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="Extra random delay of up to this much")
+    args = parser.parse_args()
+
+    data = StubData(args.exams, args.badges, args.credentials, args.latency_ms / 1000, args.jitter_ms / 1000)
+    server = StubServer(data, port=args.port)
+    print(f"Serving on {server.base_url}", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
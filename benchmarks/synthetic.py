@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Synthetic API payloads for the offline benchmarks.
+
+Each generator is deterministic for a given ``seed`` and shaped like the live
+responses the fetchers parse:
+
+- :func:`transcript` - a Microsoft Learn transcript with ``passedExams`` under
+  ``certificationData`` and unrelated sections around it
+- :func:`badge_feed` - a Credly ``badges.json`` feed
+- :func:`credential` / :func:`credential_page` - records and ``$skip`` pages of
+  the Learn content browser credentials search; certifications list the
+  :func:`exam_code` exams they require
+
+Record counts from 10 to 1,000,000 are supported; everything is built from a
+small set of code and title pools, so generation stays cheap at any scale.
+"""
+import argparse
+import random
+from datetime import date, timedelta
+from typing import Any, Dict, Iterator, List, Tuple
+from urllib.parse import quote, urlencode
+
+MIN_RECORDS = 10
+MAX_RECORDS = 1_000_000
+
+EXAM_FAMILIES = ("AZ", "AI", "DP", "MS", "SC", "PL", "MB", "MD")
+ISSUERS = ("Microsoft", "Amazon Web Services", "Google Cloud", "The Linux Foundation", "HashiCorp", "CompTIA")
+CREDENTIAL_TYPES = ("certification", "examination", "applied skills")
+LEVELS = ("beginner", "intermediate", "advanced")
+PRODUCTS = ("azure", "microsoft-365", "power-platform", "dynamics-365", "fabric", "github")
+ROLES = ("administrator", "developer", "solution-architect", "data-engineer", "security-engineer")
+
+CREDENTIALS_PATH = "/api/contentbrowser/search/credentials"
+
+
+def check_count(count: int) -> int:
+    """Return ``count`` if it is within the supported range, else raise ValueError."""
+    if not MIN_RECORDS <= count <= MAX_RECORDS:
+        raise ValueError(f"Record count must be between {MIN_RECORDS} and {MAX_RECORDS:,}, got {count:,}")
+    return count
+
+
+def count_arg(value: str) -> int:
+    """``argparse`` type for record counts; accepts ``1000``, ``1_000`` or ``1e6``."""
+    try:
+        return check_count(int(float(value.replace("_", ""))))
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+
+def _day(rng: random.Random) -> date:
+    return date(2015, 1, 1) + timedelta(days=rng.randrange(3650))
+
+
+def exam_code(i: int) -> str:
+    """Return exam code ``i`` of the synthetic exam pool (7200 distinct codes)."""
+    return f"{EXAM_FAMILIES[i % len(EXAM_FAMILIES)]}-{100 + i % 900}"
+
+
+def transcript(count: int, seed: int = 0) -> Dict[str, Any]:
+    """Return a transcript with ``count`` passed exams, oldest first."""
+    check_count(count)
+    rng = random.Random(seed)
+    days = sorted(_day(rng) for _ in range(count))
+    exams = []
+    for i, day in enumerate(days):
+        code = exam_code(i)
+        exams.append({
+            "examTitle": f"Exam {code}: Synthetic Technology Solutions {i}",
+            "examNumber": code,
+            "examDateTaken": f"{day.isoformat()}T00:00:00Z",
+            "examResult": "Passed",
+        })
+    return {
+        "userName": f"synthetic-{seed}",
+        "modulesCompleted": [{"uid": f"learn.module-{i}", "title": f"Module {i}"} for i in range(min(count, 100))],
+        "certificationData": {"passedExams": exams, "activeCertifications": []},
+        "appliedSkillsData": {"credentials": []},
+    }
+
+
+def badge(i: int, rng: random.Random) -> Dict[str, Any]:
+    issued = _day(rng)
+    issuer = ISSUERS[i % len(ISSUERS)]
+    return {
+        "id": f"00000000-0000-4000-8000-{i:012d}",
+        "issued_at": f"{issued.isoformat()}T12:00:00.000-05:00",
+        "badge_template": {"id": f"template-{i % 500}", "name": f"{issuer} Synthetic Badge {i}",
+                           "description": "Awarded for completing a synthetic benchmark credential."},
+        "issuer": {"entities": [{"label": "Issued by", "primary": True,
+                                 "entity": {"type": "Organization", "name": issuer}}]},
+    }
+
+
+def badge_feed(count: int, seed: int = 0) -> Dict[str, Any]:
+    """Return a Credly badge feed with ``count`` badges in one page."""
+    check_count(count)
+    rng = random.Random(seed)
+    return {
+        "data": [badge(i, rng) for i in range(count)],
+        "metadata": {"count": count, "current_page": 1, "total_count": count, "total_pages": 1,
+                     "per": count, "previous_page_url": None, "next_page_url": None},
+    }
+
+
+def credential(i: int) -> Dict[str, Any]:
+    """Return credential record ``i`` of the synthetic catalog; the same ``i`` always gives the same record.
+
+    Certifications require exam ``i`` of :func:`exam_code`, and every other
+    one exam ``i + 8`` as well.
+    """
+    product = PRODUCTS[i % len(PRODUCTS)]
+    credential_type = CREDENTIAL_TYPES[i % len(CREDENTIAL_TYPES)]
+    exams = [] if credential_type != "certification" else [exam_code(i)] + ([exam_code(i + 8)] if i % 2 else [])
+    return {
+        "uid": f"synthetic.credential.{i}",
+        "title": f"Synthetic {product} credential {i}",
+        "summary": "A generated credential used to benchmark paging, flattening and CSV writing.",
+        "url": f"/credentials/synthetic-{i}/",
+        "credential_types": [credential_type],
+        "levels": [LEVELS[i % len(LEVELS)]],
+        "products": [{"uid": product, "display_name": product.replace("-", " ").title()}],
+        "roles": [ROLES[i % len(ROLES)], ROLES[(i + 1) % len(ROLES)]],
+        "subjects": [],
+        "exams": [{"uid": f"exam.{code.lower()}", "display_name": code} for code in exams],
+        "popularity": (i * 7919) % 1000 / 1000,
+        "last_modified": f"2024-01-{1 + i % 28:02d}T00:00:00Z",
+        "locale": {"code": "en-us"},
+    }
+
+
+def credentials(count: int) -> Iterator[Dict[str, Any]]:
+    """Yield the ``count`` records of the synthetic catalog lazily."""
+    check_count(count)
+    return (credential(i) for i in range(count))
+
+
+def credential_page(total: int, skip: int, top: int, query: List[Tuple[str, str]]) -> Dict[str, Any]:
+    """Return the page at ``skip`` of a ``total`` record catalog, linking to the next page like the live API.
+
+    :param query: Query parameters of the request; ``$skip`` is replaced in ``@nextLink``
+    """
+    page = {"results": [credential(i) for i in range(skip, min(skip + top, total))], "count": total}
+    if skip + top < total:
+        next_query = [(k, v) for k, v in query if k != "$skip"] + [("$skip", str(skip + top))]
+        page["@nextLink"] = f"{CREDENTIALS_PATH}?{urlencode(next_query, quote_via=quote, safe='$(),:')}"
+    return page
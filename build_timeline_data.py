@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+Build ``timeline.json``, the single data file loaded by ``index.html``.
+
+The page used to download ``passed_exams.csv``, ``credly_badges.csv`` and two
+partials, and to parse the CSVs in the browser on every visit.  This script
+does that work once per update and writes everything the dashboard shows into
+one compact JSON document:
+
+- exams and badges as parallel arrays (dates, titles, codes/issuers), already
+  sorted by date, ready to hand to Plotly
+- each exam's level and the counts per exam level (from the exam catalog,
+  refreshed through the HTTP cache at most once a day, else from its
+  snapshot), and the counts per year
+- the AI recommendation and the last-updated stamp
+
+The CSVs are left untouched; ``index.html`` falls back to them when
+``timeline.json`` is missing.  ``passed_exams.py`` and
+``fetch_credly_badges.py`` call :func:`refresh_timeline` after rewriting one
+of the dashboard's CSVs, so an existing ``timeline.json`` never goes stale.
+
+Usage:
+    python build_timeline_data.py [--exams passed_exams.csv] [--badges credly_badges.csv]
+                                  [--output timeline.json] [--offline]
+"""
+import argparse
+import csv
+import json
+import os
+import re
+import sys
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional
+
+from exam_catalog import DEFAULT_MAX_AGE, DEFAULT_SNAPSHOT_PATH, ExamCatalog
+from http_cache import add_cache_arguments, cache_from_args
+
+DEFAULT_OUTPUT = "timeline.json"
+DEFAULT_EXAMS = "passed_exams.csv"
+DEFAULT_BADGES = "credly_badges.csv"
+RECOMMENDATION_PARTIAL = "partials/ai-recommendation.html"
+LAST_UPDATED_PARTIAL = "partials/last-updated.html"
+SCHEMA_VERSION = 1
+
+_SPAN_TEXT = re.compile(r"<span[^>]*>(.*?)</span>", re.DOTALL)
+
+
+def normalize_rows(rows: Iterable[Dict[str, str]], date_field: str) -> List[Dict[str, str]]:
+    """Strip the values of CSV rows and sort them oldest first, undated rows last.
+
+    Like ``parseCSV`` in ``index.html``, every non-empty row is kept.
+    """
+    rows = [
+        {key: (value or "").strip() for key, value in row.items() if key}
+        for row in rows
+    ]
+    rows = [row for row in rows if any(row.values())]
+    for row in rows:
+        # Normalise to YYYY-MM-DD so the page can plot the strings directly
+        row[date_field] = row.get(date_field, "")[:10]
+    return sorted(rows, key=lambda row: (not row[date_field], row[date_field]))
+
+
+def read_rows(path: str, date_field: str) -> List[Dict[str, str]]:
+    """Read a CSV with :func:`normalize_rows`; a missing file reads as empty."""
+    try:
+        with open(path, encoding="utf-8", newline="") as f:
+            return normalize_rows(csv.DictReader(f), date_field)
+    except FileNotFoundError:
+        return []
+
+
+def read_partial(path: str) -> Optional[str]:
+    """Return the text inside the ``<span>`` of a partial, or None when it is missing."""
+    try:
+        with open(path, encoding="utf-8") as f:
+            match = _SPAN_TEXT.search(f.read())
+    except FileNotFoundError:
+        return None
+    return match.group(1).strip() if match else None
+
+
+def per_year(dates: List[str]) -> Dict[str, int]:
+    return dict(sorted(Counter(date[:4] for date in dates if date).items()))
+
+
+def build_exams(rows: List[Dict[str, str]], catalog: Optional[ExamCatalog]) -> Dict[str, Any]:
+    """Return the exam section of the artifact."""
+    dates = [row["Exam Date"] for row in rows]
+    codes = [row.get("Exam Number", "") for row in rows]
+    levels = []
+    for code in codes:
+        exam = catalog.get(code) if catalog else None
+        exam_levels = (exam or {}).get("levels") or []
+        levels.append(exam_levels[0] if exam_levels else "unknown")
+    return {
+        "count": len(rows),
+        "dates": dates,
+        "titles": [row.get("Exam Title", "") for row in rows],
+        "codes": codes,
+        "levels": levels,
+        "per_year": per_year(dates),
+        "per_level": dict(Counter(levels).most_common()),
+    }
+
+
+def build_badges(rows: List[Dict[str, str]]) -> Dict[str, Any]:
+    """Return the badge section of the artifact."""
+    dates = [row["Badge Date"] for row in rows]
+    return {
+        "count": len(rows),
+        "dates": dates,
+        "titles": [row.get("Badge Title", "") for row in rows],
+        "issuers": [row.get("Issuer", "") for row in rows],
+        "per_year": per_year(dates),
+    }
+
+
+def timeline_from_rows(exam_rows: List[Dict[str, str]], badge_rows: List[Dict[str, str]],
+                       recommendation: Optional[str] = None, last_updated: Optional[str] = None,
+                       catalog: Optional[ExamCatalog] = None) -> Dict[str, Any]:
+    """Assemble the artifact from rows already passed through :func:`normalize_rows`."""
+    return {
+        "version": SCHEMA_VERSION,
+        "last_updated": last_updated,
+        "recommendation": recommendation,
+        "exams": build_exams(exam_rows, catalog),
+        "badges": build_badges(badge_rows),
+    }
+
+
+def build_timeline(exams_path: str = DEFAULT_EXAMS, badges_path: str = DEFAULT_BADGES,
+                   recommendation_path: str = RECOMMENDATION_PARTIAL,
+                   last_updated_path: str = LAST_UPDATED_PARTIAL,
+                   catalog: Optional[ExamCatalog] = None) -> Dict[str, Any]:
+    """Collect everything the dashboard displays into one dictionary."""
+    return timeline_from_rows(read_rows(exams_path, "Exam Date"), read_rows(badges_path, "Badge Date"),
+                              read_partial(recommendation_path), read_partial(last_updated_path), catalog)
+
+
+def write_timeline(timeline: Dict[str, Any], path: str = DEFAULT_OUTPUT) -> None:
+    """Write the artifact compactly and atomically, so the page never sees a partial file."""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(timeline, f, ensure_ascii=False, separators=(",", ":"))
+    os.replace(tmp_path, path)
+
+
+def refresh_timeline(csv_path: str) -> Optional[str]:
+    """Rebuild the ``timeline.json`` next to ``csv_path`` after a fetcher rewrote that CSV.
+
+    Only the dashboard's own CSVs (``passed_exams.csv`` and ``credly_badges.csv``)
+    count, and only an existing ``timeline.json`` is rebuilt; exam levels come
+    from the catalog snapshot on disk.
+
+    :return: Path of the rebuilt file, or None when there was nothing to rebuild
+    """
+    if os.path.basename(csv_path) not in (DEFAULT_EXAMS, DEFAULT_BADGES):
+        return None
+    directory = os.path.dirname(csv_path)
+    output = os.path.join(directory, DEFAULT_OUTPUT)
+    if not os.path.exists(output):
+        return None
+    catalog = ExamCatalog.load(os.path.join(directory, DEFAULT_SNAPSHOT_PATH), offline=True)
+    write_timeline(build_timeline(os.path.join(directory, DEFAULT_EXAMS), os.path.join(directory, DEFAULT_BADGES),
+                                  os.path.join(directory, RECOMMENDATION_PARTIAL),
+                                  os.path.join(directory, LAST_UPDATED_PARTIAL), catalog), output)
+    return output
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Build the timeline.json data file for index.html.")
+    parser.add_argument("--exams", default=DEFAULT_EXAMS, help=f"Passed exams CSV (default: {DEFAULT_EXAMS})")
+    parser.add_argument("--badges", default=DEFAULT_BADGES, help=f"Credly badges CSV (default: {DEFAULT_BADGES})")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT, help=f"Output file (default: {DEFAULT_OUTPUT})")
+    parser.add_argument("--catalog", default=DEFAULT_SNAPSHOT_PATH,
+                        help=f"Exam catalog snapshot for the exam levels (default: {DEFAULT_SNAPSHOT_PATH})")
+    parser.add_argument("--catalog-max-age", type=float, default=DEFAULT_MAX_AGE,
+                        help=f"Seconds before the catalog snapshot is refreshed (default: {DEFAULT_MAX_AGE})")
+    parser.add_argument("--offline", action="store_true",
+                        help="Only use the catalog snapshot on disk, never the network")
+    add_cache_arguments(parser)
+    args = parser.parse_args(argv)
+
+    # A failed refresh falls back to the stale snapshot, or to levels of "unknown" without one
+    catalog = ExamCatalog.load(args.catalog, max_age=args.catalog_max_age, offline=args.offline,
+                               cache=None if args.offline else cache_from_args(args))
+    timeline = build_timeline(args.exams, args.badges, catalog=catalog)
+    write_timeline(timeline, args.output)
+    print(f"Wrote {timeline['exams']['count']} exams and {timeline['badges']['count']} badges to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
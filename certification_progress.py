@@ -0,0 +1,321 @@
+#!/usr/bin/env python3
+"""
+Certification progress of many learners from their exams, badges and the credentials catalog.
+
+The credentials catalog (``fetch_mslearn_credentials.py``, as a CSV or a
+``--sync-db`` store) lists the exams each certification needs in its
+``exams`` field.  :class:`ProgressIndex` inverts that once into an index from
+exam code to the certifications that need it, plus an index of normalised
+certification titles for matching Credly badges.  A learner's progress is
+then worked out from the certifications their exams point to, with one set
+difference each, instead of scanning the catalog:
+
+- ``earned`` - every required exam passed, or a badge with the certification's title
+- ``one_away`` - one required exam left
+- ``in_progress`` - at least one required exam passed, more than one left
+
+Learners with the same set of exams (common across an organisation) share
+one computation through a bounded memo, so the bulk pass over thousands of
+learners costs little more than the distinct transcripts in it.
+
+Exams are read like ``batch_recommender.py`` reads transcripts (a directory
+of ``passed_exams_<learner>.csv`` files, a combined CSV with a ``Share ID``
+column, or a single ``passed_exams.csv``), badges likewise from
+``credly_badges_<username>.csv`` files or a CSV with a ``Username`` column.
+``--learner-map`` joins share IDs to Credly usernames; ``--history-db``
+reads the latest exams and badges of every learner from ``history_store.py``.
+
+    python certification_progress.py --catalog fetched_credentials.csv --exams passed_exams.csv \\
+        --badges credly_badges.csv
+    python certification_progress.py --catalog credentials.db --exams all_exams.csv --badges all_badges.csv \\
+        --learner-map learners.csv --status one_away --output progress.csv
+"""
+import argparse
+import csv
+import functools
+import os
+import re
+import sys
+from typing import Any, Dict, FrozenSet, Iterable, Iterator, List, Mapping, NamedTuple, Optional, Set, Tuple
+
+from credential_store import CredentialStore
+from history_store import BADGES, EXAMS, HistoryStore
+from metrics import add_metrics_arguments, collect, count, stage
+from records import load_learner_map
+
+EARNED = "earned"
+ONE_AWAY = "one_away"
+IN_PROGRESS = "in_progress"
+STATUSES = (EARNED, ONE_AWAY, IN_PROGRESS)
+DEFAULT_LEARNER = "me"
+# Distinct exam sets whose progress is remembered during a bulk pass
+MEMO_SIZE = 4096
+OUTPUT_FIELDNAMES = ["Learner", "Credential", "Title", "Status", "Passed Exams", "Remaining Exams", "Badge"]
+
+_EXAM_PREFIX = "EXAM."
+_TITLE_JUNK = re.compile(r"[^0-9a-z]+")
+
+
+class Certification(NamedTuple):
+    """A credential of the catalog that requires exams."""
+    uid: str
+    title: str
+    exams: FrozenSet[str]
+
+
+class Progress(NamedTuple):
+    """One learner's progress towards one certification."""
+    learner: str
+    certification: Certification
+    status: str
+    passed: FrozenSet[str]
+    remaining: FrozenSet[str]
+    badge: Optional[str]
+
+
+def exam_code(value: str) -> str:
+    """Normalise an exam reference (``AZ-104``, ``az-104`` or the uid ``exam.az-104``) to its code."""
+    code = value.strip().upper()
+    return code[len(_EXAM_PREFIX):] if code.startswith(_EXAM_PREFIX) else code
+
+
+def exam_codes(value: Any) -> FrozenSet[str]:
+    """Return the exam codes of a catalog ``exams`` field.
+
+    Accepts the raw JSON (a list of codes or of dicts with ``display_name``
+    or ``uid``) and the semicolon-separated string of the flattened CSV.
+    """
+    if not value:
+        return frozenset()
+    if isinstance(value, str):
+        value = value.split(";")
+    codes = set()
+    for elem in value:
+        if isinstance(elem, dict):
+            elem = elem.get("display_name") or elem.get("uid") or ""
+        code = exam_code(str(elem))
+        if code:
+            codes.add(code)
+    return frozenset(codes)
+
+
+def title_key(title: str) -> str:
+    """Normalise a certification or badge title for matching: case, punctuation and spacing are ignored."""
+    return _TITLE_JUNK.sub(" ", title.casefold()).strip()
+
+
+class ProgressIndex:
+    """Inverted index from exam code and badge title to the certifications of a catalog."""
+
+    def __init__(self, credentials: Iterable[Mapping[str, Any]]) -> None:
+        """Index every credential with a non-empty ``exams`` field.
+
+        :param credentials: Raw catalog records, flattened CSV rows or ``CredentialRecord``\\ s
+        """
+        with stage("progress.index") as timer:
+            self.certifications: List[Certification] = []
+            self.by_exam: Dict[str, List[int]] = {}
+            self.by_title: Dict[str, int] = {}
+            for credential in credentials:
+                exams = exam_codes(credential.get("exams"))
+                uid = credential.get("uid") or ""
+                if not exams or not uid:
+                    continue
+                position = len(self.certifications)
+                title = credential.get("title") or ""
+                self.certifications.append(Certification(uid, title, exams))
+                for code in exams:
+                    self.by_exam.setdefault(code, []).append(position)
+                if title:
+                    self.by_title.setdefault(title_key(title), position)
+            timer.records = len(self.certifications)
+        self._exam_progress = functools.lru_cache(maxsize=MEMO_SIZE)(self._compute_exam_progress)
+
+    def __len__(self) -> int:
+        return len(self.certifications)
+
+    def _compute_exam_progress(self, exams: FrozenSet[str]) -> List[Tuple[int, FrozenSet[str], FrozenSet[str]]]:
+        # (certification, passed, remaining) for every certification the exams count towards
+        touched: Set[int] = set()
+        for code in exams:
+            touched.update(self.by_exam.get(code, ()))
+        certifications = self.certifications
+        return [(position, certifications[position].exams & exams, certifications[position].exams - exams)
+                for position in sorted(touched)]
+
+    def progress(self, learner: str, exams: Iterable[str], badges: Iterable[str] = ()) -> List[Progress]:
+        """Return the certifications ``learner`` has earned or started, in catalog order.
+
+        :param exams: Exam codes the learner passed
+        :param badges: Titles of the learner's badges
+        """
+        passed_exams = frozenset(exam_code(code) for code in exams)
+        badge_matches: Dict[int, str] = {}
+        for badge in badges:
+            position = self.by_title.get(title_key(badge))
+            if position is not None:
+                badge_matches.setdefault(position, badge)
+
+        rows: Dict[int, Progress] = {}
+        for position, passed, remaining in self._exam_progress(passed_exams):
+            badge = badge_matches.get(position)
+            if not remaining or badge:
+                status = EARNED
+            else:
+                status = ONE_AWAY if len(remaining) == 1 else IN_PROGRESS
+            rows[position] = Progress(learner, self.certifications[position], status, passed, remaining, badge)
+        for position, badge in badge_matches.items():
+            # Certified without any of the exams on the transcript, e.g. an older exam version
+            if position not in rows:
+                certification = self.certifications[position]
+                rows[position] = Progress(learner, certification, EARNED, frozenset(), certification.exams, badge)
+        return [rows[position] for position in sorted(rows)]
+
+    def bulk(self, exams: Mapping[str, Iterable[str]],
+             badges: Optional[Mapping[str, Iterable[str]]] = None) -> Iterator[Progress]:
+        """Yield the progress of every learner in ``exams`` or ``badges``, learner by learner.
+
+        :param exams: Learner -> passed exam codes
+        :param badges: Learner -> badge titles
+        """
+        badges = badges or {}
+        learners = list(dict.fromkeys([*exams, *badges]))
+        hits = self._exam_progress.cache_info().hits
+        with stage("progress.bulk") as timer:
+            for learner in learners:
+                yield from self.progress(learner, exams.get(learner, ()), badges.get(learner, ()))
+            timer.records = len(learners)
+        count("progress_memo_hits", self._exam_progress.cache_info().hits - hits)
+
+
+def load_catalog(path: str) -> Iterator[Mapping[str, Any]]:
+    """Yield the credentials of a ``fetch_mslearn_credentials.py`` CSV or ``--sync-db`` store."""
+    if path.endswith(".db"):
+        with CredentialStore(path) as store:
+            yield from store.query()
+        return
+    with open(path, encoding="utf-8", newline="") as f:
+        yield from csv.DictReader(f)
+
+
+def load_learner_values(source: str, id_column: str, value_column: str, prefix: str,
+                        learner: str = DEFAULT_LEARNER) -> Dict[str, Set[str]]:
+    """Read one column per learner from per-learner CSVs or a combined CSV.
+
+    :param source: Directory of ``<prefix><learner>.csv`` files, a CSV with an
+        ``id_column``, or a single learner's CSV
+    :param id_column: Learner column of the combined CSV (``Share ID`` or ``Username``)
+    :param value_column: Column to collect (``Exam Number`` or ``Badge Title``)
+    :param prefix: File name prefix in a directory (``passed_exams_`` or ``credly_badges_``)
+    :param learner: Learner ID for a single learner's CSV
+    :return: Learner ID -> set of values, in input order
+    """
+    values: Dict[str, Set[str]] = {}
+    if os.path.isdir(source):
+        for name in sorted(os.listdir(source)):
+            if name.endswith(".csv"):
+                file_learner = name[:-len(".csv")]
+                if file_learner.startswith(prefix):
+                    file_learner = file_learner[len(prefix):]
+                values.update(load_learner_values(os.path.join(source, name), id_column, value_column,
+                                                  prefix, file_learner))
+        return values
+    with open(source, encoding="utf-8", newline="") as f:
+        reader = csv.DictReader(f)
+        combined = id_column in (reader.fieldnames or [])
+        for row in reader:
+            value = (row.get(value_column) or "").strip()
+            key = row[id_column] if combined else learner
+            learner_values = values.setdefault(key, set())
+            if value:
+                learner_values.add(value)
+    return values
+
+
+def load_history(path: str) -> Tuple[Dict[str, Set[str]], Dict[str, Set[str]]]:
+    """Return the latest exam codes and badge titles of every learner in a ``history_store.py`` database."""
+    exams: Dict[str, Set[str]] = {}
+    badges: Dict[str, Set[str]] = {}
+    with HistoryStore(path) as store:
+        for kind, values in ((EXAMS, exams), (BADGES, badges)):
+            for record in store.query(kind):
+                values.setdefault(record.learner, set()).add(record.code)
+    return exams, badges
+
+
+def write_progress(rows: Iterable[Progress], path: Optional[str]) -> Dict[str, int]:
+    """Write progress rows as CSV to ``path`` (stdout when None) and return the count per status."""
+    counts = dict.fromkeys(STATUSES, 0)
+    f = open(path, "w", encoding="utf-8", newline="") if path else sys.stdout
+    try:
+        writer = csv.writer(f)
+        writer.writerow(OUTPUT_FIELDNAMES)
+        for row in rows:
+            writer.writerow([row.learner, row.certification.uid, row.certification.title, row.status,
+                             ";".join(sorted(row.passed)), ";".join(sorted(row.remaining)), row.badge or ""])
+            counts[row.status] += 1
+    finally:
+        if path:
+            f.close()
+    return counts
+
+
+def run(args: argparse.Namespace) -> int:
+    index = ProgressIndex(load_catalog(args.catalog))
+    if not index:
+        print(f"No credentials with exams found in {args.catalog}", file=sys.stderr)
+        return 1
+
+    exams: Dict[str, Set[str]] = {}
+    badges: Dict[str, Set[str]] = {}
+    if args.history_db:
+        exams, badges = load_history(args.history_db)
+    if args.exams:
+        exams.update(load_learner_values(args.exams, "Share ID", "Exam Number", "passed_exams_", args.learner))
+    if args.badges:
+        badges.update(load_learner_values(args.badges, "Username", "Badge Title", "credly_badges_", args.learner))
+    if args.learner_map:
+        usernames = load_learner_map(args.learner_map)
+        joined: Dict[str, Set[str]] = {}
+        for username, titles in badges.items():
+            joined.setdefault(usernames.get(username, username), set()).update(titles)
+        badges = joined
+    if not exams and not badges:
+        print("No exams or badges to evaluate", file=sys.stderr)
+        return 1
+
+    wanted = set(args.status or STATUSES)
+    rows = (row for row in index.bulk(exams, badges) if row.status in wanted)
+    counts = write_progress(rows, args.output)
+    learners = len(set(exams) | set(badges))
+    summary = ", ".join(f"{counts[status]} {status}" for status in STATUSES if status in wanted)
+    print(f"{learners} learners against {len(index)} certifications: {summary}"
+          + (f"; written to {args.output}" if args.output else ""), file=sys.stderr)
+    return 0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Work out which certifications learners hold or are close to.")
+    parser.add_argument("--catalog", default="fetched_credentials.csv",
+                        help="Credentials CSV or --sync-db store (.db) of fetch_mslearn_credentials.py "
+                             "(default: fetched_credentials.csv)")
+    parser.add_argument("--exams", help="Passed exams CSV, combined CSV with a Share ID column, or directory of CSVs")
+    parser.add_argument("--badges", help="Credly badges CSV, combined CSV with a Username column, or directory of CSVs")
+    parser.add_argument("--history-db", metavar="PATH", help="Read the latest exams and badges from this history store")
+    parser.add_argument("--learner-map", metavar="CSV",
+                        help="CSV with Share ID and Username columns joining badges to transcripts")
+    parser.add_argument("--learner", default=DEFAULT_LEARNER,
+                        help=f"Learner ID for single-learner CSVs (default: {DEFAULT_LEARNER})")
+    parser.add_argument("--status", nargs="+", choices=STATUSES, help="Only report these statuses (default: all)")
+    parser.add_argument("--output", help="Output CSV (default: stdout)")
+    add_metrics_arguments(parser)
+    args = parser.parse_args(argv)
+    if not (args.exams or args.badges or args.history_db):
+        parser.error("give --exams, --badges or --history-db")
+
+    with collect(args, "certification_progress"):
+        return run(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""
+Local SQLite index of the Microsoft Learn credentials catalog.
+
+``fetch_mslearn_credentials.py --sync-db credentials.db`` streams the catalog
+into this store instead of rewriting a CSV.  Records are keyed by ``uid`` and
+only written when they changed since the previous sync (same
+``last_modified`` value or same content hash means unchanged).  Credentials
+that disappeared from a complete crawl are removed.  Each sync reports how
+many records were added, changed and removed.
+
+Facets (type, level, product, role and subject) are stored in an indexed side
+table so downstream tools can query the catalog directly:
+
+    python credential_store.py credentials.db --type certification --product azure
+"""
+import argparse
+import hashlib
+import json
+import sqlite3
+import sys
+import time
+from typing import Any, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+DEFAULT_DB_PATH = "credentials.db"
+
+# Facet name in the store -> key in the content browser record
+FACET_FIELDS = {
+    "type": "credential_types",
+    "level": "levels",
+    "product": "products",
+    "role": "roles",
+    "subject": "subjects",
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS credentials (
+    uid TEXT PRIMARY KEY,
+    title TEXT,
+    content_hash TEXT NOT NULL,
+    last_modified TEXT,
+    data TEXT NOT NULL,
+    first_seen REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS credential_facets (
+    uid TEXT NOT NULL REFERENCES credentials(uid) ON DELETE CASCADE,
+    facet TEXT NOT NULL,
+    value TEXT NOT NULL,
+    PRIMARY KEY (uid, facet, value)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_credential_facets_value ON credential_facets (facet, value, uid);
+CREATE TABLE IF NOT EXISTS syncs (
+    id INTEGER PRIMARY KEY,
+    finished_at REAL NOT NULL,
+    added INTEGER NOT NULL,
+    changed INTEGER NOT NULL,
+    removed INTEGER NOT NULL,
+    unchanged INTEGER NOT NULL
+);
+"""
+
+
+class SyncStats(NamedTuple):
+    """Counts reported by :meth:`CredentialStore.sync`."""
+    added: int
+    changed: int
+    removed: int
+    unchanged: int
+
+
+def content_hash(record: Dict[str, Any]) -> str:
+    """Return a stable hash of a raw credential record."""
+    encoded = json.dumps(record, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+def facet_values(value: Any) -> List[str]:
+    """Normalise a facet field (string, list of strings or list of dicts) to lowercase values."""
+    if value is None:
+        return []
+    if not isinstance(value, list):
+        value = [value]
+    values = []
+    for elem in value:
+        if isinstance(elem, dict):
+            elem = elem.get("display_name") or elem.get("uid")
+        if elem:
+            values.append(str(elem).strip().lower())
+    return values
+
+
+class CredentialStore:
+    """SQLite-backed credential catalog keyed by ``uid``."""
+
+    def __init__(self, path: str = DEFAULT_DB_PATH) -> None:
+        """Open (and if necessary create) the store at ``path``."""
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA foreign_keys = ON")
+        self.conn.execute("PRAGMA journal_mode = WAL")
+        self.conn.executescript(SCHEMA)
+
+    def __enter__(self) -> "CredentialStore":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def sync(self, records: Iterable[Dict[str, Any]], remove_missing: bool = True) -> SyncStats:
+        """Upsert changed records from a crawl, in a single transaction.
+
+        :param records: Raw credential records, e.g. streamed page by page
+        :param remove_missing: Delete stored credentials that were not seen;
+            only pass True when ``records`` covers the whole catalog
+        :return: Added, changed, removed and unchanged counts
+        :raises Exception: anything raised while iterating ``records``; the
+            store is rolled back to its previous state
+        """
+        now = time.time()
+        known: Dict[str, Tuple[str, Optional[str]]] = {
+            row["uid"]: (row["content_hash"], row["last_modified"])
+            for row in self.conn.execute("SELECT uid, content_hash, last_modified FROM credentials")
+        }
+        seen = set()
+        added = changed = unchanged = removed = 0
+        with self.conn:
+            for record in records:
+                uid = record.get("uid")
+                if not uid or uid in seen:
+                    continue
+                seen.add(uid)
+                last_modified = record.get("last_modified")
+                previous = known.get(uid)
+                if previous and last_modified and previous[1] == last_modified:
+                    unchanged += 1
+                    continue
+                digest = content_hash(record)
+                if previous and previous[0] == digest:
+                    unchanged += 1
+                    continue
+                self._upsert(uid, record, digest, last_modified, now)
+                if previous:
+                    changed += 1
+                else:
+                    added += 1
+
+            if remove_missing:
+                missing = [(uid,) for uid in known if uid not in seen]
+                self.conn.executemany("DELETE FROM credentials WHERE uid = ?", missing)
+                removed = len(missing)
+            self.conn.execute(
+                "INSERT INTO syncs (finished_at, added, changed, removed, unchanged) VALUES (?, ?, ?, ?, ?)",
+                (time.time(), added, changed, removed, unchanged),
+            )
+        return SyncStats(added, changed, removed, unchanged)
+
+    def _upsert(self, uid: str, record: Dict[str, Any], digest: str,
+                last_modified: Optional[str], now: float) -> None:
+        self.conn.execute(
+            """
+            INSERT INTO credentials (uid, title, content_hash, last_modified, data, first_seen, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (uid) DO UPDATE SET
+                title = excluded.title,
+                content_hash = excluded.content_hash,
+                last_modified = excluded.last_modified,
+                data = excluded.data,
+                updated_at = excluded.updated_at
+            """,
+            (uid, record.get("title"), digest, last_modified,
+             json.dumps(record, ensure_ascii=False), now, now),
+        )
+        self.conn.execute("DELETE FROM credential_facets WHERE uid = ?", (uid,))
+        self.conn.executemany(
+            "INSERT OR IGNORE INTO credential_facets (uid, facet, value) VALUES (?, ?, ?)",
+            [(uid, facet, value)
+             for facet, field in FACET_FIELDS.items()
+             for value in facet_values(record.get(field))],
+        )
+
+    def get(self, uid: str) -> Optional[Dict[str, Any]]:
+        """Return the raw record for ``uid``, or None if it is not stored."""
+        row = self.conn.execute("SELECT data FROM credentials WHERE uid = ?", (uid,)).fetchone()
+        return json.loads(row["data"]) if row else None
+
+    def query(self, **facets: Optional[str]) -> Iterator[Dict[str, Any]]:
+        """Yield raw records matching every given facet, ordered by title.
+
+        Facet values are matched case-insensitively, e.g.
+        ``store.query(type="certification", product="azure")``.
+
+        :raises ValueError: for a facet name not in ``FACET_FIELDS``
+        """
+        clauses = []
+        params: List[str] = []
+        for facet, value in facets.items():
+            if facet not in FACET_FIELDS:
+                raise ValueError(f"Unknown facet: {facet}")
+            if value is None:
+                continue
+            clauses.append("SELECT uid FROM credential_facets WHERE facet = ? AND value = ?")
+            params.extend([facet, value.strip().lower()])
+        sql = "SELECT data FROM credentials"
+        if clauses:
+            sql += " WHERE uid IN (" + " INTERSECT ".join(clauses) + ")"
+        sql += " ORDER BY title"
+        for row in self.conn.execute(sql, params):
+            yield json.loads(row["data"])
+
+    def count(self) -> int:
+        """Return the number of stored credentials."""
+        return self.conn.execute("SELECT COUNT(*) FROM credentials").fetchone()[0]
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Query the local credentials index.")
+    parser.add_argument("db", nargs="?", default=DEFAULT_DB_PATH,
+                        help=f"SQLite database written by --sync-db (default: {DEFAULT_DB_PATH})")
+    for facet in FACET_FIELDS:
+        parser.add_argument(f"--{facet}", help=f"Only credentials with this {facet}")
+    args = parser.parse_args(argv)
+
+    with CredentialStore(args.db) as store:
+        matches = 0
+        for record in store.query(**{facet: getattr(args, facet) for facet in FACET_FIELDS}):
+            print(f"{record.get('uid')} | {record.get('title')}")
+            matches += 1
+    print(f"{matches} matching credentials", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+"""
+Importable, indexed view of the Microsoft Learn exam catalog.
+
+The catalog is downloaded from
+https://learn.microsoft.com/api/catalog/?type=exams&locale=<locale>
+and kept as a JSON snapshot on disk.  Loading reuses the snapshot while it is
+younger than ``max_age`` seconds, so most callers never touch the network; a
+stale snapshot is still used if a refresh fails.
+
+Once loaded, :class:`ExamCatalog` answers lookups from in-memory indexes:
+
+    catalog = ExamCatalog.load()
+    catalog.get("AZ-104")["title"]
+    catalog.is_active("AZ-104")
+    catalog.codes(level="advanced", product="azure")
+
+Retired exams are recognised by :func:`is_retired`, a single precompiled
+matcher that combines the known retired exam codes with the retired exam
+families (prefixes such as ``98`` or ``MB6``).
+"""
+import json
+import os
+import re
+import sys
+import time
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+import requests
+
+from http_cache import HTTPCache
+from http_client import default_client
+
+CATALOG_URL_TEMPLATE = os.environ.get("LEARN_BASE_URL", "https://learn.microsoft.com") + "/api/catalog/?type=exams&locale={locale}"
+DEFAULT_SNAPSHOT_PATH = os.environ.get("EXAM_CATALOG_SNAPSHOT", "exam_catalog.json")
+DEFAULT_MAX_AGE = 24 * 60 * 60  # refresh the snapshot at most once a day
+
+# Add a user-agent header (many Microsoft endpoints require one)
+HEADERS = {"User-Agent": "Mozilla/5.0"}
+
+RETIRED_EXAMS = frozenset({
+    '70-333','70-334','70-339','70-345','70-357','70-410','70-411','70-412','70-413','70-414','70-417','70-461',
+    '70-462','70-463','70-464','70-465','70-466','70-467','70-480','70-483','70-486','70-487','70-537','70-705',
+    '70-740','70-741','70-742','70-743','70-744','70-745','70-761','70-762','70-764','70-765','70-767','70-768',
+    '70-777','70-778','70-779','70-797','77-601','77-602','77-881','77-882','77-883','77-884','77-885','77-887',
+    '77-888','98-349','98-361','98-364','98-365','98-366','98-367','98-368','98-375','98-381','98-382','98-383',
+    '98-388','AI-100','AZ-100','AZ-101','AZ-102','AZ-103','AZ-200','AZ-201','AZ-202','AZ-203','AZ-220','AZ-300',
+    'AZ-301','AZ-302','AZ-303','AZ-304','AZ-600','AZ-720','DA-100','DP-200','DP-201','MB-200','MB-210','MB-220',
+    'MB-300','MB-320','MB-340','MB-400','MB-600','MB-900','MB-901','MB2-716','MB6-894','MB6-897','MB6-898','MD-100',
+    'MD-101','MS-100','MS-101','MS-200','MS-201','MS-202','MS-203','MS-220','MS-300','MS-301','MS-302','MS-500',
+    'MS-600','MS-720','MS-740', 'DU-mmy'
+})
+
+# Exam families that are retired as a whole
+RETIRED_PREFIXES = ("MB6", "98", "77", "MO")
+
+# One alternation for both rules: any retired prefix, or an exact retired code.
+# The pattern is only tried at the start of the code (``match``); alternatives
+# are still tried one after another there, longest first.  Case-sensitive and
+# applied to the raw ``display_name``, like the checks it replaces.
+_RETIRED_PATTERN = re.compile(
+    "(?:" + "|".join(re.escape(p) for p in sorted(RETIRED_PREFIXES, key=len, reverse=True)) + ")"
+    "|(?:" + "|".join(re.escape(c) for c in sorted(RETIRED_EXAMS, key=len, reverse=True)) + r")\Z"
+)
+
+
+def is_retired(code: str) -> bool:
+    """Return True if ``code`` is a retired exam code or belongs to a retired exam family."""
+    return bool(code) and _RETIRED_PATTERN.match(code) is not None
+
+
+def fetch_catalog(locale: str = "en-us", session: Optional[requests.Session] = None,
+                  cache: Optional[HTTPCache] = None) -> Dict[str, Any]:
+    """Download the exam catalog JSON.
+
+    :param locale: Catalog locale (default: en-us)
+    :param session: Optional session to reuse pooled connections
+    :param cache: Optional conditional HTTP cache to revalidate against
+    :return: Parsed JSON response with an ``exams`` list
+    :raises requests.HTTPError: if the HTTP request returned an unsuccessful status code
+    :raises ValueError: if the response cannot be decoded as JSON
+    """
+    url = CATALOG_URL_TEMPLATE.format(locale=locale)
+    if cache is not None:
+        return cache.get_json(url, headers=HEADERS, session=session)
+    response = (session or default_client()).get(url, headers=HEADERS)
+    response.raise_for_status()  # Raise an error if the request failed
+    return response.json()
+
+
+def _lower_values(values: Any) -> List[str]:
+    if isinstance(values, str):
+        values = [values]
+    return [str(v).lower() for v in values or []]
+
+
+class ExamCatalog:
+    """Exam catalog indexed by code, level, product and active/retired status."""
+
+    def __init__(self, exams: Iterable[Dict[str, Any]], fetched_at: Optional[float] = None) -> None:
+        """Build the indexes for ``exams`` (the catalog's ``exams`` list).
+
+        :param exams: Raw exam records; ``display_name`` holds the exam code
+        :param fetched_at: When the data was downloaded (epoch seconds)
+        """
+        self.fetched_at = fetched_at
+        self.by_code: Dict[str, Dict[str, Any]] = {}
+        self.by_level: Dict[str, Set[str]] = {}
+        self.by_product: Dict[str, Set[str]] = {}
+        self.active: Set[str] = set()
+        self.retired: Set[str] = set()
+        for exam in exams:
+            display_name = exam.get("display_name") or ""
+            code = display_name.strip().upper()
+            if not code:
+                continue
+            self.by_code[code] = exam
+            (self.retired if is_retired(display_name) else self.active).add(code)
+            for level in _lower_values(exam.get("levels")):
+                self.by_level.setdefault(level, set()).add(code)
+            for product in _lower_values(exam.get("products")):
+                self.by_product.setdefault(product, set()).add(code)
+
+    def __len__(self) -> int:
+        return len(self.by_code)
+
+    def __contains__(self, code: str) -> bool:
+        return code.strip().upper() in self.by_code
+
+    def get(self, code: str) -> Optional[Dict[str, Any]]:
+        """Return the raw catalog record for ``code``, or None if it is unknown."""
+        return self.by_code.get(code.strip().upper())
+
+    def is_active(self, code: str) -> bool:
+        """Return True if ``code`` is in the catalog and not retired."""
+        return code.strip().upper() in self.active
+
+    def codes(self, level: Optional[str] = None, product: Optional[str] = None,
+              active: Optional[bool] = True) -> List[str]:
+        """Return the sorted exam codes matching every given filter.
+
+        :param level: Only exams at this level (e.g. ``intermediate``)
+        :param product: Only exams for this product (e.g. ``azure``)
+        :param active: True for active exams, False for retired ones, None for both
+        """
+        if active is None:
+            matches = set(self.by_code)
+        else:
+            matches = set(self.active if active else self.retired)
+        if level is not None:
+            matches &= self.by_level.get(level.lower(), set())
+        if product is not None:
+            matches &= self.by_product.get(product.lower(), set())
+        return sorted(matches)
+
+    @classmethod
+    def from_snapshot(cls, path: str = DEFAULT_SNAPSHOT_PATH) -> "ExamCatalog":
+        """Load a catalog from a snapshot written by :meth:`save_snapshot`.
+
+        :raises OSError: if the snapshot cannot be read
+        :raises ValueError: if the snapshot is not valid JSON
+        """
+        with open(path, encoding="utf-8") as f:
+            snapshot = json.load(f)
+        return cls(snapshot.get("exams", []), fetched_at=snapshot.get("fetched_at"))
+
+    @staticmethod
+    def save_snapshot(catalog_json: Dict[str, Any], path: str = DEFAULT_SNAPSHOT_PATH) -> None:
+        """Atomically write the raw catalog JSON to ``path`` with a fetch timestamp."""
+        snapshot = {"fetched_at": time.time(), "exams": catalog_json.get("exams", [])}
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(snapshot, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str = DEFAULT_SNAPSHOT_PATH, max_age: float = DEFAULT_MAX_AGE,
+             offline: bool = False, locale: str = "en-us",
+             cache: Optional[HTTPCache] = None) -> Optional["ExamCatalog"]:
+        """Return the catalog, refreshing the snapshot only when it is missing or stale.
+
+        :param path: Snapshot location
+        :param max_age: Seconds a snapshot stays fresh; 0 forces a refresh
+        :param offline: Never use the network; return None if there is no snapshot
+        :param locale: Catalog locale used for refreshes
+        :param cache: Optional conditional HTTP cache used for refreshes
+        :return: The catalog, or None if neither the snapshot nor the API is available
+        """
+        if os.path.exists(path) and (offline or time.time() - os.path.getmtime(path) < max_age):
+            try:
+                return cls.from_snapshot(path)
+            except (OSError, ValueError) as e:
+                print(f"Ignoring unreadable exam catalog snapshot {path}: {e}", file=sys.stderr)
+        if offline:
+            return None
+        try:
+            catalog_json = fetch_catalog(locale, cache=cache)
+        except (requests.RequestException, ValueError) as e:
+            print(f"Error fetching exam catalog: {e}", file=sys.stderr)
+            if os.path.exists(path):
+                print(f"Using stale exam catalog snapshot {path}", file=sys.stderr)
+                try:
+                    return cls.from_snapshot(path)
+                except (OSError, ValueError) as e:
+                    print(f"Ignoring unreadable exam catalog snapshot {path}: {e}", file=sys.stderr)
+            return None
+        cls.save_snapshot(catalog_json, path)
+        return cls(catalog_json.get("exams", []), fetched_at=time.time())
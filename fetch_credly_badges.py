@@ -3,140 +3,462 @@
 Script to fetch Credly digital badges and convert to CSV format.
 
 Usage:
-    python fetch_credly_badges.py <username> [--output <output.csv>]
+    python fetch_credly_badges.py <username> [<username> ...] [--output <output.csv>]
 
 Example:
     python fetch_credly_badges.py guygregory --output credly_badges.csv
 
 If no output filename is provided, the script writes to credly_badges_<username>.csv.
 
-The script makes a GET request to the Credly badges API endpoint:
+The script makes GET requests to the Credly badges API endpoint:
 https://www.credly.com/users/<username>/badges.json
 
-The API returns JSON containing a `data` array with badge details. The script
+The API returns JSON containing a `data` array with badge details and a
+`metadata` object with the number of pages.  Once the first page is in, the
+remaining pages are fetched concurrently (`--page-workers`) and their badges
+are extracted as they arrive, skipping any badge ID already seen.  The script
 writes a CSV file containing the badge title, issuer, and the date earned.
 
+Several usernames are processed `--concurrency` at a time, into one combined
+CSV with a `Username` column (`--output`) or one CSV per user (`--output-dir`).
+With `--history-db` the badges are also appended to the SQLite history store
+of `history_store.py`.
+
+With `--watch` the script keeps running and polls the users on adaptive
+schedules under a global request budget, rewriting a CSV only when that
+user's badges changed; see `watch_daemon.py`.
+
 Note: Internet access is required for this script to work. The API endpoint is
 public but may require appropriate headers to avoid rate limiting.
 """
 import argparse
+import contextlib
 import csv
 import os
 import sys
-from typing import List, Dict
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from typing import Any, Deque, Dict, Iterable, Iterator, List, Optional, Tuple
 import requests
 from datetime import datetime
 
-API_ENDPOINT_TEMPLATE = "https://www.credly.com/users/{username}/badges.json"
+from build_timeline_data import refresh_timeline
+from http_cache import HTTPCache, add_cache_arguments, cache_from_args
+from history_store import BADGES, HistoryStore, append_rows
+from http_client import (add_client_arguments, configure_from_args, create_session, default_client,
+                         print_latency_summary)
+from metrics import add_metrics_arguments, collect, stage, timed
+from records import BadgeRecord, load_known
+from watch_daemon import (Watcher, add_watch_arguments, policy_from_args, refresh_dashboard, run_daemon,
+                          watch_session)
+
+# CREDLY_BASE_URL points the script at another host, e.g. the benchmark stub server
+CREDLY_BASE_URL = os.environ.get("CREDLY_BASE_URL", "https://www.credly.com")
+API_ENDPOINT_TEMPLATE = CREDLY_BASE_URL + "/users/{username}/badges.json"
+FIELDNAMES = BadgeRecord.fieldnames()
+DEFAULT_PAGE_WORKERS = 4
+DEFAULT_CONCURRENCY = 4
 
 
-def fetch_credly_badges(username: str) -> Dict:
-    """Fetch Credly badges JSON from the public API.
+def badges_url(username: str, page: int = 1) -> str:
+    """Return the Credly badges API URL for page ``page`` of ``username``'s profile."""
+    url = API_ENDPOINT_TEMPLATE.format(username=username)
+    return url if page == 1 else f"{url}?page={page}"
+
+
+def fetch_credly_badges(username: str, session: Optional[requests.Session] = None,
+                        cache: Optional[HTTPCache] = None, page: int = 1) -> Dict:
+    """Fetch one page of Credly badges JSON from the public API.
 
     :param username: The Credly username
+    :param session: Optional session to reuse pooled connections
+    :param cache: Optional conditional HTTP cache to revalidate against
+    :param page: Page number, starting at 1
     :return: Parsed JSON response
     :raises requests.HTTPError: if the HTTP request returned an unsuccessful status code
     :raises ValueError: if the response cannot be decoded as JSON
     """
-    url = API_ENDPOINT_TEMPLATE.format(username=username)
+    url = badges_url(username, page)
     headers = {
         # Provide a User-Agent to avoid potential filtering of generic requests
         "User-Agent": "Mozilla/5.0 (compatible; CredlyBadgeFetcher/1.0)",
         "Accept": "application/json"
     }
-    response = requests.get(url, headers=headers)
+    if cache is not None:
+        return cache.get_json(url, headers=headers, session=session)
+    response = (session or default_client()).get(url, headers=headers)
     response.raise_for_status()
-    return response.json()
+    with stage("json_decode"):
+        return response.json()
+
+
+def iter_badge_pages(username: str, session: Optional[requests.Session] = None,
+                     cache: Optional[HTTPCache] = None, max_workers: int = DEFAULT_PAGE_WORKERS,
+                     first_page: Optional[Dict] = None) -> Iterator[Tuple[int, Dict]]:
+    """Yield ``(page number, JSON)`` for every page of a profile's badges, in page order.
 
+    The ``metadata.total_pages`` of the first page gives the remaining pages,
+    which are fetched concurrently with at most ``max_workers`` in flight or
+    waiting to be consumed.  Without a page count the ``next_page_url`` chain
+    is followed one page at a time.
 
-def extract_badges(badges_json: Dict) -> List[Dict[str, str]]:
+    :param username: The Credly username
+    :param session: Optional session; one sized for ``max_workers`` is created otherwise
+    :param cache: Optional conditional HTTP cache to revalidate each page against
+    :param max_workers: Maximum concurrent page requests
+    :param first_page: First page, if the caller already fetched it
     """
-    Extract a list of badges from the Credly JSON.
+    max_workers = max(1, max_workers)
+    with contextlib.ExitStack() as stack:
+        if session is None:
+            session = stack.enter_context(create_session(max_workers))
+        data = first_page if first_page is not None else fetch_credly_badges(username, session, cache)
+        yield 1, data
+        metadata = data.get("metadata") or {}
+        total_pages = metadata.get("total_pages")
+        if isinstance(total_pages, int) and total_pages > 1:
+            with ThreadPoolExecutor(max_workers=max_workers) as pool:
+                pending: Deque[Tuple[int, Future]] = deque()
+                for page in range(2, total_pages + 1):
+                    if len(pending) >= max_workers:
+                        number, future = pending.popleft()
+                        yield number, future.result()
+                    pending.append((page, pool.submit(fetch_credly_badges, username, session, cache, page)))
+                # Futures are consumed in submission order, which keeps pages ordered
+                while pending:
+                    number, future = pending.popleft()
+                    yield number, future.result()
+            return
+
+        page = 1
+        while metadata.get("next_page_url"):
+            page += 1
+            data = fetch_credly_badges(username, session, cache, page)
+            yield page, data
+            metadata = data.get("metadata") or {}
+
+
+def fetch_badge_pages(username: str, session: Optional[requests.Session] = None,
+                      cache: Optional[HTTPCache] = None,
+                      max_workers: int = DEFAULT_PAGE_WORKERS) -> List[Tuple[int, Dict]]:
+    """Fetch every page of a profile's badges; see :func:`iter_badge_pages`."""
+    return list(iter_badge_pages(username, session, cache, max_workers))
+
+
+def badge_row(badge: Dict[str, Any]) -> Optional[BadgeRecord]:
+    """Return the record for one badge of the Credly JSON, or None if it has no name."""
+    # Extract badge information
+    badge_name = badge.get('badge_template', {}).get('name', '')
+
+    # Extract issuer name from the correct location in the JSON structure
+    issuer_entities = badge.get('issuer', {}).get('entities', [])
+    issuer_name = ''
+    if issuer_entities:
+        # Get the first entity's name (typically the primary issuer)
+        issuer_name = issuer_entities[0].get('entity', {}).get('name', '')
+
+    # Extract earned date - Credly typically uses 'issued_at' or 'earned_at'
+    issued_at = badge.get('issued_at', '') or badge.get('earned_at', '')
+
+    # Convert ISO datetime to date only (YYYY-MM-DD)
+    badge_date = ""
+    if issued_at:
+        try:
+            # Parse ISO datetime and extract date
+            dt = datetime.fromisoformat(issued_at.replace('Z', '+00:00'))
+            badge_date = dt.strftime('%Y-%m-%d')
+        except (ValueError, AttributeError):
+            # If parsing fails, try to extract date part directly
+            badge_date = issued_at.split("T")[0] if "T" in issued_at else issued_at
+
+    if not badge_name:  # Only add badges with valid names
+        return None
+    return BadgeRecord.create(badge_name, issuer_name, badge_date)
+
+
+def iter_badges(pages: Iterable[Dict]) -> Iterator[BadgeRecord]:
+    """Yield the records of the badges on ``pages`` as each page arrives.
+
+    A badge whose ``id`` was already seen is skipped, so a badge that moves
+    to the next page while the pages are fetched is written only once.
+    """
+    seen = set()
+    for page in pages:
+        # Credly API typically returns badges in a 'data' array
+        for badge in page.get('data', []):
+            badge_id = badge.get('id')
+            if badge_id is not None:
+                if badge_id in seen:
+                    continue
+                seen.add(badge_id)
+            row = badge_row(badge)
+            if row:
+                yield row
+
+
+@timed("badges.extract")
+def extract_badges(badges_json: Dict) -> List[BadgeRecord]:
+    """
+    Extract a list of badges from one page of the Credly JSON.
 
     :param badges_json: Badges JSON as returned by the API
-    :return: List of dictionaries with badge title, issuer and date
+    :return: List of badge records with title, issuer and date
     """
-    badges: List[Dict[str, str]] = []
-    
-    # Credly API typically returns badges in a 'data' array
-    raw_badges = badges_json.get('data', [])
-    
-    for badge in raw_badges:
-        # Extract badge information
-        badge_name = badge.get('badge_template', {}).get('name', '')
-        
-        # Extract issuer name from the correct location in the JSON structure
-        issuer_entities = badge.get('issuer', {}).get('entities', [])
-        issuer_name = ''
-        if issuer_entities:
-            # Get the first entity's name (typically the primary issuer)
-            issuer_name = issuer_entities[0].get('entity', {}).get('name', '')
-        
-        # Extract earned date - Credly typically uses 'issued_at' or 'earned_at'
-        issued_at = badge.get('issued_at', '') or badge.get('earned_at', '')
-        
-        # Convert ISO datetime to date only (YYYY-MM-DD)
-        badge_date = ""
-        if issued_at:
-            try:
-                # Parse ISO datetime and extract date
-                dt = datetime.fromisoformat(issued_at.replace('Z', '+00:00'))
-                badge_date = dt.strftime('%Y-%m-%d')
-            except (ValueError, AttributeError):
-                # If parsing fails, try to extract date part directly
-                badge_date = issued_at.split("T")[0] if "T" in issued_at else issued_at
-        
-        if badge_name:  # Only add badges with valid names
-            badges.append({
-                "Badge Title": badge_name,
-                "Issuer": issuer_name,
-                "Badge Date": badge_date
-            })
-    
-    return badges
-
-
-def write_csv(badges: List[Dict[str, str]], filename: str) -> None:
-    """Write a list of badge dictionaries to a CSV file.
-
-    :param badges: List of badge info dictionaries
+    return list(iter_badges([badges_json]))
+
+
+def collect_badges(username: str, pages: Iterable[Tuple[int, Dict]],
+                   cache: Optional[HTTPCache] = None) -> Tuple[List[BadgeRecord], bool]:
+    """Extract the badges of ``pages`` while they stream in.
+
+    :return: The badge rows and whether every page was answered ``304 Not Modified``
+    """
+    numbers: List[int] = []
+
+    def page_data() -> Iterator[Dict]:
+        for number, data in pages:
+            numbers.append(number)
+            yield data
+
+    with stage("badges.extract") as timer:
+        badges = list(iter_badges(page_data()))
+        timer.records = len(badges)
+    unchanged = cache is not None and all(cache.not_modified(badges_url(username, number)) for number in numbers)
+    return badges, unchanged
+
+
+@timed("badges.write_csv", records=lambda _, badges, *args, **kwargs: len(badges))
+def write_csv(badges: List[BadgeRecord], filename: str) -> None:
+    """Write a list of badge records to a CSV file.
+
+    :param badges: List of badge records
     :param filename: Output CSV filename
     """
-    fieldnames = ["Badge Title", "Issuer", "Badge Date"]
     with open(filename, mode="w", encoding="utf-8", newline="") as f:
-        writer = csv.DictWriter(f, fieldnames=fieldnames)
-        writer.writeheader()
-        for badge in badges:
-            writer.writerow(badge)
+        writer = csv.writer(f)
+        writer.writerow(FIELDNAMES)
+        writer.writerows(badge.row() for badge in badges)
 
 
-def main(argv: List[str] = None) -> int:
-    parser = argparse.ArgumentParser(description="Extract badges from a Credly public profile.")
-    parser.add_argument("username", help="Credly username")
-    parser.add_argument("--output", help="Output CSV filename")
-    args = parser.parse_args(argv)
+@timed("badges.write_csv", records=lambda rows, *args, **kwargs: rows)
+def write_combined_csv(results: Iterable[Tuple[str, List[BadgeRecord]]], filename: str) -> int:
+    """Write the badges of many users to one CSV keyed by username.
+
+    :param results: Iterable of ``(username, badges)`` pairs
+    :param filename: Output CSV filename
+    :return: Number of badge rows written
+    """
+    rows = 0
+    with open(filename, mode="w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["Username"] + FIELDNAMES)
+        for username, badges in results:
+            writer.writerows((username, *badge.row()) for badge in badges)
+            rows += len(badges)
+    return rows
+
+
+def run(args: argparse.Namespace, cache: Optional[HTTPCache] = None,
+        session: Optional[requests.Session] = None,
+        pages: Optional[Iterable[Tuple[int, Dict]]] = None) -> int:
+    """Fetch the badges for the parsed command line arguments and write the CSV.
 
+    ``pages`` skips the download when the caller already fetched the badge
+    pages (``run_pipeline.py`` fetches them while the transcript is checked).
+    """
+    if len(args.username) > 1:
+        return run_many(args, cache, session)
+    username = args.username[0]
     # Determine output filename
-    output_file = args.output or f"credly_badges_{args.username}.csv"
+    output_file = args.output or f"credly_badges_{username}.csv"
 
+    if pages is None:
+        pages = iter_badge_pages(username, session, cache, args.page_workers)
     try:
-        badges_json = fetch_credly_badges(args.username)
-    except requests.HTTPError as e:
+        badges, unchanged = collect_badges(username, pages, cache)
+    except requests.RequestException as e:
         print(f"HTTP error fetching badges: {e}", file=sys.stderr)
         return 1
     except ValueError as e:
         print(f"Error decoding JSON: {e}", file=sys.stderr)
         return 1
 
-    badges = extract_badges(badges_json)
     if not badges:
         print("No badges found in the profile.", file=sys.stderr)
         return 1
 
+    if args.history_db:
+        append_rows(args.history_db, BADGES, username, badges)
+    if unchanged and os.path.exists(output_file):
+        print(f"Badges not modified since last run; keeping {output_file}")
+        return 0
     write_csv(badges, output_file)
     print(f"Wrote {len(badges)} badge records to {output_file}")
+    if not args.no_timeline:
+        timeline = refresh_timeline(output_file)
+        if timeline:
+            print(f"Rebuilt {timeline}")
+    return 0
+
+
+def run_many(args: argparse.Namespace, cache: Optional[HTTPCache] = None,
+             session: Optional[requests.Session] = None) -> int:
+    """Fetch the badges of several users, ``--concurrency`` at a time.
+
+    With ``--output`` all badges go to one CSV with a leading ``Username``
+    column, in the order the users were given; otherwise each user gets a
+    ``credly_badges_<username>.csv`` in ``--output-dir``.
+    """
+    usernames = list(dict.fromkeys(args.username))
+    concurrency = max(1, args.concurrency)
+    page_workers = max(1, args.page_workers)
+    results: Dict[str, List[BadgeRecord]] = {}
+    failures = 0
+    if not args.output:
+        os.makedirs(args.output_dir, exist_ok=True)
+    with contextlib.ExitStack() as stack:
+        if session is None:
+            session = stack.enter_context(create_session(concurrency * page_workers))
+        history = stack.enter_context(HistoryStore(args.history_db)) if args.history_db else None
+        pool = stack.enter_context(ThreadPoolExecutor(max_workers=concurrency))
+        futures = {
+            pool.submit(collect_badges, username, iter_badge_pages(username, session, cache, page_workers), cache):
+                username
+            for username in usernames
+        }
+        for future in as_completed(futures):
+            username = futures[future]
+            try:
+                badges, unchanged = future.result()
+            except requests.RequestException as e:
+                print(f"{username}: HTTP error fetching badges: {e}", file=sys.stderr)
+                failures += 1
+                continue
+            except ValueError as e:
+                print(f"{username}: Error decoding JSON: {e}", file=sys.stderr)
+                failures += 1
+                continue
+            if not badges:
+                print(f"{username}: No badges found in the profile.", file=sys.stderr)
+                failures += 1
+                continue
+            results[username] = badges
+            if history is not None:
+                history.append(BADGES, username, badges)
+            if not args.output:
+                output_file = os.path.join(args.output_dir, f"credly_badges_{username}.csv")
+                if not (unchanged and os.path.exists(output_file)):
+                    write_csv(badges, output_file)
+
+    if args.output:
+        rows = write_combined_csv(((username, results[username]) for username in usernames if username in results),
+                                  args.output)
+        print(f"Wrote {rows} badge records for {len(results)} users to {args.output}")
+    else:
+        print(f"Wrote badge records for {len(results)} users to {args.output_dir}")
+    if failures:
+        print(f"{failures} of {len(usernames)} users failed.", file=sys.stderr)
+        return 1
     return 0
 
 
+def run_watch(args: argparse.Namespace, cache: Optional[HTTPCache] = None) -> int:
+    """Poll the users of the parsed command line arguments until interrupted (``--watch``)."""
+    usernames = list(dict.fromkeys(args.username))
+    single = len(usernames) == 1
+    combined = None if single else args.output
+    if not single and not combined:
+        os.makedirs(args.output_dir, exist_ok=True)
+
+    def output_file(username: str) -> str:
+        if single:
+            return args.output or f"credly_badges_{username}.csv"
+        return os.path.join(args.output_dir, f"credly_badges_{username}.csv")
+
+    if combined:
+        known = load_known(combined, BadgeRecord)
+    else:
+        known = {}
+        for username in usernames:
+            known.update(load_known(output_file(username), BadgeRecord, username))
+    snapshot: Dict[str, List[BadgeRecord]] = dict(known)
+
+    concurrency = min(max(1, args.concurrency), len(usernames))
+    page_workers = max(1, args.page_workers)
+    with contextlib.ExitStack() as stack:
+        session = stack.enter_context(watch_session(args, concurrency * page_workers))
+        history = stack.enter_context(HistoryStore(args.history_db)) if args.history_db else None
+
+        def fetch(username: str) -> List[BadgeRecord]:
+            badges, _ = collect_badges(username, iter_badge_pages(username, session, cache, page_workers), cache)
+            return badges
+
+        def on_change(username: str, badges: List[BadgeRecord]) -> None:
+            if not badges:
+                print(f"{username}: No badges found in the profile.", file=sys.stderr, flush=True)
+                return
+            if history is not None:
+                history.append(BADGES, username, badges)
+            if combined:
+                snapshot[username] = badges
+                print(f"{username}: {len(badges)} badges changed", flush=True)
+                return
+            write_csv(badges, output_file(username))
+            print(f"{username}: Wrote {len(badges)} badge records to {output_file(username)}", flush=True)
+            if args.refresh_dashboard:
+                refresh_dashboard(badges_path=output_file(username))
+
+        def flush() -> None:
+            if combined:
+                rows = write_combined_csv(((name, snapshot[name]) for name in usernames if name in snapshot), combined)
+                print(f"Wrote {rows} badge records for {len(snapshot)} users to {combined}", flush=True)
+
+        watcher = Watcher(usernames, fetch, on_change, policy_from_args(args), concurrency, known, flush)
+        stats = run_daemon(watcher)
+    return 1 if stats.failures and stats.failures == stats.polls else 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """Return the command line parser (shared with ``run_pipeline.py``)."""
+    parser = argparse.ArgumentParser(description="Extract badges from Credly public profiles.")
+    parser.add_argument("username", nargs="+", help="Credly username; several are fetched concurrently")
+    parser.add_argument("--output", help="Output CSV filename (one combined CSV for several users)")
+    parser.add_argument("--output-dir", default=".",
+                        help="Directory for per-user CSVs when several users are given without --output (default: .)")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY,
+                        help=f"Users fetched at once (default: {DEFAULT_CONCURRENCY})")
+    parser.add_argument("--page-workers", type=int, default=DEFAULT_PAGE_WORKERS,
+                        help=f"Concurrent page requests per user (default: {DEFAULT_PAGE_WORKERS})")
+    parser.add_argument("--history-db", metavar="PATH",
+                        help="Also append the badges to this SQLite history store (see history_store.py)")
+    parser.add_argument("--no-timeline", action="store_true",
+                        help="Do not rebuild an existing timeline.json after rewriting the dashboard's CSV")
+    add_watch_arguments(parser)
+    add_cache_arguments(parser)
+    add_client_arguments(parser)
+    add_metrics_arguments(parser)
+    return parser
+
+
+def main(argv: List[str] = None) -> int:
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.refresh_dashboard and (len(args.username) > 1 or not args.watch):
+        parser.error("--refresh-dashboard needs --watch and a single username")
+
+    cache = cache_from_args(args)
+    configure_from_args(args)
+    try:
+        with collect(args, "fetch_credly_badges", cache):
+            if args.watch:
+                return run_watch(args, cache)
+            return run(args, cache)
+    finally:
+        if cache is not None:
+            cache.evict()
+            print(cache.summary(), file=sys.stderr)
+        print_latency_summary()
+
+
 if __name__ == "__main__":
     sys.exit(main())
\ No newline at end of file
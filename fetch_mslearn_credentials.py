@@ -2,33 +2,67 @@
 Python script to fetch all credentials from the Microsoft Learn content browser API
 and write the results to a CSV file.
 
-The API returns results in pages (30 items per page by default).  Each response
-includes a `@nextLink` field pointing at the next page.  This script follows
-those links until there are no more pages and then writes the aggregated
-results to a CSV file.  Lists in the JSON response (for example, roles,
+The API returns results in pages (30 items per page by default, see
+`--page-size`).  Each response includes a `@nextLink` field pointing at the
+next page and a `count` of all matching items.  Once the count is known the
+remaining pages are fetched concurrently (`--max-workers`) and reassembled in
+order; if it is missing the script follows the `@nextLink` chain one page at
+a time.  Pages are flattened and streamed to the CSV file as they arrive, so
+the whole catalog is never held in memory.  With `--sync-db` the records are
+instead upserted into a local SQLite index (see `credential_store.py`).  Lists in the JSON response (for example, roles,
 products and exams) are converted to semicolon-separated strings in the CSV.
 
+Responses are revalidated against an on-disk conditional HTTP cache (see
+``http_cache.py``); when every page comes back ``304 Not Modified`` the
+existing CSV is left untouched.
+
 Note: Running this script requires network access to `learn.microsoft.com`.  If
 your environment blocks outbound HTTP requests to that host, you will see
 HTTP 403 errors.
 """
 
+import argparse
 import csv
-import json
-from typing import Any, Dict, Iterable, List, Optional, Tuple
+import os
+import sys
+import tempfile
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Deque, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+from urllib.parse import parse_qsl, quote, urlencode, urljoin, urlsplit, urlunsplit
 
 import requests
 
+from credential_store import CredentialStore
+from http_cache import HTTPCache, add_cache_arguments, cache_from_args
+from http_client import (add_client_arguments, configure_from_args, create_session, default_client,
+                         print_latency_summary)
+from metrics import add_metrics_arguments, collect, stage
+from records import CredentialRecord, flatten_value
+
+
+BASE_URL = os.environ.get("LEARN_BASE_URL", "https://learn.microsoft.com")
+DEFAULT_PAGE_SIZE = 30
+DEFAULT_MAX_WORKERS = 4
+SCHEMA_SORTED = "sorted"
+SCHEMA_STABLE = "stable"
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (compatible; MSLearnScraper/1.0)"
+}
 
-def build_initial_query() -> Tuple[str, List[Tuple[str, str]]]:
+
+def build_initial_query(page_size: int = DEFAULT_PAGE_SIZE) -> Tuple[str, List[Tuple[str, str]]]:
     """Constructs the initial URL and query parameters for the API request.
 
+    Args:
+        page_size: Number of items requested per page (the `$top` parameter).
+            Larger pages mean fewer round trips; the server may cap the value.
+
     Returns a tuple of `(url, params)` where `url` is the full endpoint and
     `params` is a list of key-value pairs for repeated query parameters.
     """
-    base_url = "https://learn.microsoft.com"
     endpoint = "/api/contentbrowser/search/credentials"
-    url = f"{base_url}{endpoint}"
+    url = f"{BASE_URL}{endpoint}"
 
     # Use OData syntax to filter by credential type.  Here we pull only
     # examination credentials.  Remove the filter if you want all credential
@@ -44,7 +78,7 @@ def build_initial_query() -> Tuple[str, List[Tuple[str, str]]]:
         ("locale", "en-us"),
         ("$filter", filter_expr),
         ("$orderBy", "title"),
-        ("$top", "30"),  # request up to 30 items per page
+        ("$top", str(page_size)),  # request up to page_size items per page
     ]
     # Specify facets to include in the response.  These help control which
     # aggregations are returned but are not strictly required to collect
@@ -55,37 +89,149 @@ def build_initial_query() -> Tuple[str, List[Tuple[str, str]]]:
     return url, params
 
 
-def fetch_all_credentials(url: str, params: List[Tuple[str, str]]) -> List[Dict[str, Any]]:
-    """Iteratively fetches all pages of credentials from the API.
+def fetch_page(url: str, params: Optional[List[Tuple[str, str]]] = None,
+               cache: Optional[HTTPCache] = None,
+               session: Optional[requests.Session] = None) -> Dict[str, Any]:
+    """Fetches and decodes a single page of search results.
 
     Args:
-        url: The initial API URL (without query string).
-        params: List of query parameter tuples to include on the first request.
+        url: Page URL, with or without a query string.
+        params: Optional query parameter tuples to append to `url`.
+        cache: Optional conditional HTTP cache used to revalidate the page.
+        session: Optional session to reuse pooled connections.
 
     Returns:
-        A list of credential dictionaries representing all pages of results.
+        The decoded JSON page.
     """
-    base_url = "https://learn.microsoft.com"
-    headers = {
-        "User-Agent": "Mozilla/5.0 (compatible; MSLearnScraper/1.0)"
-    }
-    results: List[Dict[str, Any]] = []
-    next_url: Optional[str] = url
-    # Only include params on the very first request.  Subsequent requests use
-    # the `@nextLink` URL which already contains the query string.
-    first_call = True
-    while next_url:
-        if first_call:
-            resp = requests.get(next_url, params=params, headers=headers)
-            first_call = False
+    with stage("credentials.page") as timer:
+        if cache is not None:
+            data = cache.get_json(url, headers=HEADERS, params=params, session=session)
         else:
-            resp = requests.get(next_url, headers=headers)
-        resp.raise_for_status()
-        data = resp.json()
-        results.extend(data.get("results", []))
+            resp = (session or default_client()).get(url, params=params, headers=HEADERS)
+            resp.raise_for_status()
+            with stage("json_decode"):
+                data = resp.json()
+        timer.records = len(data.get("results", []))
+    return data
+
+
+def skip_page_urls(next_link: str, stride: int, total: int) -> List[str]:
+    """Derives the URLs of all remaining pages from the first `@nextLink`.
+
+    The link's `$skip` value is rewritten for every remaining offset so that
+    any other query parameters the server added are preserved.
+
+    Args:
+        next_link: The `@nextLink` of the first page (relative or absolute).
+        stride: Number of items per page actually returned by the server.
+        total: Total number of items reported by the server.
+
+    Returns:
+        Absolute page URLs in page order, or an empty list if the link does
+        not use `$skip` paging.
+    """
+    parts = urlsplit(urljoin(BASE_URL, next_link))
+    query = parse_qsl(parts.query, keep_blank_values=True)
+    if stride <= 0 or not any(key == "$skip" for key, _ in query):
+        return []
+    urls = []
+    for skip in range(stride, total, stride):
+        page_query = [(key, str(skip) if key == "$skip" else value) for key, value in query]
+        urls.append(urlunsplit(parts._replace(query=urlencode(page_query, quote_via=quote, safe="$(),:'"))))
+    return urls
+
+
+def iter_credential_pages(url: str, params: List[Tuple[str, str]],
+                          cache: Optional[HTTPCache] = None,
+                          max_workers: int = 1) -> Iterator[List[Dict[str, Any]]]:
+    """Yields the `results` of every page of credentials, in page order.
+
+    With `max_workers` greater than one, the total `count` from the first
+    response is used to fetch the remaining pages concurrently.  At most
+    `max_workers` pages are in flight or waiting to be consumed, so memory
+    stays bounded no matter how large the catalog is.  When the total is
+    unknown, or the `@nextLink` does not page by `$skip`, the `@nextLink`
+    chain is followed one page at a time.
+
+    Args:
+        url: The initial API URL (without query string).
+        params: List of query parameter tuples to include on the first request.
+        cache: Optional conditional HTTP cache used to revalidate each page.
+        max_workers: Maximum number of concurrent page requests.
+
+    Yields:
+        The list of credential dictionaries from each page.
+    """
+    with create_session(max(1, max_workers)) as session:
+        data = fetch_page(url, params, cache, session)
+        first_page: List[Dict[str, Any]] = data.get("results", [])
         next_link = data.get("@nextLink")
-        next_url = f"{base_url}{next_link}" if next_link else None
-    return results
+        total = data.get("count")
+        yield first_page
+
+        page_urls: List[str] = []
+        if next_link and max_workers > 1 and isinstance(total, int):
+            page_urls = skip_page_urls(next_link, len(first_page), total)
+        if page_urls:
+            with ThreadPoolExecutor(max_workers=max_workers) as pool:
+                pending: Deque[Future] = deque()
+                for page_url in page_urls:
+                    if len(pending) >= max_workers:
+                        yield pending.popleft().result().get("results", [])
+                    pending.append(pool.submit(fetch_page, page_url, None, cache, session))
+                # Futures are consumed in submission order, which keeps pages ordered
+                while pending:
+                    yield pending.popleft().result().get("results", [])
+            return
+
+        # Subsequent requests use the `@nextLink` URL which already contains
+        # the query string, so params are only sent on the first request.
+        while next_link:
+            data = fetch_page(urljoin(BASE_URL, next_link), None, cache, session)
+            yield data.get("results", [])
+            next_link = data.get("@nextLink")
+
+
+def iter_credentials(url: str, params: List[Tuple[str, str]],
+                     cache: Optional[HTTPCache] = None,
+                     max_workers: int = 1) -> Iterator[CredentialRecord]:
+    """Yields every credential of the catalog as a compact flattened record.
+
+    Pages are fetched as described in `iter_credential_pages`; each raw page
+    is released as soon as its records have been flattened.
+
+    Args:
+        url: The initial API URL (without query string).
+        params: List of query parameter tuples to include on the first request.
+        cache: Optional conditional HTTP cache used to revalidate each page.
+        max_workers: Maximum number of concurrent page requests.
+
+    Yields:
+        One `CredentialRecord` per credential, in catalog order.
+    """
+    for page in iter_credential_pages(url, params, cache, max_workers):
+        for record in page:
+            yield CredentialRecord.from_json(record)
+
+
+def fetch_all_credentials(url: str, params: List[Tuple[str, str]],
+                          cache: Optional[HTTPCache] = None,
+                          max_workers: int = 1) -> List[CredentialRecord]:
+    """Fetches all pages of credentials from the API.
+
+    See `iter_credentials`; this collects the flattened records into a single
+    list rather than keeping the raw JSON of the whole crawl.
+
+    Args:
+        url: The initial API URL (without query string).
+        params: List of query parameter tuples to include on the first request.
+        cache: Optional conditional HTTP cache used to revalidate each page.
+        max_workers: Maximum number of concurrent page requests.
+
+    Returns:
+        A list of credential records representing all pages of results.
+    """
+    return list(iter_credentials(url, params, cache, max_workers))
 
 
 def flatten_record(record: Dict[str, Any]) -> Dict[str, Any]:
@@ -93,58 +239,177 @@ def flatten_record(record: Dict[str, Any]) -> Dict[str, Any]:
 
     List values are converted to semicolon-separated strings.  Nested
     dictionaries are JSON-serialized.  Primitive types are passed through.
+    See `records.flatten_value`.
     """
-    flat: Dict[str, Any] = {}
-    for key, value in record.items():
-        if isinstance(value, list):
-            # For lists, join simple primitives or extract nested dictionary
-            # identifiers to produce a readable string.
-            items: List[str] = []
-            for elem in value:
-                if isinstance(elem, dict):
-                    # Use display_name if present, otherwise uid or the
-                    # dictionary JSON representation
-                    if "display_name" in elem:
-                        items.append(str(elem["display_name"]))
-                    elif "uid" in elem:
-                        items.append(str(elem["uid"]))
-                    else:
-                        items.append(json.dumps(elem, ensure_ascii=False))
-                else:
-                    items.append(str(elem))
-            flat[key] = ";".join(items)
-        elif isinstance(value, dict):
-            flat[key] = json.dumps(value, ensure_ascii=False)
-        else:
-            flat[key] = value
-    return flat
+    return {key: flatten_value(value) for key, value in record.items()}
+
+
+def _rewrite_columns(src_path: str, dst_path: str, columns: List[str], fieldnames: List[str]) -> None:
+    """Copies the rows of a CSV laid out as `columns` to `dst_path` with header `fieldnames`.
+
+    The header row of `src_path` is skipped.  Rows are streamed one at a time;
+    trailing columns missing from a short row are left empty.
+    """
+    positions = {name: index for index, name in enumerate(columns)}
+    with open(src_path, newline="", encoding="utf-8") as src, \
+            open(dst_path, "w", newline="", encoding="utf-8") as dst:
+        reader = csv.reader(src)
+        writer = csv.writer(dst)
+        next(reader, None)
+        writer.writerow(fieldnames)
+        for row in reader:
+            writer.writerow([
+                row[positions[name]] if name in positions and positions[name] < len(row) else ""
+                for name in fieldnames
+            ])
 
 
-def write_csv(records: Iterable[Dict[str, Any]], path: str) -> None:
-    """Writes a sequence of flattened credential records to a CSV file."""
-    # Flatten all records first so we know the union of all keys
-    flattened = [flatten_record(rec) for rec in records]
-    # Determine the union of keys across all records.  Order fields
-    # alphabetically to provide a consistent header.
-    fieldnames: List[str] = sorted({key for rec in flattened for key in rec.keys()})
-    with open(path, "w", newline="", encoding="utf-8") as f:
-        writer = csv.DictWriter(f, fieldnames=fieldnames)
-        writer.writeheader()
-        writer.writerows(flattened)
+def write_csv(records: Iterable[Union[Dict[str, Any], CredentialRecord]], path: str, schema: str = SCHEMA_SORTED,
+              fieldnames: Optional[List[str]] = None) -> int:
+    """Streams credential records to a CSV file with bounded memory.
 
+    Each record is flattened (unless it already is a `CredentialRecord`) and
+    written as soon as it arrives, so `records` may be a lazy generator over
+    pages.  The header starts with `fieldnames`
+    (if given) followed by the keys of the first record.  Columns that only
+    appear in later records are appended, and once the stream ends the spill
+    file is rewritten in a single streaming pass with the full header.
 
-def main() -> None:
-    url, params = build_initial_query()
+    Args:
+        records: Raw credential records or `CredentialRecord`s, typically one
+            page at a time.
+        path: Output CSV path.  It is replaced atomically once writing is done.
+        schema: `SCHEMA_SORTED` orders columns alphabetically (the historic
+            output); `SCHEMA_STABLE` keeps declared and first-seen order, which
+            avoids the rewrite pass unless new columns show up late.
+        fieldnames: Optional declared leading columns.
+
+    Returns:
+        The number of records written.
+    """
+    header: List[str] = list(fieldnames or [])
+    known = set(header)
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, spill_path = tempfile.mkstemp(prefix=".credentials-", suffix=".csv", dir=directory)
+    count = 0
+    try:
+        with os.fdopen(fd, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            header_written = False
+            for rec in records:
+                flat = rec if isinstance(rec, CredentialRecord) else flatten_record(rec)
+                new_keys = [key for key in flat if key not in known]
+                if new_keys:
+                    header.extend(new_keys)
+                    known.update(new_keys)
+                if not header_written:
+                    # The header of the spill file is whatever is known after
+                    # the first record; later columns are fixed up below.
+                    writer.writerow(header)
+                    written = list(header)
+                    header_written = True
+                writer.writerow([flat.get(key, "") for key in header])
+                count += 1
+            if not header_written:
+                written = list(header)
+                writer.writerow(header)
+
+        final_header = sorted(header) if schema == SCHEMA_SORTED else header
+        if final_header != written:
+            fd, rewrite_path = tempfile.mkstemp(prefix=".credentials-", suffix=".csv", dir=directory)
+            os.close(fd)
+            try:
+                _rewrite_columns(spill_path, rewrite_path, header, final_header)
+            except BaseException:
+                os.remove(rewrite_path)
+                raise
+            os.replace(rewrite_path, spill_path)
+        os.replace(spill_path, path)
+    except BaseException:
+        if os.path.exists(spill_path):
+            os.remove(spill_path)
+        raise
+    return count
+
+
+def run(args: argparse.Namespace, cache: Optional[HTTPCache] = None) -> None:
+    """Fetches the catalog and writes the CSV for the parsed command line arguments."""
+    url, params = build_initial_query(args.page_size)
+    if args.sync_db:
+        sync(args, url, params, cache)
+        return
+    out_path = args.output
+    # Stream into a scratch file next to the output so an unchanged or failed
+    # crawl leaves the existing CSV untouched.
+    fd, scratch_path = tempfile.mkstemp(prefix=".credentials-", suffix=".csv",
+                                        dir=os.path.dirname(os.path.abspath(out_path)))
+    os.close(fd)
     try:
-        creds = fetch_all_credentials(url, params)
+        pages = iter_credential_pages(url, params, cache=cache, max_workers=args.max_workers)
+        # Includes waiting for pages, since records are written as they arrive
+        with stage("credentials.write_csv") as timer:
+            count = write_csv((rec for page in pages for rec in page), scratch_path, schema=args.schema)
+            timer.records = count
     except Exception as e:
+        os.remove(scratch_path)
         # If network access fails (e.g., HTTP 403), print the error and exit.
         print(f"Error fetching credentials: {e}")
         return
-    print(f"Fetched {len(creds)} credentials. Writing to CSV...")
-    out_path = "fetched_credentials.csv"
-    write_csv(creds, out_path)
-    print(f"Results written to {out_path}")
+    # Every page answered 304, so the CSV on disk is already up to date
+    if cache is not None and cache.misses == 0 and cache.hits and os.path.exists(out_path):
+        os.remove(scratch_path)
+        print(f"Fetched {count} credentials, unchanged since last run; keeping {out_path}")
+        return
+    os.replace(scratch_path, out_path)
+    print(f"Fetched {count} credentials. Results written to {out_path}")
+
+
+def sync(args: argparse.Namespace, url: str, params: List[Tuple[str, str]],
+         cache: Optional[HTTPCache] = None) -> None:
+    """Streams the catalog into the SQLite store named by `--sync-db`."""
+    with CredentialStore(args.sync_db) as store:
+        pages = iter_credential_pages(url, params, cache=cache, max_workers=args.max_workers)
+        try:
+            with stage("credentials.sync") as timer:
+                stats = store.sync(rec for page in pages for rec in page)
+                timer.records = stats.added + stats.changed + stats.unchanged
+        except Exception as e:
+            # The sync runs in one transaction, so the store is unchanged
+            print(f"Error fetching credentials: {e}")
+            return
+        print(f"Synced {store.count()} credentials to {args.sync_db}: {stats.added} added, "
+              f"{stats.changed} changed, {stats.removed} removed, {stats.unchanged} unchanged")
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Fetch all credentials from the Microsoft Learn content browser.")
+    parser.add_argument("--output", default="fetched_credentials.csv",
+                        help="Output CSV filename (default: fetched_credentials.csv)")
+    parser.add_argument("--page-size", type=int, default=DEFAULT_PAGE_SIZE,
+                        help=f"Items requested per page via $top (default: {DEFAULT_PAGE_SIZE})")
+    parser.add_argument("--max-workers", type=int, default=DEFAULT_MAX_WORKERS,
+                        help="Concurrent page requests once the total count is known; "
+                             f"1 follows @nextLink serially (default: {DEFAULT_MAX_WORKERS})")
+    parser.add_argument("--schema", choices=[SCHEMA_SORTED, SCHEMA_STABLE], default=SCHEMA_SORTED,
+                        help="Column order: alphabetical union of all keys (sorted, default) or "
+                             "first-seen order with late columns appended (stable)")
+    parser.add_argument("--sync-db", metavar="PATH",
+                        help="Upsert changed records into this SQLite index instead of writing the CSV")
+    add_cache_arguments(parser)
+    add_client_arguments(parser)
+    add_metrics_arguments(parser)
+    args = parser.parse_args(argv)
+    cache = cache_from_args(args)
+    configure_from_args(args)
+
+    try:
+        with collect(args, "fetch_mslearn_credentials", cache):
+            run(args, cache)
+    finally:
+        if cache is not None:
+            cache.evict()
+            print(cache.summary(), file=sys.stderr)
+        print_latency_summary()
 
 
 if __name__ == "__main__":
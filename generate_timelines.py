@@ -0,0 +1,290 @@
+#!/usr/bin/env python3
+"""
+Generate static timeline bundles for many learners at once.
+
+The dashboard shows one learner from fixed paths (``passed_exams.csv``,
+``credly_badges.csv``, ``partials/*.html``, ``timeline.json``).  This script
+takes the fetched data of a whole organisation and writes one directory per
+learner with the same files, so each directory can be served as that
+learner's page:
+
+    sites/<share_id>/passed_exams.csv
+    sites/<share_id>/credly_badges.csv
+    sites/<share_id>/timeline.json
+    sites/<share_id>/partials/ai-recommendation.html
+    sites/<share_id>/partials/last-updated.html
+    sites/<share_id>/index.html                       (with --page)
+
+Bundles are rendered in parallel by a process pool (``--workers``, default
+one per CPU core).  Every learner's inputs (exams, badges, recommendation,
+the exam levels from the catalog snapshot and the page) are hashed, and
+learners whose hash matches ``sites/manifest.json`` are skipped, so a daily
+run only renders the learners whose data changed.  Their
+``last-updated.html`` keeps the time their data last changed.
+
+Inputs are the outputs of the bulk fetchers:
+
+    python passed_exams.py --bulk share_ids.txt --output transcripts.csv
+    python fetch_credly_badges.py alice bob --output badges.csv
+    python ai_exam_recommender.py --batch transcripts.csv --batch-output recommendations.csv
+    python generate_timelines.py --exams transcripts.csv --badges badges.csv --learner-map learners.csv \\
+        --recommendations recommendations.csv --page index.html --output-dir sites
+
+``--exams`` and ``--badges`` also accept a directory of per-learner CSVs.
+``--learner-map`` (``Share ID`` and ``Username`` columns) puts each Credly
+user's badges into the bundle of their transcript; without it badges are
+matched to transcripts by identical IDs.
+"""
+import argparse
+import csv
+import functools
+import hashlib
+import json
+import os
+import re
+import shutil
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple, Type
+
+import build_timeline_data
+from ai_exam_recommender import write_partial
+from exam_catalog import DEFAULT_SNAPSHOT_PATH, ExamCatalog
+from metrics import add_metrics_arguments, collect, count, stage
+from records import BadgeRecord, CSVRecord, ExamRecord, load_known, load_learner_map
+
+DEFAULT_OUTPUT_DIR = "sites"
+MANIFEST_NAME = "manifest.json"
+MANIFEST_VERSION = 1
+EXAMS_FILE = "passed_exams.csv"
+BADGES_FILE = "credly_badges.csv"
+# Learner IDs become directory names
+_SAFE_ID = re.compile(r"[A-Za-z0-9][A-Za-z0-9._-]*")
+
+Row = Tuple[str, ...]
+
+
+class Bundle(NamedTuple):
+    """Inputs of one learner's bundle, as sent to a worker process."""
+    learner: str
+    exams: Tuple[Row, ...]
+    badges: Tuple[Row, ...]
+    recommendation: Optional[str]
+    digest: str
+
+
+def load_rows(source: Optional[str], record_type: Type[CSVRecord], prefix: str) -> Dict[str, List[Row]]:
+    """Read per-learner rows from a combined CSV or a directory of ``<prefix><learner>.csv`` files."""
+    rows: Dict[str, List[Row]] = {}
+    if not source:
+        return rows
+    if os.path.isdir(source):
+        known: Dict[str, List[CSVRecord]] = {}
+        for name in sorted(os.listdir(source)):
+            if name.endswith(".csv"):
+                learner = name[:-len(".csv")]
+                if learner.startswith(prefix):
+                    learner = learner[len(prefix):]
+                known.update(load_known(os.path.join(source, name), record_type, learner))
+    else:
+        known = load_known(source, record_type)
+    for learner, records in known.items():
+        rows[learner] = [record.row() for record in records]
+    return rows
+
+
+def load_recommendations(path: Optional[str]) -> Dict[str, str]:
+    """Read the ``Learner`` -> ``Exam Code`` CSV written by ``ai_exam_recommender.py --batch``."""
+    if not path:
+        return {}
+    with open(path, encoding="utf-8", newline="") as f:
+        return {row["Learner"]: row["Exam Code"] for row in csv.DictReader(f)
+                if row.get("Exam Code") and row["Exam Code"] != "-"}
+
+
+def file_hash(path: Optional[str]) -> str:
+    """Return the SHA-1 of a file's bytes, or an empty string without a file."""
+    if not path:
+        return ""
+    with open(path, "rb") as f:
+        return hashlib.file_digest(f, "sha1").hexdigest()
+
+
+def bundle_digest(exams: Iterable[Row], badges: Iterable[Row], recommendation: Optional[str],
+                  levels: Dict[str, str], page_hash: str) -> str:
+    """Return the content hash of everything a bundle is rendered from."""
+    payload = [build_timeline_data.SCHEMA_VERSION, sorted(exams), sorted(badges), recommendation,
+               sorted(levels.items()), page_hash]
+    return hashlib.sha1(json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")).hexdigest()
+
+
+def exam_levels(exams: Iterable[Row], catalog: Optional[ExamCatalog]) -> Dict[str, str]:
+    """Return the first catalog level of each exam code, as ``build_timeline_data.build_exams`` uses it."""
+    levels: Dict[str, str] = {}
+    if catalog is None:
+        return levels
+    for _, code, _ in exams:
+        exam_levels = (catalog.get(code) or {}).get("levels") or []
+        if exam_levels:
+            levels[code] = exam_levels[0]
+    return levels
+
+
+def load_manifest(output_dir: str) -> Dict[str, Dict[str, str]]:
+    """Return the learner -> ``{"hash", "updated"}`` entries of an earlier run."""
+    try:
+        with open(os.path.join(output_dir, MANIFEST_NAME), encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if manifest.get("version") != MANIFEST_VERSION:
+        return {}
+    return manifest.get("learners", {})
+
+
+def save_manifest(output_dir: str, learners: Dict[str, Dict[str, str]]) -> None:
+    """Atomically write the manifest of rendered bundles."""
+    path = os.path.join(output_dir, MANIFEST_NAME)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"version": MANIFEST_VERSION, "learners": learners}, f, indent=1, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def _write_rows(path: str, fieldnames: List[str], rows: Iterable[Row]) -> None:
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(fieldnames)
+        writer.writerows(rows)
+
+
+# Catalog of the worker process, loaded once by _init_worker
+_catalog: Optional[ExamCatalog] = None
+
+
+def _init_worker(catalog_path: str) -> None:
+    global _catalog
+    _catalog = ExamCatalog.load(catalog_path, offline=True)
+
+
+def render_bundle(bundle: Bundle, output_dir: str, stamp: str, page: Optional[str] = None) -> str:
+    """Write one learner's bundle into ``output_dir/<learner>`` and return the learner."""
+    directory = os.path.join(output_dir, bundle.learner)
+    partials = os.path.join(directory, "partials")
+    os.makedirs(partials, exist_ok=True)
+    _write_rows(os.path.join(directory, EXAMS_FILE), ExamRecord.fieldnames(), bundle.exams)
+    _write_rows(os.path.join(directory, BADGES_FILE), BadgeRecord.fieldnames(), bundle.badges)
+    recommendation_path = os.path.join(directory, build_timeline_data.RECOMMENDATION_PARTIAL)
+    if bundle.recommendation:
+        write_partial(bundle.recommendation, recommendation_path)
+    elif os.path.exists(recommendation_path):
+        os.remove(recommendation_path)
+    last_updated = f"Last updated: {stamp}"
+    with open(os.path.join(directory, build_timeline_data.LAST_UPDATED_PARTIAL), "w", encoding="utf-8") as f:
+        f.write(f'<span id="last-updated">{last_updated}</span>')
+    exam_rows = build_timeline_data.normalize_rows(
+        (dict(zip(ExamRecord.fieldnames(), row)) for row in bundle.exams), "Exam Date")
+    badge_rows = build_timeline_data.normalize_rows(
+        (dict(zip(BadgeRecord.fieldnames(), row)) for row in bundle.badges), "Badge Date")
+    timeline = build_timeline_data.timeline_from_rows(exam_rows, badge_rows, bundle.recommendation or None,
+                                                      last_updated, _catalog)
+    build_timeline_data.write_timeline(timeline, os.path.join(directory, build_timeline_data.DEFAULT_OUTPUT))
+    if page:
+        shutil.copyfile(page, os.path.join(directory, os.path.basename(page)))
+    return bundle.learner
+
+
+def render_bundles(bundles: List[Bundle], output_dir: str, stamp: str, page: Optional[str] = None,
+                   workers: Optional[int] = None, catalog_path: str = DEFAULT_SNAPSHOT_PATH) -> Iterable[str]:
+    """Render ``bundles`` on a process pool of ``workers`` processes (in this process for one worker)."""
+    workers = max(1, workers or os.cpu_count() or 1)
+    render = functools.partial(render_bundle, output_dir=output_dir, stamp=stamp, page=page)
+    if workers == 1 or len(bundles) < 2:
+        _init_worker(catalog_path)
+        yield from map(render, bundles)
+        return
+    # Several bundles per task so the pickling overhead stays small next to the rendering
+    chunksize = max(1, len(bundles) // (workers * 4))
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(catalog_path,)) as pool:
+        yield from pool.map(render, bundles, chunksize=chunksize)
+
+
+def run(args: argparse.Namespace) -> int:
+    with stage("timelines.load") as timer:
+        exams = load_rows(args.exams, ExamRecord, "passed_exams_")
+        badges = load_rows(args.badges, BadgeRecord, "credly_badges_")
+        if args.learner_map:
+            share_ids = load_learner_map(args.learner_map)
+            badges = {share_ids.get(username, username): rows for username, rows in badges.items()}
+        recommendations = load_recommendations(args.recommendations)
+        timer.records = len(exams)
+    learners = list(dict.fromkeys([*exams, *badges]))
+    unsafe = [learner for learner in learners if not _SAFE_ID.fullmatch(learner)]
+    for learner in unsafe:
+        print(f"[{learner}] Skipping learner ID that is not a safe directory name", file=sys.stderr)
+    if not learners:
+        print("No learners found in the inputs.", file=sys.stderr)
+        return 1
+
+    catalog = ExamCatalog.load(args.catalog, offline=True)
+    page_hash = file_hash(args.page)
+    manifest = {} if args.force else load_manifest(args.output_dir)
+    stamp = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M UTC")
+    entries: Dict[str, Dict[str, str]] = {}
+    pending: List[Bundle] = []
+    for learner in learners:
+        if learner in unsafe:
+            continue
+        learner_exams = exams.get(learner, [])
+        learner_badges = badges.get(learner, [])
+        recommendation = recommendations.get(learner)
+        digest = bundle_digest(learner_exams, learner_badges, recommendation,
+                               exam_levels(learner_exams, catalog), page_hash)
+        previous = manifest.get(learner)
+        if (previous and previous.get("hash") == digest
+                and os.path.exists(os.path.join(args.output_dir, learner, build_timeline_data.DEFAULT_OUTPUT))):
+            entries[learner] = previous
+            continue
+        pending.append(Bundle(learner, tuple(learner_exams), tuple(learner_badges), recommendation, digest))
+        entries[learner] = {"hash": digest, "updated": stamp}
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    with stage("timelines.render") as timer:
+        rendered = sum(1 for _ in render_bundles(pending, args.output_dir, stamp, args.page, args.workers,
+                                                 args.catalog))
+        timer.records = rendered
+    # Learners that dropped out of the inputs keep their bundle but leave the manifest
+    save_manifest(args.output_dir, entries)
+    skipped = len(entries) - rendered
+    count("timelines_rendered", rendered)
+    count("timelines_skipped", skipped)
+    print(f"Rendered {rendered} timelines into {args.output_dir}; {skipped} unchanged")
+    return 1 if unsafe else 0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Render per-learner timeline bundles for many learners.")
+    parser.add_argument("--exams", required=True,
+                        help="Combined passed exams CSV (Share ID column) or directory of per-learner CSVs")
+    parser.add_argument("--badges", help="Combined Credly badges CSV (Username column) or directory of CSVs")
+    parser.add_argument("--learner-map", metavar="CSV",
+                        help="CSV with Share ID and Username columns joining badges to transcripts")
+    parser.add_argument("--recommendations", metavar="CSV",
+                        help="Recommendations CSV written by ai_exam_recommender.py --batch")
+    parser.add_argument("--page", metavar="HTML", help="Page to copy into every bundle, e.g. index.html")
+    parser.add_argument("--catalog", default=DEFAULT_SNAPSHOT_PATH,
+                        help=f"Exam catalog snapshot for exam levels (default: {DEFAULT_SNAPSHOT_PATH})")
+    parser.add_argument("--output-dir", default=DEFAULT_OUTPUT_DIR,
+                        help=f"Directory for the bundles (default: {DEFAULT_OUTPUT_DIR})")
+    parser.add_argument("--workers", type=int, help="Rendering processes (default: one per CPU core)")
+    parser.add_argument("--force", action="store_true", help="Render every learner, even if unchanged")
+    add_metrics_arguments(parser)
+    args = parser.parse_args(argv)
+
+    with collect(args, "generate_timelines"):
+        return run(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
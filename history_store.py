@@ -0,0 +1,337 @@
+#!/usr/bin/env python3
+"""
+Local SQLite history of every learner's passed exams and Credly badges.
+
+``passed_exams.py`` and ``fetch_credly_badges.py`` overwrite their CSV on
+every run.  With ``--history-db history.db`` they also append each learner's
+fetched rows to this store as a snapshot delta:
+
+- a fetch whose rows hash to the same value as the learner's previous fetch
+  writes nothing but the time it was checked
+- otherwise only the rows that appeared are inserted, and rows that
+  disappeared are closed by setting their ``removed_at`` time; stored rows are
+  never deleted or rewritten, so the state at any earlier time can be queried
+
+Records are indexed by code (the exam number, or the badge title for
+badges), by learner and by date, so queries stay fast over millions of rows:
+
+    python history_store.py history.db --code AZ-104 --since 2024-04-01 --until 2024-06-30
+    python history_store.py history.db --learner d8yjji6kmml5jg0 --as-of 2024-01-01
+    python history_store.py history.db --badges --learner guygregory --export credly_badges.csv
+
+``--export`` writes the CSV format the fetchers write (with a leading
+``Share ID`` / ``Username`` column when several learners match).  Earlier
+CSVs, e.g. from the git history of ``passed_exams.csv``, can be backfilled
+oldest first with ``--import FILE --learner ID --taken-at DATE``.
+"""
+import argparse
+import csv
+import hashlib
+import json
+import sqlite3
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+DEFAULT_DB_PATH = "history.db"
+EXAMS = "exams"
+BADGES = "badges"
+
+# Kind -> CSV columns written by the fetcher, and the learner column of its combined CSV
+CSV_FORMATS = {
+    EXAMS: (["Exam Title", "Exam Number", "Exam Date"], "Share ID"),
+    BADGES: (["Badge Title", "Issuer", "Badge Date"], "Username"),
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS learners (
+    id INTEGER PRIMARY KEY,
+    kind TEXT NOT NULL,
+    name TEXT NOT NULL,
+    content_hash TEXT,
+    checked_at REAL,
+    UNIQUE (kind, name)
+);
+CREATE TABLE IF NOT EXISTS snapshots (
+    id INTEGER PRIMARY KEY,
+    learner_id INTEGER NOT NULL REFERENCES learners(id),
+    taken_at REAL NOT NULL,
+    content_hash TEXT NOT NULL,
+    added INTEGER NOT NULL,
+    removed INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_snapshots_learner ON snapshots (learner_id, taken_at);
+CREATE TABLE IF NOT EXISTS records (
+    id INTEGER PRIMARY KEY,
+    learner_id INTEGER NOT NULL REFERENCES learners(id),
+    code TEXT NOT NULL COLLATE NOCASE,
+    title TEXT NOT NULL,
+    issuer TEXT NOT NULL,
+    earned_on TEXT NOT NULL,
+    added_at REAL NOT NULL,
+    removed_at REAL
+);
+CREATE INDEX IF NOT EXISTS idx_records_code ON records (code, earned_on);
+CREATE INDEX IF NOT EXISTS idx_records_learner ON records (learner_id, removed_at);
+CREATE INDEX IF NOT EXISTS idx_records_earned ON records (earned_on);
+"""
+
+# (code, title, issuer, earned_on) of one stored row; exams have no issuer and badges no title
+RecordKey = Tuple[str, str, str, str]
+
+
+class SnapshotStats(NamedTuple):
+    """Counts reported by :meth:`HistoryStore.append`."""
+    added: int
+    removed: int
+    unchanged: int
+
+
+class HistoryRecord(NamedTuple):
+    """One exam or badge of a learner and when the store first and last saw it."""
+    learner: str
+    code: str
+    title: str
+    issuer: str
+    earned_on: str
+    added_at: float
+    removed_at: Optional[float]
+
+
+def record_key(kind: str, row: Dict[str, str]) -> Optional[RecordKey]:
+    """Return the stored form of a fetcher CSV row, or None for a row without a code."""
+    if kind == EXAMS:
+        key = (row.get("Exam Number", "").strip(), row.get("Exam Title") or "", "",
+               row.get("Exam Date", "").strip())
+    elif kind == BADGES:
+        key = (row.get("Badge Title", "").strip(), "", row.get("Issuer") or "",
+               row.get("Badge Date", "").strip())
+    else:
+        raise ValueError(f"Unknown kind: {kind}")
+    return key if key[0] else None
+
+
+def csv_row(kind: str, record: HistoryRecord) -> Dict[str, str]:
+    """Return ``record`` as a row of the CSV the fetcher for ``kind`` writes."""
+    if kind == EXAMS:
+        return {"Exam Title": record.title, "Exam Number": record.code, "Exam Date": record.earned_on}
+    return {"Badge Title": record.code, "Issuer": record.issuer, "Badge Date": record.earned_on}
+
+
+def snapshot_hash(keys: Iterable[RecordKey]) -> str:
+    """Return a hash of a snapshot that does not depend on row order."""
+    encoded = json.dumps(sorted(keys), ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+def parse_time(value: str) -> float:
+    """Parse a ``YYYY-MM-DD`` date or ISO datetime (UTC unless it has an offset) to a timestamp."""
+    parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+class HistoryStore:
+    """Append-only SQLite store of exam and badge snapshots per learner."""
+
+    def __init__(self, path: str = DEFAULT_DB_PATH) -> None:
+        """Open (and if necessary create) the store at ``path``."""
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA foreign_keys = ON")
+        self.conn.execute("PRAGMA journal_mode = WAL")
+        self.conn.execute("PRAGMA synchronous = NORMAL")
+        self.conn.executescript(SCHEMA)
+
+    def __enter__(self) -> "HistoryStore":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def _learner(self, kind: str, learner: str) -> sqlite3.Row:
+        self.conn.execute("INSERT OR IGNORE INTO learners (kind, name) VALUES (?, ?)", (kind, learner))
+        return self.conn.execute("SELECT id, content_hash, checked_at FROM learners WHERE kind = ? AND name = ?",
+                                 (kind, learner)).fetchone()
+
+    def append(self, kind: str, learner: str, rows: Iterable[Dict[str, str]],
+               taken_at: Optional[float] = None) -> SnapshotStats:
+        """Record the rows fetched for ``learner`` as a snapshot, in a single transaction.
+
+        :param kind: ``EXAMS`` or ``BADGES``
+        :param learner: Share ID for exams, Credly username for badges
+        :param rows: Rows as written to the fetcher's CSV; duplicates are stored once
+        :param taken_at: Time of the fetch as a timestamp (default: now)
+        :return: Added, removed and unchanged row counts
+        :raises ValueError: for an unknown ``kind`` or a ``taken_at`` before the
+            learner's previous snapshot
+        """
+        keys = {key for key in (record_key(kind, row) for row in rows) if key}
+        digest = snapshot_hash(keys)
+        taken_at = time.time() if taken_at is None else taken_at
+        with self.conn:
+            learner_row = self._learner(kind, learner)
+            learner_id = learner_row["id"]
+            if learner_row["checked_at"] is not None and taken_at < learner_row["checked_at"]:
+                raise ValueError(f"Snapshot of {learner} is older than the stored history; import oldest first")
+            self.conn.execute("UPDATE learners SET content_hash = ?, checked_at = ? WHERE id = ?",
+                              (digest, taken_at, learner_id))
+            if learner_row["content_hash"] == digest:
+                return SnapshotStats(0, 0, len(keys))
+
+            current: Dict[RecordKey, int] = {
+                (row["code"], row["title"], row["issuer"], row["earned_on"]): row["id"]
+                for row in self.conn.execute(
+                    "SELECT id, code, title, issuer, earned_on FROM records WHERE learner_id = ? AND removed_at IS NULL",
+                    (learner_id,))
+            }
+            added = [key for key in keys if key not in current]
+            removed = [current[key] for key in current if key not in keys]
+            self.conn.executemany(
+                "INSERT INTO records (learner_id, code, title, issuer, earned_on, added_at) VALUES (?, ?, ?, ?, ?, ?)",
+                [(learner_id, *key, taken_at) for key in sorted(added)],
+            )
+            self.conn.executemany("UPDATE records SET removed_at = ? WHERE id = ?",
+                                  [(taken_at, record_id) for record_id in removed])
+            self.conn.execute(
+                "INSERT INTO snapshots (learner_id, taken_at, content_hash, added, removed) VALUES (?, ?, ?, ?, ?)",
+                (learner_id, taken_at, digest, len(added), len(removed)),
+            )
+        return SnapshotStats(len(added), len(removed), len(keys) - len(added))
+
+    def query(self, kind: str = EXAMS, code: Optional[str] = None, learner: Optional[str] = None,
+              since: Optional[str] = None, until: Optional[str] = None, as_of: Optional[float] = None,
+              include_removed: bool = False) -> Iterator[HistoryRecord]:
+        """Yield the records matching every given filter, newest first.
+
+        :param kind: ``EXAMS`` or ``BADGES``
+        :param code: Exam number or badge title, matched case-insensitively
+        :param learner: Share ID or Credly username
+        :param since: First ``YYYY-MM-DD`` date the exam or badge was earned on
+        :param until: Last ``YYYY-MM-DD`` date the exam or badge was earned on
+        :param as_of: Return the records stored at this timestamp instead of the latest ones
+        :param include_removed: Also return records that later fetches no longer contained
+        """
+        clauses = ["l.kind = ?"]
+        params: List[Any] = [kind]
+        if code is not None:
+            clauses.append("r.code = ?")
+            params.append(code.strip())
+        if learner is not None:
+            clauses.append("r.learner_id = (SELECT id FROM learners WHERE kind = ? AND name = ?)")
+            params.extend([kind, learner])
+        if since is not None:
+            clauses.append("r.earned_on >= ?")
+            params.append(since)
+        if until is not None:
+            clauses.append("r.earned_on <= ?")
+            params.append(until)
+        if as_of is not None:
+            clauses.append("r.added_at <= ? AND (r.removed_at IS NULL OR r.removed_at > ?)")
+            params.extend([as_of, as_of])
+        elif not include_removed:
+            clauses.append("r.removed_at IS NULL")
+        # The unary + keeps SQLite from driving the query from the few learners
+        # rows through idx_records_learner when the code or date index applies
+        sql = ("SELECT l.name, r.code, r.title, r.issuer, r.earned_on, r.added_at, r.removed_at "
+               "FROM records r JOIN learners l ON l.id = +r.learner_id "
+               f"WHERE {' AND '.join(clauses)} ORDER BY r.earned_on DESC, l.name, r.code")
+        for row in self.conn.execute(sql, params):
+            yield HistoryRecord(*row)
+
+    def export_csv(self, path: str, kind: str = EXAMS, learner: Optional[str] = None, **filters: Any) -> int:
+        """Write matching records in the fetcher's CSV format, newest first.
+
+        Records of a single ``learner`` are written exactly like the fetcher
+        does; otherwise a leading ``Share ID`` / ``Username`` column is added
+        like the fetchers' combined CSV.  ``filters`` are passed to :meth:`query`.
+
+        :return: Number of rows written
+        """
+        fieldnames, learner_column = CSV_FORMATS[kind]
+        rows = 0
+        with open(path, mode="w", encoding="utf-8", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=fieldnames if learner else [learner_column] + fieldnames)
+            writer.writeheader()
+            for record in self.query(kind, learner=learner, **filters):
+                row = csv_row(kind, record)
+                writer.writerow(row if learner else {learner_column: record.learner, **row})
+                rows += 1
+        return rows
+
+    def count(self, kind: Optional[str] = None) -> int:
+        """Return the number of stored records, including removed ones."""
+        if kind is None:
+            return self.conn.execute("SELECT COUNT(*) FROM records").fetchone()[0]
+        return self.conn.execute("SELECT COUNT(*) FROM records r JOIN learners l ON l.id = r.learner_id "
+                                 "WHERE l.kind = ?", (kind,)).fetchone()[0]
+
+
+def append_rows(path: str, kind: str, learner: str, rows: Iterable[Dict[str, str]]) -> SnapshotStats:
+    """Open the store at ``path``, append one snapshot and report it on stderr."""
+    with HistoryStore(path) as store:
+        stats = store.append(kind, learner, rows)
+    print(f"History of {learner} in {path}: {stats.added} added, {stats.removed} removed, "
+          f"{stats.unchanged} unchanged", file=sys.stderr)
+    return stats
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Query, export or backfill the local exam and badge history.")
+    parser.add_argument("db", nargs="?", default=DEFAULT_DB_PATH,
+                        help=f"SQLite database written by --history-db (default: {DEFAULT_DB_PATH})")
+    parser.add_argument("--badges", action="store_const", dest="kind", const=BADGES, default=EXAMS,
+                        help="Query Credly badges instead of passed exams")
+    parser.add_argument("--code", help="Only this exam number (or badge title with --badges)")
+    parser.add_argument("--learner", help="Only this share ID (or Credly username with --badges)")
+    parser.add_argument("--since", metavar="YYYY-MM-DD", help="Only records earned on or after this date")
+    parser.add_argument("--until", metavar="YYYY-MM-DD", help="Only records earned on or before this date")
+    parser.add_argument("--as-of", metavar="DATE", type=parse_time,
+                        help="Show the records as stored at this date or ISO time instead of the latest")
+    parser.add_argument("--include-removed", action="store_true",
+                        help="Also show records that later fetches no longer contained")
+    parser.add_argument("--export", metavar="FILE", help="Write the matching records as CSV instead of listing them")
+    parser.add_argument("--import", dest="import_csv", metavar="FILE",
+                        help="Append a CSV written by the fetcher as a snapshot of --learner")
+    parser.add_argument("--taken-at", metavar="DATE", type=parse_time,
+                        help="Time of the --import snapshot (default: now)")
+    args = parser.parse_args(argv)
+
+    with HistoryStore(args.db) as store:
+        if args.import_csv:
+            if not args.learner:
+                parser.error("--import requires --learner")
+            try:
+                with open(args.import_csv, encoding="utf-8", newline="") as f:
+                    stats = store.append(args.kind, args.learner, csv.DictReader(f), args.taken_at)
+            except ValueError as e:
+                print(f"Error: {e}", file=sys.stderr)
+                return 1
+            print(f"Imported {args.import_csv} into {args.db}: {stats.added} added, {stats.removed} removed, "
+                  f"{stats.unchanged} unchanged")
+            return 0
+
+        filters = {"code": args.code, "since": args.since, "until": args.until,
+                   "as_of": args.as_of, "include_removed": args.include_removed}
+        if args.export:
+            rows = store.export_csv(args.export, args.kind, args.learner, **filters)
+            print(f"Wrote {rows} records to {args.export}")
+            return 0
+        matches = 0
+        for record in store.query(args.kind, learner=args.learner, **filters):
+            removed = "" if record.removed_at is None else " (removed)"
+            print(f"{record.earned_on} | {record.learner} | {record.code} | {record.title or record.issuer}"
+                  f"{removed}")
+            matches += 1
+    print(f"{matches} matching records", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+"""
+On-disk conditional HTTP cache shared by the fetcher scripts.
+
+Responses are stored per URL together with their ``ETag`` and
+``Last-Modified`` validators.  The next request for the same URL sends
+``If-None-Match`` / ``If-Modified-Since``; when the server answers
+``304 Not Modified`` the stored, already-decoded JSON is returned instead of
+downloading and parsing the payload again.  Callers can ask
+:meth:`HTTPCache.not_modified` whether a URL was revalidated during this run
+and skip any downstream work (for example rewriting an unchanged CSV).
+
+Entries are dropped once they are older than the configured TTL (forcing a
+full download) and the least recently used entries are evicted when the
+cache directory grows beyond its size limit.
+
+Usage from a script:
+
+    parser = argparse.ArgumentParser()
+    add_cache_arguments(parser)
+    args = parser.parse_args()
+    cache = cache_from_args(args)
+    data = cache.get_json(url, headers=headers)
+    print(cache.summary(), file=sys.stderr)
+"""
+import argparse
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import requests
+
+from http_client import default_client
+from metrics import stage
+
+DEFAULT_CACHE_DIR = os.environ.get("HTTP_CACHE_DIR", ".http_cache")
+DEFAULT_TTL = 7 * 24 * 60 * 60  # one week
+DEFAULT_MAX_BYTES = 100 * 1024 * 1024
+
+
+class HTTPCache:
+    """Conditional-request cache of decoded JSON responses keyed by URL."""
+
+    def __init__(self, directory: str = DEFAULT_CACHE_DIR, ttl: float = DEFAULT_TTL,
+                 max_bytes: int = DEFAULT_MAX_BYTES) -> None:
+        """Create a cache rooted at ``directory``.
+
+        :param directory: Directory holding one JSON file per cached URL
+        :param ttl: Seconds after which an entry is discarded and fully refetched
+        :param max_bytes: Size limit of the cache directory before LRU eviction
+        """
+        self.directory = directory
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.bytes_downloaded = 0
+        self.bytes_saved = 0
+        self._not_modified: set = set()
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def canonical_url(url: str, params: Optional[List[Tuple[str, str]]] = None) -> str:
+        """Return the URL exactly as it will be requested, including the query string."""
+        return requests.Request("GET", url, params=params).prepare().url
+
+    def _path(self, url: str) -> str:
+        key = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, f"{key}.json")
+
+    def _load(self, path: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(path, encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if time.time() - entry.get("stored_at", 0) > self.ttl:
+            self._remove(path)
+            return None
+        return entry
+
+    @staticmethod
+    def _remove(path: str) -> None:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def _store(self, path: str, entry: Dict[str, Any]) -> None:
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(entry, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp_path, path)
+
+    def get_json(self, url: str, headers: Optional[Dict[str, str]] = None,
+                 params: Optional[List[Tuple[str, str]]] = None,
+                 session: Optional[requests.Session] = None) -> Any:
+        """Fetch ``url`` and return its decoded JSON, revalidating any stored copy.
+
+        :param url: Request URL
+        :param headers: Extra request headers
+        :param params: Optional query parameters
+        :param session: Optional session to reuse pooled connections
+        :return: Decoded JSON body (from the network or from the cache on 304)
+        :raises requests.HTTPError: if the HTTP request returned an unsuccessful status code
+        :raises ValueError: if the response cannot be decoded as JSON
+        """
+        full_url = self.canonical_url(url, params)
+        path = self._path(full_url)
+        entry = self._load(path)
+
+        request_headers = dict(headers or {})
+        if entry:
+            if entry.get("etag"):
+                request_headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                request_headers["If-Modified-Since"] = entry["last_modified"]
+
+        response = (session or default_client()).get(full_url, headers=request_headers)
+        if response.status_code == 304 and entry:
+            with self._lock:
+                self.hits += 1
+                self.bytes_saved += entry.get("size", 0)
+                self._not_modified.add(full_url)
+            # Bump the modification time so size eviction is least-recently-used
+            os.utime(path)
+            return entry["data"]
+
+        response.raise_for_status()
+        with stage("json_decode"):
+            data = response.json()
+        size = len(response.content)
+        with self._lock:
+            self.misses += 1
+            self.bytes_downloaded += size
+            self._not_modified.discard(full_url)
+
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+        if etag or last_modified:
+            self._store(path, {
+                "url": full_url,
+                "etag": etag,
+                "last_modified": last_modified,
+                "stored_at": time.time(),
+                "size": size,
+                "data": data,
+            })
+        elif entry:
+            # The server stopped sending validators; the stale copy is useless
+            self._remove(path)
+        return data
+
+    def not_modified(self, url: str, params: Optional[List[Tuple[str, str]]] = None) -> bool:
+        """Return True if the last request for ``url`` in this run was answered with 304."""
+        return self.canonical_url(url, params) in self._not_modified
+
+    def evict(self) -> int:
+        """Remove expired entries, then least recently used ones until under ``max_bytes``.
+
+        :return: Number of entries removed
+        """
+        now = time.time()
+        entries = []
+        removed = 0
+        for name in os.listdir(self.directory):
+            if not name.endswith(".json"):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            # The mtime is bumped on every hit, so this drops entries that
+            # went unused for a whole TTL; used-but-old entries are instead
+            # refetched by get_json() based on their stored_at timestamp.
+            if now - stat.st_mtime > self.ttl:
+                self._remove(path)
+                removed += 1
+            else:
+                entries.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            self._remove(path)
+            total -= size
+            removed += 1
+        return removed
+
+    def summary(self) -> str:
+        """Return a one-line hit/miss/bytes-saved report for this run."""
+        return (f"HTTP cache: {self.hits} hits, {self.misses} misses, "
+                f"{self.bytes_downloaded / 1024:.1f} KiB downloaded, "
+                f"{self.bytes_saved / 1024:.1f} KiB saved")
+
+
+def add_cache_arguments(parser: argparse.ArgumentParser) -> None:
+    """Add the shared ``--cache-*`` command line options to ``parser``."""
+    parser.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR,
+                        help=f"Directory for the conditional HTTP cache (default: {DEFAULT_CACHE_DIR})")
+    parser.add_argument("--no-cache", action="store_true", help="Disable the HTTP cache")
+    parser.add_argument("--cache-ttl", type=float, default=DEFAULT_TTL,
+                        help="Seconds before a cached response is fully refetched (default: one week)")
+    parser.add_argument("--cache-max-mb", type=float, default=DEFAULT_MAX_BYTES / (1024 * 1024),
+                        help="Maximum cache size in MiB before LRU eviction (default: 100)")
+
+
+def cache_from_args(args: argparse.Namespace) -> Optional[HTTPCache]:
+    """Create the cache described by :func:`add_cache_arguments` options, or None if disabled."""
+    if args.no_cache:
+        return None
+    return HTTPCache(args.cache_dir, ttl=args.cache_ttl,
+                     max_bytes=int(args.cache_max_mb * 1024 * 1024))
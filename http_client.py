@@ -0,0 +1,345 @@
+#!/usr/bin/env python3
+"""
+Shared HTTP client for the fetcher scripts.
+
+``HTTPClient`` is a ``requests.Session`` that every fetcher uses instead of
+bare ``requests.get``, so all requests get the same behaviour:
+
+- keep-alive connections from a pool sized for the caller's concurrency
+- connect and read timeouts, so a stalled endpoint cannot hang a run
+- retries of ``429`` and ``5xx`` responses and of connection errors and
+  timeouts, with jittered exponential backoff that honours ``Retry-After``
+- optional hedging: when a GET has not answered within ``hedge_after``
+  seconds an identical request is sent and whichever answers first wins
+- gzip/deflate (and brotli, when ``brotli`` or ``brotlicffi`` is installed)
+  response compression
+- per-host latency histograms and bytes received on the wire, printed with
+  :func:`latency_summary`
+- an optional :class:`RateLimiter` that spaces the client's requests evenly,
+  which long-running callers such as ``watch_daemon.py`` use as a global
+  request budget
+
+Scripts add the ``--http-*`` options with :func:`add_client_arguments` and
+apply them with :func:`configure_from_args`; sessions created afterwards by
+:func:`create_session` or :func:`default_client` use those settings.
+
+    parser = argparse.ArgumentParser()
+    add_client_arguments(parser)
+    args = parser.parse_args()
+    configure_from_args(args)
+    data = default_client().get(url).json()
+    print_latency_summary()
+"""
+import argparse
+import bisect
+import random
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from email.utils import parsedate_to_datetime
+from typing import Any, Dict, Optional, Tuple, Union
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+DEFAULT_POOL_SIZE = 8
+DEFAULT_CONNECT_TIMEOUT = 5.0
+DEFAULT_READ_TIMEOUT = 30.0
+DEFAULT_RETRIES = 3
+DEFAULT_BACKOFF = 0.5
+MAX_BACKOFF = 30.0
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS"})
+
+# Histogram bucket upper bounds in milliseconds; the last bucket is open ended
+LATENCY_BUCKETS_MS = (10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+def _accept_encoding() -> str:
+    for module in ("brotli", "brotlicffi"):
+        try:
+            __import__(module)
+            return "gzip, deflate, br"
+        except ImportError:
+            pass
+    return "gzip, deflate"
+
+
+ACCEPT_ENCODING = _accept_encoding()
+
+
+class LatencyHistogram:
+    """Bucketed request latencies for one host."""
+
+    def __init__(self) -> None:
+        self.counts = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self.total = 0.0
+        self.errors = 0
+        self.retries = 0
+        self.hedges = 0
+        self.bytes = 0
+
+    @property
+    def count(self) -> int:
+        return sum(self.counts)
+
+    def record(self, seconds: float) -> None:
+        self.counts[bisect.bisect_left(LATENCY_BUCKETS_MS, seconds * 1000)] += 1
+        self.total += seconds
+
+    def quantile(self, q: float) -> float:
+        """Return the upper bound (ms) of the bucket holding the ``q`` quantile; inf for the open bucket."""
+        target = q * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if count and seen >= target:
+                return LATENCY_BUCKETS_MS[i] if i < len(LATENCY_BUCKETS_MS) else float("inf")
+        return 0.0
+
+
+_latency: Dict[str, LatencyHistogram] = {}
+_latency_lock = threading.RLock()
+
+
+def _histogram(url: str) -> LatencyHistogram:
+    host = urlsplit(url).netloc
+    with _latency_lock:
+        if host not in _latency:
+            _latency[host] = LatencyHistogram()
+        return _latency[host]
+
+
+def latency_histograms() -> Dict[str, LatencyHistogram]:
+    """Return a snapshot of the per-host latency histograms recorded so far."""
+    with _latency_lock:
+        return dict(_latency)
+
+
+def latency_summary() -> str:
+    """Return one line per host with request count, mean and p50/p95/p99 latency."""
+    lines = []
+    for host, histogram in sorted(latency_histograms().items()):
+        if not histogram.count:
+            continue
+        lines.append(
+            f"HTTP {host}: {histogram.count} requests, mean {histogram.total / histogram.count * 1000:.0f} ms, "
+            f"p50 <{histogram.quantile(0.5):g} ms, p95 <{histogram.quantile(0.95):g} ms, "
+            f"p99 <{histogram.quantile(0.99):g} ms, {histogram.bytes / 1024:.1f} KiB on the wire, {histogram.retries} retries, "
+            f"{histogram.hedges} hedged, {histogram.errors} errors"
+        )
+    return "\n".join(lines)
+
+
+def print_latency_summary() -> None:
+    """Print :func:`latency_summary` to stderr when any request was made."""
+    summary = latency_summary()
+    if summary:
+        print(summary, file=sys.stderr)
+
+
+def retry_after(response: requests.Response) -> Optional[float]:
+    """Return the delay requested by a ``Retry-After`` header in seconds, if any."""
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class RateLimiter:
+    """Spaces requests ``1 / rate`` seconds apart across all threads sharing it.
+
+    Unlike a token bucket there is no burst allowance: a caller that was idle
+    does not get to send several requests at once afterwards.
+    """
+
+    def __init__(self, rate: float) -> None:
+        """Create a limiter allowing ``rate`` requests per second."""
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.interval = 1.0 / rate
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """Wait for the next free slot and return the seconds waited."""
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next)
+            self._next = slot + self.interval
+        delay = slot - now
+        if delay > 0:
+            time.sleep(delay)
+        return delay
+
+
+class HTTPClient(requests.Session):
+    """Pooled session with default timeouts, retries, hedging and latency recording."""
+
+    def __init__(self, pool_size: int = DEFAULT_POOL_SIZE,
+                 timeout: Union[float, Tuple[float, float]] = (DEFAULT_CONNECT_TIMEOUT, DEFAULT_READ_TIMEOUT),
+                 retries: int = DEFAULT_RETRIES, backoff: float = DEFAULT_BACKOFF,
+                 hedge_after: Optional[float] = None, rate_limiter: Optional[RateLimiter] = None) -> None:
+        """Create a client.
+
+        :param pool_size: Connections kept open per host
+        :param timeout: Default ``(connect, read)`` timeout in seconds, or one value for both
+        :param retries: Retries after the first attempt for retryable failures
+        :param backoff: Base delay of the exponential backoff in seconds
+        :param hedge_after: Seconds before a slow GET is duplicated; None disables hedging
+        :param rate_limiter: Optional limiter every request (including retries and hedges) waits for
+        """
+        super().__init__()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.mount("https://", adapter)
+        self.mount("http://", adapter)
+        self.headers["Accept-Encoding"] = ACCEPT_ENCODING
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.hedge_after = hedge_after
+        self.rate_limiter = rate_limiter
+        self._pool_size = pool_size
+        self._hedge_pool: Optional[ThreadPoolExecutor] = None
+        self._hedge_lock = threading.Lock()
+
+    def _delay(self, attempt: int) -> float:
+        return min(MAX_BACKOFF, self.backoff * 2 ** attempt) * random.uniform(0.5, 1.5)
+
+    def _timed(self, method: str, url: str, kwargs: Dict[str, Any]) -> requests.Response:
+        histogram = _histogram(url)
+        if self.rate_limiter is not None:
+            self.rate_limiter.acquire()
+        start = time.perf_counter()
+        try:
+            response = super().request(method, url, **kwargs)
+        except requests.RequestException:
+            with _latency_lock:
+                histogram.errors += 1
+            raise
+        finally:
+            with _latency_lock:
+                histogram.record(time.perf_counter() - start)
+        # Bytes pulled over the wire, i.e. before gzip/deflate decoding.
+        # Streamed bodies are read by the caller and not counted
+        if not kwargs.get("stream"):
+            body = response.content
+            tell = getattr(response.raw, "tell", None)
+            with _latency_lock:
+                histogram.bytes += tell() if callable(tell) else len(body)
+        return response
+
+    def _hedged(self, method: str, url: str, kwargs: Dict[str, Any]) -> requests.Response:
+        with self._hedge_lock:
+            if self._hedge_pool is None:
+                # Room for a primary and a hedge per pooled connection, so primaries never
+                # wait for a worker and hedge_after counts from when they are actually sent
+                self._hedge_pool = ThreadPoolExecutor(max_workers=2 * self._pool_size)
+        first = self._hedge_pool.submit(self._timed, method, url, kwargs)
+        done, _ = wait([first], timeout=self.hedge_after)
+        if done:
+            return first.result()
+        with _latency_lock:
+            _histogram(url).hedges += 1
+        second = self._hedge_pool.submit(self._timed, method, url, kwargs)
+        done, _ = wait([first, second], return_when=FIRST_COMPLETED)
+        winner = first if first in done else second
+        loser = second if winner is first else first
+        if winner.exception() is not None:
+            return loser.result()
+        # Release the slower request's connection once it finishes
+        loser.add_done_callback(lambda future: future.exception() is None and future.result().close())
+        return winner.result()
+
+    def request(self, method: str, url: str, **kwargs: Any) -> requests.Response:
+        """Send a request with the client's timeout, retry and hedging policy."""
+        kwargs.setdefault("timeout", self.timeout)
+        method = method.upper()
+        idempotent = method in IDEMPOTENT_METHODS
+        hedge = idempotent and self.hedge_after is not None and not kwargs.get("stream")
+        attempt = 0
+        while True:
+            try:
+                response = self._hedged(method, url, kwargs) if hedge else self._timed(method, url, kwargs)
+            except (requests.ConnectionError, requests.Timeout):
+                if not idempotent or attempt >= self.retries:
+                    raise
+                delay = self._delay(attempt)
+            else:
+                if response.status_code not in RETRY_STATUSES or not idempotent or attempt >= self.retries:
+                    return response
+                delay = retry_after(response)
+                if delay is None:
+                    delay = self._delay(attempt)
+                delay = min(delay, MAX_BACKOFF)
+                response.close()
+            with _latency_lock:
+                _histogram(url).retries += 1
+            attempt += 1
+            time.sleep(delay)
+
+    def close(self) -> None:
+        if self._hedge_pool is not None:
+            self._hedge_pool.shutdown(wait=False)
+        super().close()
+
+
+_settings: Dict[str, Any] = {}
+_default_client: Optional[HTTPClient] = None
+_default_lock = threading.Lock()
+
+
+def configure(**settings: Any) -> None:
+    """Set the defaults (``timeout``, ``retries``, ``backoff``, ``hedge_after``) for new clients."""
+    global _default_client
+    with _default_lock:
+        _settings.update(settings)
+        _default_client = None
+
+
+def create_session(pool_size: int = DEFAULT_POOL_SIZE) -> HTTPClient:
+    """Create a client whose connection pool fits ``pool_size`` workers, using the configured defaults."""
+    return HTTPClient(pool_size, **_settings)
+
+
+def default_client() -> HTTPClient:
+    """Return the process-wide client used when a caller does not pass its own session."""
+    global _default_client
+    with _default_lock:
+        if _default_client is None:
+            _default_client = HTTPClient(**_settings)
+        return _default_client
+
+
+def positive_float(value: str) -> float:
+    """argparse type for rates and budgets, which must be greater than zero."""
+    number = float(value)
+    if number <= 0:
+        raise argparse.ArgumentTypeError(f"must be greater than 0, not {value}")
+    return number
+
+
+def add_client_arguments(parser: argparse.ArgumentParser) -> None:
+    """Add the shared ``--http-*`` command line options to ``parser``."""
+    parser.add_argument("--http-timeout", type=float, nargs=2, metavar=("CONNECT", "READ"),
+                        default=(DEFAULT_CONNECT_TIMEOUT, DEFAULT_READ_TIMEOUT),
+                        help=f"Connect and read timeouts in seconds "
+                             f"(default: {DEFAULT_CONNECT_TIMEOUT:g} {DEFAULT_READ_TIMEOUT:g})")
+    parser.add_argument("--http-retries", type=int, default=DEFAULT_RETRIES,
+                        help=f"Retries of 429/5xx responses and connection errors (default: {DEFAULT_RETRIES})")
+    parser.add_argument("--http-hedge-after", type=float, metavar="SECONDS",
+                        help="Send a duplicate GET when the first has not answered after SECONDS (default: off)")
+
+
+def configure_from_args(args: argparse.Namespace) -> None:
+    """Apply the options added by :func:`add_client_arguments`."""
+    configure(timeout=tuple(args.http_timeout), retries=args.http_retries, hedge_after=args.http_hedge_after)
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+Incremental extraction of one array from a streamed JSON document.
+
+``JSONArrayStream`` reads a JSON document chunk by chunk (for example from
+``requests.Response.iter_content``) and yields the elements of the first
+array stored under a given key as soon as each element has arrived.  Reading
+stops as soon as that array is closed, so the rest of a large payload is
+never downloaded or decoded.
+
+Only the structure of the document is tracked while searching: strings are
+skipped with a regular expression and object keys are only decoded where
+they could lead to the target.  The JSON path at which the array was found
+is exposed as ``stream.path`` (a list of keys and array indices); passing it
+back as ``path=`` on later runs restricts the search to exactly that
+location.  ``stream.matched`` tells whether a matching array was reached at
+all, so an empty array can be told apart from a path that is gone.
+
+    stream = JSONArrayStream(response.iter_content(65536), "passedExams")
+    for exam in stream:
+        ...
+    print(stream.path)   # e.g. ['certificationData', 'passedExams']
+"""
+import codecs
+import json
+import re
+from typing import Any, Iterable, Iterator, List, Optional, Union
+
+_STRUCTURAL = re.compile(r'[\[\]{}",:]')
+_STRING = re.compile(r'"(?:[^"\\]|\\.)*"', re.DOTALL)
+_SEPARATORS = re.compile(r'[\s,]*')
+_WHITESPACE = re.compile(r'\s*')
+
+PathElement = Union[str, int]
+
+
+class JSONArrayStream:
+    """Iterator over the elements of the first array found under ``key``.
+
+    The key and search order mirror the recursive search in
+    ``passed_exams.extract_passed_exams``: keys match case-insensitively, the
+    first non-empty match in document order wins, and an empty match ends the
+    search within its enclosing object.  If no array is found the iterator is
+    simply empty and ``path`` stays None; ``matched`` is True once an array
+    under the key (or at the hinted path) was reached, even an empty one.
+    """
+
+    def __init__(self, chunks: Iterable[Union[bytes, str]], key: str,
+                 path: Optional[List[PathElement]] = None) -> None:
+        """Prepare to scan ``chunks``.
+
+        :param chunks: The document as an iterable of byte (UTF-8) or text chunks
+        :param key: Object key holding the wanted array
+        :param path: Optional exact path from an earlier run; only that location matches
+        """
+        self.key = key.lower()
+        self.hint = list(path) if path is not None else None
+        self.path: Optional[List[PathElement]] = None
+        self.matched = False
+        self._chunks = iter(chunks)
+        self._decoder = codecs.getincrementaldecoder("utf-8")()
+        self._buf = ""
+        self._pos = 0
+        self._eof = False
+
+    def _more(self) -> None:
+        """Append the next chunk to the buffer, dropping what was already consumed."""
+        try:
+            chunk = next(self._chunks)
+            text = self._decoder.decode(chunk) if isinstance(chunk, bytes) else chunk
+        except StopIteration:
+            self._eof = True
+            text = self._decoder.decode(b"", final=True)
+        self._buf = self._buf[self._pos:] + text
+        self._pos = 0
+
+    def _on_hint(self, stack: List[list]) -> bool:
+        """True if the containers currently open lie on the hinted path."""
+        if self.hint is None:
+            return True
+        depth = len(stack)
+        return depth <= len(self.hint) and all(
+            frame[1] == self.hint[i] for i, frame in enumerate(stack[:-1])
+        )
+
+    def _is_target(self, stack: List[list]) -> bool:
+        key = stack[-1][1]
+        if self.hint is not None:
+            return [frame[1] for frame in stack] == self.hint
+        return isinstance(key, str) and key.lower() == self.key
+
+    def __iter__(self) -> Iterator[Any]:
+        # Each frame is ["{", current key, expecting a key] or ["[", index]
+        stack: List[list] = []
+        # Depth of an object whose remaining keys are excluded from matching
+        blocked_depth = None
+        while True:
+            match = _STRUCTURAL.search(self._buf, self._pos)
+            if match is None:
+                if self._eof:
+                    return
+                self._pos = len(self._buf)
+                self._more()
+                continue
+            char = match.group()
+            self._pos = match.start()
+
+            if char == '"':
+                string = _STRING.match(self._buf, self._pos)
+                if string is None:
+                    if self._eof:
+                        raise ValueError("Unterminated string in JSON stream")
+                    self._more()
+                    continue
+                self._pos = string.end()
+                top = stack[-1] if stack else None
+                if top is not None and top[0] == "{" and top[2]:
+                    # Only pay for decoding keys that could lead to the target
+                    top[1] = json.loads(string.group()) if self._on_hint(stack) else None
+                    top[2] = False
+            elif char == ",":
+                self._pos += 1
+                top = stack[-1]
+                if top[0] == "{":
+                    top[1], top[2] = None, True
+                else:
+                    top[1] += 1
+            elif char == ":":
+                self._pos += 1
+            elif char in "}]":
+                self._pos += 1
+                stack.pop()
+                if blocked_depth is not None and len(stack) < blocked_depth:
+                    blocked_depth = None
+            elif (char == "[" and blocked_depth is None and stack and stack[-1][0] == "{"
+                  and self._is_target(stack)):
+                self._pos += 1
+                self.matched = True
+                path = [frame[1] for frame in stack]
+                found = False
+                for item in self._array_items():
+                    if not found:
+                        found = True
+                        self.path = path
+                    yield item
+                # The hinted path occurs only once, so an empty array there is the answer
+                if found or self.hint is not None:
+                    return
+                blocked_depth = len(stack)
+            else:
+                self._pos += 1
+                stack.append(["{", None, True] if char == "{" else ["[", 0])
+
+    def _array_items(self) -> Iterator[Any]:
+        """Decode and yield array elements until the closing bracket."""
+        decoder = json.JSONDecoder()
+        while True:
+            self._pos = _SEPARATORS.match(self._buf, self._pos).end()
+            if self._pos >= len(self._buf):
+                if self._eof:
+                    raise ValueError("Unterminated array in JSON stream")
+                self._more()
+                continue
+            if self._buf[self._pos] == "]":
+                self._pos += 1
+                return
+            try:
+                item, end = decoder.raw_decode(self._buf, self._pos)
+            except json.JSONDecodeError:
+                if self._eof:
+                    raise
+                self._more()
+                continue
+            # A bare number may have been cut short by the chunk boundary, so
+            # only accept the element once the following separator is visible
+            after = _WHITESPACE.match(self._buf, end).end()
+            if after >= len(self._buf) or self._buf[after] not in ",]":
+                if self._eof:
+                    raise ValueError("Malformed array in JSON stream")
+                self._more()
+                continue
+            self._pos = end
+            yield item
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Deterministic, in-process exam recommendations.
+
+The model is asked to pick the next exam from the priority list, skipping
+exams already on the transcript and weighing recent exams most.  Most
+transcripts make that choice obvious, so ``recommend`` answers it locally:
+
+1. candidates are the priority exams minus the passed exams (a set difference)
+2. every passed exam votes for the exams that logically follow it in
+   ``PROGRESSION``, and more weakly for exams of the same family (``AZ``,
+   ``SC``, ``PL`` ...); each vote decays with the age of the passed exam
+3. the best-scoring candidate wins, with the priority list order as tie breaker
+
+The returned confidence compares the winner against the runner-up, with a
+prior (``CONFIDENCE_PRIOR``) in the denominator so that a single weak vote
+is not trusted just because nothing else scored.  Callers only fall back to
+the model when it is below a threshold (see
+``ai_exam_recommender.py --local-threshold``).
+"""
+import csv
+import io
+import math
+from datetime import date, datetime
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+DEFAULT_THRESHOLD = 0.6
+# Days after which a passed exam carries half its weight
+RECENCY_HALF_LIFE = 365.0
+FAMILY_WEIGHT = 0.25
+# Score of an unseen rival added to the runner-up.  An unopposed progression
+# vote gives 0.83 when fresh and 0.71 at a year old; a two-year-old vote or a
+# fresh family vote alone (0.25) gives 0.56 and is left to the model
+CONFIDENCE_PRIOR = 0.2
+
+# Exam -> exams that naturally follow it.  Fundamentals lead to associate
+# exams, associate exams to the expert exams that build on them, and retired
+# exams to their replacements.
+PROGRESSION: Dict[str, Tuple[str, ...]] = {
+    "AZ-900": ("AZ-104", "AZ-204", "AZ-500", "AZ-700"),
+    "AI-900": ("AI-102",),
+    "DP-900": ("DP-300", "DP-600", "DP-700", "DP-100"),
+    "SC-900": ("SC-200", "SC-300", "SC-401", "AZ-500"),
+    "MS-900": ("MS-102", "MD-102", "MS-700", "MS-721"),
+    "PL-900": ("PL-200", "PL-300", "PL-400"),
+    "MB-910": ("MB-230", "MB-240", "MB-280"),
+    "MB-920": ("MB-310", "MB-330", "MB-335", "MB-800", "MB-820"),
+    "GH-900": ("GH-300",),
+    "AZ-104": ("AZ-305", "AZ-700", "AZ-500", "AZ-400"),
+    "AZ-204": ("AZ-400", "AZ-305", "AI-102"),
+    "AZ-800": ("AZ-104",),
+    "AZ-801": ("AZ-104",),
+    "AZ-103": ("AZ-104", "AZ-305"),
+    "AZ-303": ("AZ-305",),
+    "AZ-304": ("AZ-305",),
+    "AZ-500": ("SC-100",),
+    "AZ-700": ("AZ-305",),
+    "AZ-400": ("GH-300",),
+    "AI-102": ("DP-100",),
+    "DP-203": ("DP-700", "DP-600"),
+    "DA-100": ("PL-300",),
+    "PL-300": ("DP-600",),
+    "DP-600": ("DP-700",),
+    "SC-200": ("SC-100",),
+    "SC-300": ("SC-100",),
+    "SC-400": ("SC-401",),
+    "SC-401": ("SC-100",),
+    "MD-100": ("MD-102",),
+    "MD-101": ("MD-102",),
+    "MD-102": ("MS-102",),
+    "MS-100": ("MS-102",),
+    "MS-101": ("MS-102",),
+    "MS-500": ("SC-300", "SC-401"),
+    "PL-100": ("PL-200",),
+    "PL-200": ("PL-400", "PL-600"),
+    "PL-400": ("PL-600", "PL-500"),
+    "MB-200": ("MB-230", "MB-280"),
+    "MB-210": ("MB-280",),
+    "MB-220": ("MB-280",),
+    "MB-230": ("MB-700",),
+    "MB-240": ("MB-700",),
+    "MB-280": ("MB-700",),
+    "MB-300": ("MB-310", "MB-330", "MB-335", "MB-500"),
+    "MB-310": ("MB-700",),
+    "MB-330": ("MB-335", "MB-700"),
+    "MB-335": ("MB-700",),
+    "MB-500": ("MB-700",),
+    "MB-800": ("MB-820",),
+}
+
+
+class Recommendation(NamedTuple):
+    """Outcome of ``recommend``: the chosen exam, how sure the engine is, and every score."""
+    exam_code: str
+    confidence: float
+    scores: Dict[str, float]
+
+
+def family(exam_code: str) -> str:
+    """Return the exam family prefix, e.g. ``AZ`` for ``AZ-104``."""
+    return exam_code.split("-", 1)[0]
+
+
+def parse_transcript(transcript_text: str) -> List[Tuple[str, Optional[date]]]:
+    """Return ``(exam code, exam date)`` pairs from passed exams CSV text."""
+    exams = []
+    for row in csv.DictReader(io.StringIO(transcript_text)):
+        code = (row.get("Exam Number") or "").strip().upper()
+        if not code:
+            continue
+        try:
+            taken = datetime.strptime((row.get("Exam Date") or "").strip()[:10], "%Y-%m-%d").date()
+        except ValueError:
+            taken = None
+        exams.append((code, taken))
+    return exams
+
+
+def recommend(passed: Iterable[Tuple[str, Optional[date]]], priority_exams: List[str],
+              today: Optional[date] = None) -> Recommendation:
+    """Rank the priority exams the learner has not passed yet.
+
+    :param passed: ``(exam code, exam date)`` pairs; undated exams count as old
+    :param priority_exams: Candidate exams in priority order
+    :param today: Reference date for recency (default: today)
+    :return: The best candidate, or ``"-"`` with zero confidence if none is left
+    """
+    today = today or date.today()
+    weights: Dict[str, float] = {}
+    for code, taken in passed:
+        age = (today - taken).days if taken else 10 * RECENCY_HALF_LIFE
+        weight = math.pow(0.5, max(age, 0) / RECENCY_HALF_LIFE)
+        weights[code.upper()] = max(weights.get(code.upper(), 0.0), weight)
+
+    candidates = [exam for exam in dict.fromkeys(e.upper() for e in priority_exams) if exam not in weights]
+    if not candidates:
+        return Recommendation("-", 0.0, {})
+    candidate_set = set(candidates)
+
+    scores = dict.fromkeys(candidates, 0.0)
+    family_weights: Dict[str, float] = {}
+    for code, weight in weights.items():
+        for follow_on in PROGRESSION.get(code, ()):
+            if follow_on in candidate_set:
+                scores[follow_on] += weight
+        family_weights[family(code)] = max(family_weights.get(family(code), 0.0), weight)
+    for candidate in candidates:
+        scores[candidate] += FAMILY_WEIGHT * family_weights.get(family(candidate), 0.0)
+
+    # Stable sort keeps the priority order among equal scores
+    ranked = sorted(candidates, key=lambda exam: -scores[exam])
+    best = scores[ranked[0]]
+    runner_up = scores[ranked[1]] if len(ranked) > 1 else 0.0
+    confidence = best / (best + runner_up + CONFIDENCE_PRIOR) if best > 0 else 0.0
+    return Recommendation(ranked[0], confidence, scores)
+
+
+def recommend_transcript(transcript_text: str, priority_exams: List[str],
+                         today: Optional[date] = None) -> Recommendation:
+    """``recommend`` for passed exams CSV text."""
+    return recommend(parse_transcript(transcript_text), priority_exams, today)
@@ -0,0 +1,306 @@
+#!/usr/bin/env python3
+"""
+Stage timers, counters and profiling for the scripts.
+
+Code marks the work it does with :func:`stage`, which adds the elapsed time,
+call count and number of records handled to a process-wide registry:
+
+    with stage("transcript.locate") as timer:
+        path, raw_exams = ...
+        timer.records = len(raw_exams)
+
+or, for a whole function, with the :func:`timed` decorator, which takes the
+record count from the length of the returned value:
+
+    @timed("transcript.normalize")
+    def normalize_exams(raw_exams): ...
+
+Stages running in several threads at once add up their time, so a stage can
+report more seconds than the run took.  Counters that are not stages use
+:func:`count`.  At the end of a run :func:`collect` combines the stages with
+the per-host request counts, seconds, wire bytes and retries of ``http_client`` and
+the hit/miss counts of the ``HTTPCache``, and writes them as a JSON summary
+(``--metrics-json``) and/or an OpenMetrics text file (``--metrics-file``).
+
+``--profile cprofile`` runs the script under cProfile and prints the most
+expensive functions of this repository; ``--profile tracemalloc`` traces
+allocations and prints the lines that allocated the most memory.  Either way
+the full output is also written to ``--profile-output``.
+
+    parser = argparse.ArgumentParser()
+    add_metrics_arguments(parser)
+    args = parser.parse_args()
+    with collect(args, "passed_exams", cache=cache):
+        ...
+"""
+import argparse
+import contextlib
+import cProfile
+import functools
+import io
+import json
+import os
+import pstats
+import re
+import sys
+import threading
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterator, List, Optional, TypeVar
+
+from http_client import latency_histograms
+
+PROFILERS = ("cprofile", "tracemalloc")
+PROFILE_TOP = 25
+METRIC_PREFIX = "exam_timeline"
+
+_REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+
+class StageTimer:
+    """Handle yielded by :func:`stage`; set ``records`` to the number of records handled."""
+    __slots__ = ("records",)
+
+    def __init__(self) -> None:
+        self.records: Optional[int] = None
+
+
+class Metrics:
+    """Thread-safe registry of stage timings and counters."""
+
+    def __init__(self) -> None:
+        self.stages: Dict[str, Dict[str, float]] = {}
+        self.counters: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def add_stage(self, name: str, seconds: float, records: Optional[int] = None) -> None:
+        with self._lock:
+            entry = self.stages.setdefault(name, {"calls": 0, "seconds": 0.0, "records": 0})
+            entry["calls"] += 1
+            entry["seconds"] += seconds
+            entry["records"] += records or 0
+
+    def count(self, name: str, value: float = 1) -> None:
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def reset(self) -> None:
+        with self._lock:
+            self.stages.clear()
+            self.counters.clear()
+
+
+_metrics = Metrics()
+
+
+def registry() -> Metrics:
+    """Return the process-wide registry."""
+    return _metrics
+
+
+@contextlib.contextmanager
+def stage(name: str) -> Iterator[StageTimer]:
+    """Time the enclosed block as stage ``name``, including when it raises."""
+    timer = StageTimer()
+    start = time.perf_counter()
+    try:
+        yield timer
+    finally:
+        _metrics.add_stage(name, time.perf_counter() - start, timer.records)
+
+
+def _length(result: Any, *args: Any, **kwargs: Any) -> Optional[int]:
+    try:
+        return len(result)
+    except TypeError:
+        return None
+
+
+def timed(name: str, records: Callable[..., Optional[int]] = _length) -> Callable[[F], F]:
+    """Decorator timing every call of the function as stage ``name``.
+
+    :param name: Stage name
+    :param records: Called with the return value followed by the call's
+        arguments and returns the number of records handled; by default the
+        length of the returned value
+    """
+    def decorator(func: F) -> F:
+        @functools.wraps(func)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            with stage(name) as timer:
+                result = func(*args, **kwargs)
+                timer.records = records(result, *args, **kwargs)
+                return result
+        return wrapper  # type: ignore[return-value]
+    return decorator
+
+
+def count(name: str, value: float = 1) -> None:
+    """Add ``value`` to counter ``name``."""
+    _metrics.count(name, value)
+
+
+def summary(script: str, seconds: float, cache: Any = None,
+            extra: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Return the metrics of this run as a JSON-serialisable dictionary.
+
+    :param script: Name of the script, used as a label
+    :param seconds: Wall time of the run
+    :param cache: Optional ``HTTPCache`` whose hit/miss counts are included
+    :param extra: Additional top-level fields
+    """
+    with _metrics._lock:
+        stages = {name: dict(entry) for name, entry in _metrics.stages.items()}
+        counters = dict(_metrics.counters)
+    for entry in stages.values():
+        entry["seconds"] = round(entry["seconds"], 6)
+        entry["records_per_second"] = (round(entry["records"] / entry["seconds"], 1)
+                                       if entry["records"] and entry["seconds"] else None)
+    http = {
+        host: {"requests": histogram.count, "seconds": round(histogram.total, 6), "bytes": histogram.bytes,
+               "retries": histogram.retries, "hedges": histogram.hedges, "errors": histogram.errors}
+        for host, histogram in sorted(latency_histograms().items())
+    }
+    result: Dict[str, Any] = {
+        "script": script,
+        "finished_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "seconds": round(seconds, 6),
+        "stages": stages,
+        "counters": counters,
+        "http": http,
+    }
+    if cache is not None:
+        result["cache"] = {"hits": cache.hits, "misses": cache.misses,
+                           "bytes_downloaded": cache.bytes_downloaded, "bytes_saved": cache.bytes_saved}
+    result.update(extra or {})
+    return result
+
+
+def _label(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _metric_name(name: str) -> str:
+    return re.sub(r"[^a-zA-Z0-9_]", "_", name)
+
+
+def openmetrics(data: Dict[str, Any]) -> str:
+    """Render a :func:`summary` dictionary in the OpenMetrics text format."""
+    script = _label(data["script"])
+    lines: List[str] = []
+
+    def family(name: str, kind: str, help_text: str, samples: List[str]) -> None:
+        if samples:
+            lines.extend([f"# TYPE {METRIC_PREFIX}_{name} {kind}", f"# HELP {METRIC_PREFIX}_{name} {help_text}"])
+            lines.extend(samples)
+
+    def sample(name: str, labels: Dict[str, Any], value: Any) -> str:
+        rendered = ",".join(f'{key}="{_label(val)}"' for key, val in {"script": script, **labels}.items())
+        return f"{METRIC_PREFIX}_{name}{{{rendered}}} {value}"
+
+    family("run_seconds", "gauge", "Wall time of the run.", [sample("run_seconds", {}, data["seconds"])])
+    stages = data["stages"]
+    family("stage_seconds", "counter", "Time spent in each stage, summed over threads.",
+           [sample("stage_seconds_total", {"stage": name}, entry["seconds"]) for name, entry in stages.items()])
+    family("stage_calls", "counter", "Times each stage ran.",
+           [sample("stage_calls_total", {"stage": name}, entry["calls"]) for name, entry in stages.items()])
+    family("stage_records", "counter", "Records handled by each stage.",
+           [sample("stage_records_total", {"stage": name}, entry["records"])
+            for name, entry in stages.items() if entry["records"]])
+    family("stage_records_per_second", "gauge", "Records per second of each stage.",
+           [sample("stage_records_per_second", {"stage": name}, entry["records_per_second"])
+            for name, entry in stages.items() if entry["records_per_second"] is not None])
+    for field, help_text in (("requests", "HTTP requests sent."), ("seconds", "Time waiting for HTTP responses."),
+                             ("bytes", "Response bytes received on the wire, before decompression."), ("retries", "HTTP requests retried."),
+                             ("errors", "HTTP requests that failed.")):
+        family(f"http_{field}", "counter", help_text,
+               [sample(f"http_{field}_total", {"host": host}, entry[field]) for host, entry in data["http"].items()])
+    if "cache" in data:
+        for field in ("hits", "misses", "bytes_downloaded", "bytes_saved"):
+            family(f"cache_{field}", "counter", f"HTTP cache {field.replace('_', ' ')}.",
+                   [sample(f"cache_{field}_total", {}, data["cache"][field])])
+    for name, value in data["counters"].items():
+        metric = _metric_name(name)
+        family(metric, "counter", f"Counter {name}.", [sample(f"{metric}_total", {}, value)])
+    if data.get("peak_traced_bytes") is not None:
+        family("peak_traced_bytes", "gauge", "Peak memory traced by tracemalloc.",
+               [sample("peak_traced_bytes", {}, data["peak_traced_bytes"])])
+    lines.append("# EOF")
+    return "\n".join(lines) + "\n"
+
+
+def _write(path: str, text: str) -> None:
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+
+def add_metrics_arguments(parser: argparse.ArgumentParser) -> None:
+    """Add the shared metrics and profiling command line options to ``parser``."""
+    group = parser.add_argument_group("metrics", "Stage timings and profiling (see metrics.py)")
+    group.add_argument("--metrics-json", metavar="PATH", help="Write a JSON summary of the run's metrics")
+    group.add_argument("--metrics-file", metavar="PATH", help="Write the run's metrics in OpenMetrics text format")
+    group.add_argument("--profile", choices=PROFILERS,
+                       help="Profile the run with cProfile or tracemalloc and print the hot spots")
+    group.add_argument("--profile-output", metavar="PATH",
+                       help="File for the full profile (default: <script>.prof or <script>.tracemalloc.txt)")
+
+
+def _report_cprofile(profiler: cProfile.Profile, path: str) -> None:
+    profiler.dump_stats(path)
+    out = io.StringIO()
+    stats = pstats.Stats(profiler, stream=out)
+    # Only this repository's functions; library internals are in the dump
+    stats.sort_stats("cumulative").print_stats(re.escape(_REPO_DIR), PROFILE_TOP)
+    print(out.getvalue(), file=sys.stderr)
+    print(f"Full profile written to {path} (python -m pstats {path})", file=sys.stderr)
+
+
+def _report_tracemalloc(path: str) -> int:
+    snapshot = tracemalloc.take_snapshot()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    top = snapshot.statistics("lineno")
+    lines = [f"Peak traced memory: {peak / 1024 / 1024:.1f} MiB"]
+    lines.extend(str(stat) for stat in top)
+    _write(path, "\n".join(lines) + "\n")
+    print("\n".join(lines[:PROFILE_TOP + 1]), file=sys.stderr)
+    print(f"Full allocation report written to {path}", file=sys.stderr)
+    return peak
+
+
+@contextlib.contextmanager
+def collect(args: argparse.Namespace, script: str, cache: Any = None) -> Iterator[Metrics]:
+    """Profile the enclosed run if asked to and write its metrics when it ends.
+
+    :param args: Parsed options added by :func:`add_metrics_arguments`
+    :param script: Name of the script, used as a label and for default file names
+    :param cache: Optional ``HTTPCache`` whose counts are included
+    """
+    profiler = None
+    if args.profile == "cprofile":
+        profiler = cProfile.Profile()
+        profiler.enable()
+    elif args.profile == "tracemalloc":
+        tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        yield _metrics
+    finally:
+        seconds = time.perf_counter() - start
+        extra = {}
+        if profiler is not None:
+            profiler.disable()
+            _report_cprofile(profiler, args.profile_output or f"{script}.prof")
+        elif args.profile == "tracemalloc":
+            extra["peak_traced_bytes"] = _report_tracemalloc(args.profile_output or f"{script}.tracemalloc.txt")
+        if args.metrics_json or args.metrics_file:
+            data = summary(script, seconds, cache, extra)
+            if args.metrics_json:
+                _write(args.metrics_json, json.dumps(data, indent=2) + "\n")
+            if args.metrics_file:
+                _write(args.metrics_file, openmetrics(data))
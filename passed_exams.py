@@ -4,12 +4,33 @@ Script to fetch a public Microsoft Learn transcript and extract passed exam info
 
 Usage:
     python passed_exams.py <share_id> [--locale <locale>] [--output <output.csv>]
+    python passed_exams.py --bulk <share_ids.txt|-> [--concurrency <n>]
+                           [--output <combined.csv> | --output-dir <dir>]
 
 Example:
     python passed_exams.py d8yjji6kmml5jg0 --locale en-us --output passed_exams.csv
 
 If no output filename is provided, the script writes to passed_exams_<share_id>.csv.
 
+Bulk mode reads one share_id per line from a file (or stdin when the filename
+is ``-``) and fetches the transcripts concurrently over a pooled HTTP session.
+With ``--output`` all learners are written to a single CSV with an extra
+``Share ID`` column; otherwise one passed_exams_<share_id>.csv is written per
+learner into ``--output-dir``.  A failure for one learner is reported on
+stderr and does not stop the others.
+
+With ``--stream`` the response is parsed incrementally and the download stops
+as soon as the ``passedExams`` list is complete (the HTTP cache is bypassed in
+this mode).  In every mode the JSON path at which the list was found is
+remembered in ``--path-hint`` so later runs go straight to it.
+
+With ``--history-db`` every learner's exams are also appended to the SQLite
+history store of ``history_store.py``, which keeps what changed between runs.
+
+With ``--watch`` the script keeps running and polls the learners on adaptive
+schedules under a global request budget, rewriting a CSV only when that
+learner's exams changed; see ``watch_daemon.py``.
+
 The share_id is the identifier at the end of the public transcript URL, e.g., for
 https://learn.microsoft.com/en-gb/users/<username>/transcript/<share_id>, use <share_id>.
 
@@ -28,66 +49,121 @@ learn.microsoft.com.
 To test locally, you can start a local web server `python -m http.server 8000` and then open using `http://localhost:8000`.
 """
 import argparse
+import contextlib
 import csv
+import json
 import os
 import sys
-from typing import List, Dict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Dict, Iterable, Iterator, List, Optional, TextIO, Tuple
 import requests
 
-API_ENDPOINT_TEMPLATE = "https://learn.microsoft.com/api/profiles/transcript/share/{share_id}?locale={locale}"
+from build_timeline_data import refresh_timeline
+from http_cache import HTTPCache, add_cache_arguments, cache_from_args
+from history_store import EXAMS, HistoryStore, append_rows
+from http_client import (add_client_arguments, configure_from_args, create_session, default_client,
+                         print_latency_summary)
+from json_stream import JSONArrayStream, PathElement
+from metrics import add_metrics_arguments, collect, stage, timed
+from records import ExamRecord, load_known
+from watch_daemon import (Watcher, add_watch_arguments, policy_from_args, refresh_dashboard, run_daemon,
+                          watch_session)
+
+# LEARN_BASE_URL points the script at another host, e.g. the benchmark stub server
+LEARN_BASE_URL = os.environ.get("LEARN_BASE_URL", "https://learn.microsoft.com")
+API_ENDPOINT_TEMPLATE = LEARN_BASE_URL + "/api/profiles/transcript/share/{share_id}?locale={locale}"
+FIELDNAMES = ExamRecord.fieldnames()
+DEFAULT_CONCURRENCY = 8
+DEFAULT_PATH_HINT_FILE = ".passed_exams_path.json"
+STREAM_CHUNK_SIZE = 16 * 1024
+
+
+def transcript_url(share_id: str, locale: str = "en-us") -> str:
+    """Return the transcript API URL for ``share_id``."""
+    return API_ENDPOINT_TEMPLATE.format(share_id=share_id, locale=locale)
 
 
-def fetch_transcript(share_id: str, locale: str = "en-us") -> Dict:
+def fetch_transcript(share_id: str, locale: str = "en-us",
+                     session: Optional[requests.Session] = None,
+                     cache: Optional[HTTPCache] = None) -> Dict:
     """Fetch transcript JSON from the Microsoft Learn public API.
 
     :param share_id: The transcript sharing identifier from the URL
     :param locale: Locale parameter for the API (default: en-us)
+    :param session: Optional session to reuse pooled connections
+    :param cache: Optional conditional HTTP cache to revalidate against
     :return: Parsed JSON response
     :raises requests.HTTPError: if the HTTP request returned an unsuccessful status code
     :raises ValueError: if the response cannot be decoded as JSON
     """
-    url = API_ENDPOINT_TEMPLATE.format(share_id=share_id, locale=locale)
+    url = transcript_url(share_id, locale)
     headers = {
         # Provide a User‑Agent to avoid potential filtering of generic requests
         "User-Agent": "Mozilla/5.0 (compatible; MSFTTranscriptFetcher/1.0)"
     }
-    response = requests.get(url, headers=headers)
+    if cache is not None:
+        return cache.get_json(url, headers=headers, session=session)
+    response = (session or default_client()).get(url, headers=headers)
     response.raise_for_status()
-    return response.json()
+    with stage("json_decode"):
+        return response.json()
 
 
-def extract_passed_exams(transcript_json: Dict) -> List[Dict[str, str]]:
+@timed("transcript.locate", records=lambda result, *args, **kwargs: len(result[1]))
+def locate_passed_exams(transcript_json: Dict, path_hint: Optional[List[PathElement]] = None
+                        ) -> Tuple[Optional[List[PathElement]], List[Dict[str, Any]]]:
     """
-    Extract a list of passed exams from the transcript JSON.
+    Find the raw ``passedExams`` list in the transcript JSON and the path leading to it.
 
     Microsoft may evolve the transcript schema over time; exam details
     have been observed under ``certificationData.passedExams`` but could
-    appear elsewhere.  This function searches the entire JSON structure
-    recursively for a list associated with the key ``passedExams``.
+    appear elsewhere.  If ``path_hint`` (a path found on an earlier run)
+    still leads to a non-empty list it is used directly; otherwise the
+    entire JSON structure is searched recursively for a list associated
+    with the key ``passedExams``.
 
     :param transcript_json: Transcript JSON as returned by the API
-    :return: List of dictionaries with exam title, number and date
+    :param path_hint: Optional list of keys and indices from an earlier run
+    :return: Tuple of the path (None if not found) and the raw exam list
     """
-    def find_passed_exams(obj: Dict) -> List[Dict[str, str]]:
-        """Recursively search for 'passedExams' key and return its value when found."""
+    if path_hint:
+        obj: Any = transcript_json
+        try:
+            for step in path_hint:
+                obj = obj[step]
+        except (KeyError, IndexError, TypeError):
+            obj = None
+        if isinstance(obj, list) and obj:
+            return list(path_hint), obj
+
+    def find_passed_exams(obj: Any, path: List[PathElement]
+                          ) -> Tuple[Optional[List[PathElement]], List[Dict[str, Any]]]:
+        """Recursively search for 'passedExams' key and return its path and value when found."""
         if isinstance(obj, dict):
             for key, value in obj.items():
                 # Case-insensitive match in case the schema changes
                 if key.lower() == "passedexams" and isinstance(value, list):
-                    return value
+                    return path + [key], value
                 elif isinstance(value, (dict, list)):
-                    found = find_passed_exams(value)
-                    if found:
+                    found = find_passed_exams(value, path + [key])
+                    if found[1]:
                         return found
         elif isinstance(obj, list):
-            for item in obj:
-                found = find_passed_exams(item)
-                if found:
+            for index, item in enumerate(obj):
+                found = find_passed_exams(item, path + [index])
+                if found[1]:
                     return found
-        return []
+        return None, []
+
+    found_path, raw_exams = find_passed_exams(transcript_json, [])
+    return (found_path if raw_exams else None), raw_exams
 
-    raw_exams = find_passed_exams(transcript_json)
-    exams: List[Dict[str, str]] = []
+
+def iter_exams(raw_exams: Iterable[Dict[str, Any]]) -> Iterator[ExamRecord]:
+    """Yield an exam record with title, number and date for each raw ``passedExams`` entry.
+
+    :param raw_exams: Entries of the transcript's ``passedExams`` list, possibly still streaming in
+    """
     for exam in raw_exams:
         # Some older schemas may use different key casing; use .get with default
         exam_title = exam.get("examTitle") or exam.get("ExamTitle") or ""
@@ -95,59 +171,419 @@ def extract_passed_exams(transcript_json: Dict) -> List[Dict[str, str]]:
         exam_date_taken = exam.get("examDateTaken") or exam.get("ExamDateTaken") or ""
         # Convert ISO datetime to date only (YYYY‑MM‑DD)
         exam_date = exam_date_taken.split("T")[0] if exam_date_taken else ""
-        exams.append({
-            "Exam Title": exam_title,
-            "Exam Number": exam_number,
-            "Exam Date": exam_date
-        })
-    return exams
+        yield ExamRecord.create(exam_title, exam_number, exam_date)
+
+
+@timed("transcript.normalize")
+def normalize_exams(raw_exams: Iterable[Dict[str, Any]]) -> List[ExamRecord]:
+    """Convert raw ``passedExams`` entries to records with exam title, number and date.
+
+    :param raw_exams: Entries of the transcript's ``passedExams`` list
+    :return: List of exam records
+    """
+    return list(iter_exams(raw_exams))
+
+
+def extract_passed_exams(transcript_json: Dict,
+                         path_hint: Optional[List[PathElement]] = None) -> List[ExamRecord]:
+    """
+    Extract a list of passed exams from the transcript JSON.
+
+    See :func:`locate_passed_exams` for how the exam list is found.
+
+    :param transcript_json: Transcript JSON as returned by the API
+    :param path_hint: Optional path to the exam list from an earlier run
+    :return: List of exam records
+    """
+    return normalize_exams(locate_passed_exams(transcript_json, path_hint)[1])
+
 
+def stream_passed_exams(share_id: str, locale: str = "en-us",
+                        session: Optional[requests.Session] = None,
+                        path_hint: Optional[List[PathElement]] = None
+                        ) -> Tuple[List[ExamRecord], Optional[List[PathElement]]]:
+    """Fetch a transcript and extract its passed exams while the body is still downloading.
 
-def write_csv(exams: List[Dict[str, str]], filename: str) -> None:
-    """Write a list of exam dictionaries to a CSV file.
+    The response is decoded incrementally and the connection is released as
+    soon as the ``passedExams`` list is complete, so the remainder of a large
+    transcript (modules, learning paths, applied skills) is never read.  When
+    the path of a ``path_hint`` from an earlier run is no longer in the
+    document, the transcript is fetched again and searched without it.
 
-    :param exams: List of exam info dictionaries
+    :param share_id: The transcript sharing identifier from the URL
+    :param locale: Locale parameter for the API (default: en-us)
+    :param session: Optional session to reuse pooled connections
+    :param path_hint: Optional path to the exam list from an earlier run
+    :return: Tuple of the exam rows and the path at which they were found
+    :raises requests.HTTPError: if the HTTP request returned an unsuccessful status code
+    :raises ValueError: if the response is not valid JSON up to the end of the list
+    """
+    headers = {
+        "User-Agent": "Mozilla/5.0 (compatible; MSFTTranscriptFetcher/1.0)"
+    }
+    with stage("transcript.stream") as timer, \
+            (session or default_client()).get(transcript_url(share_id, locale), headers=headers, stream=True) as response:
+        response.raise_for_status()
+        stream = JSONArrayStream(response.iter_content(STREAM_CHUNK_SIZE), "passedExams", path=path_hint)
+        # Not normalize_exams, whose stage would count these records a second time
+        exams = list(iter_exams(stream))
+        timer.records = len(exams)
+    # An empty list at the hinted path is a learner without exams, not a moved list
+    if path_hint and not stream.matched:
+        return stream_passed_exams(share_id, locale, session)
+    return exams, stream.path
+
+
+def load_path_hint(filename: str) -> Optional[List[PathElement]]:
+    """Read the JSON path of the exam list remembered by an earlier run, if any."""
+    try:
+        with open(filename, encoding="utf-8") as f:
+            path = json.load(f).get("passedExams")
+    except (OSError, ValueError, AttributeError):
+        return None
+    return path if isinstance(path, list) else None
+
+
+def save_path_hint(filename: str, path: List[PathElement]) -> None:
+    """Remember the JSON path of the exam list for later runs."""
+    with open(filename, mode="w", encoding="utf-8") as f:
+        json.dump({"passedExams": path}, f)
+
+
+@timed("transcript.write_csv", records=lambda _, exams, *args, **kwargs: len(exams))
+def write_csv(exams: List[ExamRecord], filename: str) -> None:
+    """Write a list of exam records to a CSV file.
+
+    :param exams: List of exam records
     :param filename: Output CSV filename
     """
-    fieldnames = ["Exam Title", "Exam Number", "Exam Date"]
     with open(filename, mode="w", encoding="utf-8", newline="") as f:
-        writer = csv.DictWriter(f, fieldnames=fieldnames)
-        writer.writeheader()
-        for exam in exams:
-            writer.writerow(exam)
+        writer = csv.writer(f)
+        writer.writerow(FIELDNAMES)
+        writer.writerows(exam.row() for exam in exams)
 
 
-def main(argv: List[str] = None) -> int:
-    parser = argparse.ArgumentParser(description="Extract passed exams from a Microsoft Learn public transcript.")
-    parser.add_argument("share_id", help="Transcript share identifier from the URL")
-    
-    # Get default locale from environment variable or use en-us as fallback
-    default_locale = os.environ.get("LOCALE", "en-us")
-    parser.add_argument("--locale", default=default_locale, help=f"Locale to request the transcript (default: {default_locale})")
-    parser.add_argument("--output", help="Output CSV filename")
-    args = parser.parse_args(argv)
+@timed("transcript.write_csv", records=lambda rows, *args, **kwargs: rows)
+def write_combined_csv(results: Iterable[Tuple[str, List[ExamRecord]]], filename: str) -> int:
+    """Write the exams of many learners to one CSV keyed by share ID.
+
+    :param results: Iterable of ``(share_id, exams)`` pairs
+    :param filename: Output CSV filename
+    :return: Number of exam rows written
+    """
+    rows = 0
+    with open(filename, mode="w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["Share ID"] + FIELDNAMES)
+        for share_id, exams in results:
+            writer.writerows((share_id, *exam.row()) for exam in exams)
+            rows += len(exams)
+    return rows
 
+
+def read_share_ids(stream: TextIO) -> List[str]:
+    """Read share IDs, one per line, ignoring blank lines, ``#`` comments and duplicates.
+
+    :param stream: Open text stream (file or stdin)
+    :return: Share IDs in first-seen order
+    """
+    share_ids: List[str] = []
+    seen = set()
+    for line in stream:
+        share_id = line.split("#", 1)[0].strip()
+        if share_id and share_id not in seen:
+            seen.add(share_id)
+            share_ids.append(share_id)
+    return share_ids
+
+
+def fetch_passed_exams(share_id: str, locale: str = "en-us",
+                       session: Optional[requests.Session] = None,
+                       cache: Optional[HTTPCache] = None, stream: bool = False,
+                       path_hint: Optional[List[PathElement]] = None
+                       ) -> Tuple[List[ExamRecord], Optional[List[PathElement]]]:
+    """Fetch a transcript and extract its passed exams, streaming the body if asked to.
+
+    :param share_id: The transcript sharing identifier from the URL
+    :param locale: Locale parameter for the API (default: en-us)
+    :param session: Optional session to reuse pooled connections
+    :param cache: Optional conditional HTTP cache (not used when streaming)
+    :param stream: Parse the response incrementally with :func:`stream_passed_exams`
+    :param path_hint: Optional path to the exam list from an earlier run
+    :return: Tuple of the exam rows and the path at which they were found
+    :raises requests.HTTPError: if the HTTP request returned an unsuccessful status code
+    :raises ValueError: if the response cannot be decoded as JSON
+    """
+    if stream:
+        return stream_passed_exams(share_id, locale, session, path_hint)
+    transcript_json = fetch_transcript(share_id, locale, session, cache)
+    path, raw_exams = locate_passed_exams(transcript_json, path_hint)
+    return normalize_exams(raw_exams), path
+
+
+def fetch_passed_exams_bulk(share_ids: Iterable[str], locale: str = "en-us",
+                            concurrency: int = DEFAULT_CONCURRENCY,
+                            cache: Optional[HTTPCache] = None, stream: bool = False,
+                            path_hint: Optional[List[PathElement]] = None
+                            ) -> Iterator[Tuple[str, Optional[List[ExamRecord]], Optional[str],
+                                                Optional[List[PathElement]]]]:
+    """Fetch and extract the passed exams of many learners concurrently.
+
+    Results are yielded as soon as each learner completes, so the order is not
+    the input order.  Errors are captured per learner rather than raised.
+
+    :param share_ids: Transcript share identifiers
+    :param locale: Locale parameter for the API
+    :param concurrency: Maximum number of requests in flight
+    :param cache: Optional conditional HTTP cache to revalidate against
+    :param stream: Parse each response incrementally
+    :param path_hint: Optional path to the exam list from an earlier run
+    :return: Iterator of ``(share_id, exams, error, path)``; ``exams`` is None on error
+    """
+    concurrency = max(1, concurrency)
+    with create_session(concurrency) as session, ThreadPoolExecutor(max_workers=concurrency) as pool:
+        futures = {
+            pool.submit(fetch_passed_exams, share_id, locale, session, cache, stream, path_hint): share_id
+            for share_id in share_ids
+        }
+        for future in as_completed(futures):
+            share_id = futures[future]
+            try:
+                exams, path = future.result()
+            except requests.RequestException as e:
+                yield share_id, None, f"HTTP error fetching transcript: {e}", None
+                continue
+            except ValueError as e:
+                yield share_id, None, f"Error decoding JSON: {e}", None
+                continue
+            yield share_id, exams, None, path
+
+
+def run_bulk(args: argparse.Namespace, cache: Optional[HTTPCache] = None) -> int:
+    """Run bulk mode for the parsed command line arguments."""
+    if args.bulk == "-":
+        share_ids = read_share_ids(sys.stdin)
+    else:
+        with open(args.bulk, encoding="utf-8") as f:
+            share_ids = read_share_ids(f)
+    if not share_ids:
+        print("No share IDs provided for bulk mode.", file=sys.stderr)
+        return 1
+
+    if not args.output:
+        os.makedirs(args.output_dir, exist_ok=True)
+
+    path_hint = load_path_hint(args.path_hint)
+    discovered_path = None
+    results: Dict[str, List[ExamRecord]] = {}
+    failures = 0
+    with contextlib.ExitStack() as stack:
+        history = stack.enter_context(HistoryStore(args.history_db)) if args.history_db else None
+        for share_id, exams, error, path in fetch_passed_exams_bulk(
+                share_ids, args.locale, args.concurrency, cache, args.stream, path_hint):
+            discovered_path = discovered_path or path
+            if error:
+                failures += 1
+                print(f"[{share_id}] {error}", file=sys.stderr)
+                continue
+            if not exams:
+                print(f"[{share_id}] No passed exams found in the transcript.", file=sys.stderr)
+            elif history is not None:
+                history.append(EXAMS, share_id, exams)
+            if args.output:
+                results[share_id] = exams
+            elif exams:
+                output_file = os.path.join(args.output_dir, f"passed_exams_{share_id}.csv")
+                unchanged = cache is not None and cache.not_modified(transcript_url(share_id, args.locale))
+                if not (unchanged and os.path.exists(output_file)):
+                    write_csv(exams, output_file)
+
+    if discovered_path and discovered_path != path_hint:
+        save_path_hint(args.path_hint, discovered_path)
+
+    unchanged_all = (cache is not None and not failures and os.path.exists(args.output or "")
+                     and all(cache.not_modified(transcript_url(sid, args.locale)) for sid in share_ids))
+    if unchanged_all:
+        print(f"No transcripts modified since last run; keeping {args.output}")
+    elif args.output:
+        # Keep the combined file in input order so daily diffs stay stable
+        rows = write_combined_csv(((sid, results[sid]) for sid in share_ids if sid in results), args.output)
+        print(f"Wrote {rows} exam records for {len(results)} learners to {args.output}")
+    else:
+        print(f"Wrote exam records for {len(share_ids) - failures} learners to {args.output_dir}")
+    if failures:
+        print(f"{failures} of {len(share_ids)} learners failed.", file=sys.stderr)
+        return 1
+    return 0
+
+
+def run_single(args: argparse.Namespace, cache: Optional[HTTPCache] = None,
+               session: Optional[requests.Session] = None) -> int:
+    """Fetch a single transcript for the parsed command line arguments."""
     # Determine output filename
     output_file = args.output or f"passed_exams_{args.share_id}.csv"
 
+    path_hint = load_path_hint(args.path_hint)
     try:
-        transcript_json = fetch_transcript(args.share_id, locale=args.locale)
-    except requests.HTTPError as e:
+        if args.stream:
+            exams, path = stream_passed_exams(args.share_id, args.locale, session=session, path_hint=path_hint)
+        else:
+            transcript_json = fetch_transcript(args.share_id, locale=args.locale, session=session, cache=cache)
+            path, raw_exams = locate_passed_exams(transcript_json, path_hint)
+            exams = normalize_exams(raw_exams)
+    except requests.RequestException as e:
         print(f"HTTP error fetching transcript: {e}", file=sys.stderr)
         return 1
     except ValueError as e:
         print(f"Error decoding JSON: {e}", file=sys.stderr)
         return 1
 
-    exams = extract_passed_exams(transcript_json)
+    if path and path != path_hint:
+        save_path_hint(args.path_hint, path)
     if not exams:
         print("No passed exams found in the transcript.", file=sys.stderr)
         return 1
 
+    if args.history_db:
+        append_rows(args.history_db, EXAMS, args.share_id, exams)
+    # Only the CSV is skipped for an unchanged transcript; the history and path hint are kept up to date
+    if (not args.stream and cache is not None and cache.not_modified(transcript_url(args.share_id, args.locale))
+            and os.path.exists(output_file)):
+        print(f"Transcript not modified since last run; keeping {output_file}")
+        return 0
     write_csv(exams, output_file)
     print(f"Wrote {len(exams)} exam records to {output_file}")
+    if not args.no_timeline:
+        timeline = refresh_timeline(output_file)
+        if timeline:
+            print(f"Rebuilt {timeline}")
     return 0
 
 
+def run_watch(args: argparse.Namespace, cache: Optional[HTTPCache] = None) -> int:
+    """Poll the learners of the parsed command line arguments until interrupted (``--watch``)."""
+    if args.bulk:
+        if args.bulk == "-":
+            share_ids = read_share_ids(sys.stdin)
+        else:
+            with open(args.bulk, encoding="utf-8") as f:
+                share_ids = read_share_ids(f)
+    else:
+        share_ids = [args.share_id]
+    if not share_ids:
+        print("No share IDs provided for bulk mode.", file=sys.stderr)
+        return 1
+
+    combined = args.output if args.bulk else None
+    if args.bulk and not combined:
+        os.makedirs(args.output_dir, exist_ok=True)
+
+    def output_file(share_id: str) -> str:
+        if not args.bulk:
+            return args.output or f"passed_exams_{share_id}.csv"
+        return os.path.join(args.output_dir, f"passed_exams_{share_id}.csv")
+
+    if combined:
+        known = load_known(combined, ExamRecord)
+    else:
+        known = {}
+        for share_id in share_ids:
+            known.update(load_known(output_file(share_id), ExamRecord, share_id))
+    snapshot: Dict[str, List[ExamRecord]] = dict(known)
+    path_hint = load_path_hint(args.path_hint)
+    discovered: List[List[PathElement]] = []
+
+    concurrency = max(1, args.concurrency) if args.bulk else 1
+    with contextlib.ExitStack() as stack:
+        session = stack.enter_context(watch_session(args, concurrency))
+        history = stack.enter_context(HistoryStore(args.history_db)) if args.history_db else None
+
+        def fetch(share_id: str) -> List[ExamRecord]:
+            exams, path = fetch_passed_exams(share_id, args.locale, session, cache, args.stream,
+                                             discovered[0] if discovered else path_hint)
+            if path and not discovered:
+                discovered.append(path)
+            return exams
+
+        def on_change(share_id: str, exams: List[ExamRecord]) -> None:
+            if not exams:
+                print(f"[{share_id}] No passed exams found in the transcript.", file=sys.stderr, flush=True)
+                return
+            if history is not None:
+                history.append(EXAMS, share_id, exams)
+            if combined:
+                snapshot[share_id] = exams
+                print(f"[{share_id}] {len(exams)} exams changed", flush=True)
+                return
+            write_csv(exams, output_file(share_id))
+            print(f"[{share_id}] Wrote {len(exams)} exam records to {output_file(share_id)}", flush=True)
+            if args.refresh_dashboard:
+                refresh_dashboard(exams_path=output_file(share_id), recommend=True)
+
+        def flush() -> None:
+            if combined:
+                rows = write_combined_csv(((sid, snapshot[sid]) for sid in share_ids if sid in snapshot), combined)
+                print(f"Wrote {rows} exam records for {len(snapshot)} learners to {combined}", flush=True)
+
+        watcher = Watcher(share_ids, fetch, on_change, policy_from_args(args), concurrency, known, flush)
+        stats = run_daemon(watcher)
+
+    if discovered and discovered[0] != path_hint:
+        save_path_hint(args.path_hint, discovered[0])
+    return 1 if stats.failures and stats.failures == stats.polls else 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """Return the command line parser (shared with ``run_pipeline.py``)."""
+    parser = argparse.ArgumentParser(description="Extract passed exams from a Microsoft Learn public transcript.")
+    parser.add_argument("share_id", nargs="?", help="Transcript share identifier from the URL")
+    
+    # Get default locale from environment variable or use en-us as fallback
+    default_locale = os.environ.get("LOCALE", "en-us")
+    parser.add_argument("--locale", default=default_locale, help=f"Locale to request the transcript (default: {default_locale})")
+    parser.add_argument("--output", help="Output CSV filename (combined CSV in bulk mode)")
+    parser.add_argument("--bulk", metavar="FILE", help="Read share IDs from FILE, one per line ('-' for stdin)")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY,
+                        help=f"Maximum concurrent requests in bulk mode (default: {DEFAULT_CONCURRENCY})")
+    parser.add_argument("--output-dir", default=".", help="Directory for per-learner CSVs in bulk mode (default: .)")
+    parser.add_argument("--stream", action="store_true",
+                        help="Parse the transcript while downloading and stop once the exam list is complete")
+    parser.add_argument("--path-hint", default=DEFAULT_PATH_HINT_FILE,
+                        help=f"File remembering where the exam list was found (default: {DEFAULT_PATH_HINT_FILE})")
+    parser.add_argument("--history-db", metavar="PATH",
+                        help="Also append the exams to this SQLite history store (see history_store.py)")
+    parser.add_argument("--no-timeline", action="store_true",
+                        help="Do not rebuild an existing timeline.json after rewriting the dashboard's CSV")
+    add_watch_arguments(parser)
+    add_cache_arguments(parser)
+    add_client_arguments(parser)
+    add_metrics_arguments(parser)
+    return parser
+
+
+def main(argv: List[str] = None) -> int:
+    parser = build_parser()
+    args = parser.parse_args(argv)
+
+    if not args.bulk and not args.share_id:
+        parser.error("a share_id is required unless --bulk is given")
+    if args.refresh_dashboard and (args.bulk or not args.watch):
+        parser.error("--refresh-dashboard needs --watch and a single share_id")
+    cache = cache_from_args(args)
+    configure_from_args(args)
+    try:
+        with collect(args, "passed_exams", cache):
+            if args.watch:
+                return run_watch(args, cache)
+            if args.bulk:
+                return run_bulk(args, cache)
+            return run_single(args, cache)
+    finally:
+        if cache is not None:
+            cache.evict()
+            print(cache.summary(), file=sys.stderr)
+        print_latency_summary()
+
+
 if __name__ == "__main__":
     sys.exit(main())
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Token-budgeted prompts for the exam recommender.
+
+The raw ``passed_exams.csv`` repeats every title and full date for every exam
+ever taken, although the model is told to focus on recent exams.
+``build_prompt`` sends a compact transcript instead:
+
+- exam codes only, with the month they were passed, newest first
+- optionally only the ``recent`` most recent exams and/or those passed in the
+  last ``window_days`` days
+- the oldest remaining exams are dropped until the prompt fits ``budget``
+  tokens
+
+Exams already on the transcript are removed from the list of allowed answers,
+so dropping old rows can never lead to recommending an exam twice.
+
+Tokens are counted locally with ``tiktoken`` when it is installed, otherwise
+estimated at four characters per token.
+"""
+from datetime import date, timedelta
+from typing import List, NamedTuple, Optional, Tuple
+
+from local_recommender import parse_transcript
+
+DEFAULT_BUDGET = 1000
+COMPACT_NOTE = " The transcript lists exam codes and the month each was passed, newest first."
+TRUNCATED_NOTE = " Older exams were omitted."
+
+
+class Prompt(NamedTuple):
+    """Messages and allowed answers for one recommendation, with their token counts."""
+    system: str
+    user: str
+    candidates: List[str]
+    original_tokens: int
+    tokens: int
+
+
+_encodings = {}
+
+
+def count_tokens(text: str, model: str = "gpt-4o") -> int:
+    """Count the tokens of ``text`` for ``model``; four characters per token without tiktoken."""
+    if model not in _encodings:
+        try:
+            import tiktoken
+
+            try:
+                _encodings[model] = tiktoken.encoding_for_model(model)
+            except KeyError:
+                _encodings[model] = tiktoken.get_encoding("o200k_base")
+        except ImportError:
+            _encodings[model] = None
+    encoding = _encodings[model]
+    if encoding is None:
+        return (len(text) + 3) // 4
+    return len(encoding.encode(text))
+
+
+def tokenizer_name(model: str = "gpt-4o") -> str:
+    """Describe how ``count_tokens`` counts for ``model``, for log messages."""
+    count_tokens("", model)
+    return _encodings[model].name if _encodings[model] is not None else "estimated"
+
+
+def parse_exams(transcript_text: str) -> List[Tuple[str, Optional[date]]]:
+    """Return ``(exam code, exam date)`` pairs from passed exams CSV text, newest first."""
+    # Undated exams sort last
+    return sorted(parse_transcript(transcript_text), key=lambda exam: exam[1] or date.min, reverse=True)
+
+
+def encode_exams(exams: List[Tuple[str, Optional[date]]]) -> str:
+    """Encode exams as a two-column CSV of code and ``YYYY-MM``."""
+    lines = ["Exam,Month"]
+    lines.extend(f"{code},{taken.strftime('%Y-%m') if taken else ''}" for code, taken in exams)
+    return "\n".join(lines) + "\n"
+
+
+def _size(system: str, user: str, candidates: List[str], model: str) -> int:
+    # The enum of allowed answers is part of the request as well
+    return count_tokens(system, model) + count_tokens(user, model) + count_tokens(",".join(candidates), model)
+
+
+def build_prompt(system_prompt: str, transcript_text: str, priority_exams: List[str], model: str = "gpt-4o",
+                 budget: Optional[int] = DEFAULT_BUDGET, recent: Optional[int] = None,
+                 window_days: Optional[int] = None, compact: bool = True,
+                 today: Optional[date] = None) -> Prompt:
+    """Build the recommendation prompt for one transcript.
+
+    :param system_prompt: Instructions for the model
+    :param transcript_text: Passed exams CSV text
+    :param priority_exams: Exams that may be recommended
+    :param model: Model whose tokenizer is used for counting
+    :param budget: Maximum prompt tokens; None for no limit
+    :param recent: Keep only this many of the most recent exams
+    :param window_days: Keep only exams passed in this many days before ``today``
+    :param compact: False sends the raw transcript and full priority list unchanged
+    :param today: Reference date for ``window_days`` (default: today)
+    :return: The prompt; ``original_tokens`` is the size of the uncompacted prompt.  When every
+        priority exam is passed, ``candidates`` is empty and no request should be sent
+    """
+    original_tokens = _size(system_prompt, transcript_text, priority_exams, model)
+    if not compact:
+        return Prompt(system_prompt, transcript_text, list(priority_exams), original_tokens, original_tokens)
+
+    exams = parse_exams(transcript_text)
+    passed = {code for code, _ in exams}
+    candidates = [exam for exam in priority_exams if exam.upper() not in passed]
+    if not candidates:
+        return Prompt(system_prompt, "", [], original_tokens, 0)
+
+    kept = exams
+    if window_days is not None:
+        cutoff = (today or date.today()) - timedelta(days=window_days)
+        kept = [exam for exam in kept if exam[1] is not None and exam[1] >= cutoff]
+    if recent is not None:
+        kept = kept[:recent]
+
+    def render(rows: List[Tuple[str, Optional[date]]]) -> Tuple[str, str]:
+        note = COMPACT_NOTE + (TRUNCATED_NOTE if len(rows) < len(exams) else "")
+        return system_prompt + note, encode_exams(rows)
+
+    system, user = render(kept)
+    if budget is not None and len(kept) > 1 and _size(system, user, candidates, model) > budget:
+        # Keep the most recent exams that fit, found by bisection since long
+        # transcripts would otherwise be re-rendered once per dropped exam;
+        # always keep the latest one
+        low, high = 1, len(kept) - 1
+        while low < high:
+            middle = (low + high + 1) // 2
+            if _size(*render(kept[:middle]), candidates, model) <= budget:
+                low = middle
+            else:
+                high = middle - 1
+        kept = kept[:low]
+        system, user = render(kept)
+    tokens = _size(system, user, candidates, model)
+    # Very short transcripts can grow by the added instructions; keep those as they are
+    if tokens >= original_tokens and (budget is None or original_tokens <= budget):
+        return Prompt(system_prompt, transcript_text, list(priority_exams), original_tokens, original_tokens)
+    return Prompt(system, user, candidates, original_tokens, tokens)
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Memoization of AI exam recommendations keyed by a hash of their inputs.
+
+A recommendation only depends on the learner's transcript, the priority exam
+list, the model and the prompt.  ``RecommendationCache`` stores the returned
+exam code under a SHA-256 of those inputs (after normalising the transcript
+so that row order, line endings and stray whitespace do not matter), so an
+unchanged transcript is answered from disk without calling the model.
+
+Entries expire after a TTL and the cache keeps at most ``max_entries``
+entries, evicting the least recently used ones first.
+"""
+import csv
+import hashlib
+import io
+import json
+import os
+import time
+from typing import Dict, Iterable, List, Optional
+
+DEFAULT_CACHE_FILE = ".recommendation_cache.json"
+DEFAULT_TTL = 30 * 24 * 60 * 60  # thirty days
+DEFAULT_MAX_ENTRIES = 1024
+
+
+def normalize_transcript(transcript_text: str) -> List[List[str]]:
+    """Return the transcript CSV rows stripped of whitespace and sorted, without the header."""
+    rows = [
+        [cell.strip() for cell in row]
+        for row in csv.reader(io.StringIO(transcript_text.strip()))
+        if any(cell.strip() for cell in row)
+    ]
+    return sorted(rows[1:])
+
+
+def recommendation_key(transcript_text: str, priority_exams: Iterable[str],
+                       model: str, prompt: str) -> str:
+    """Return the cache key for one recommendation request."""
+    payload = {
+        "transcript": normalize_transcript(transcript_text),
+        "priority": sorted({exam.strip().upper() for exam in priority_exams if exam.strip()}),
+        "model": model,
+        "prompt": prompt,
+    }
+    encoded = json.dumps(payload, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+class RecommendationCache:
+    """JSON file of ``key -> exam code`` entries with TTL and LRU eviction."""
+
+    def __init__(self, path: str = DEFAULT_CACHE_FILE, ttl: float = DEFAULT_TTL,
+                 max_entries: int = DEFAULT_MAX_ENTRIES) -> None:
+        """Load the cache stored at ``path`` (a missing or corrupt file starts empty).
+
+        :param path: Cache file location
+        :param ttl: Seconds an entry stays valid after it was stored
+        :param max_entries: Number of entries kept when saving
+        """
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.entries: Dict[str, Dict] = {}
+        try:
+            with open(path, encoding="utf-8") as f:
+                entries = json.load(f)
+            if isinstance(entries, dict):
+                self.entries = entries
+        except (OSError, ValueError):
+            pass
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached exam code for ``key``, or None on a miss or expired entry."""
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        now = time.time()
+        if now - entry.get("stored_at", 0) > self.ttl:
+            del self.entries[key]
+            return None
+        entry["last_used"] = now
+        return entry.get("exam_code")
+
+    def put(self, key: str, exam_code: str) -> None:
+        """Store ``exam_code`` under ``key``."""
+        now = time.time()
+        self.entries[key] = {"exam_code": exam_code, "stored_at": now, "last_used": now}
+
+    def save(self) -> None:
+        """Drop expired entries, keep the ``max_entries`` most recently used and write the file."""
+        now = time.time()
+        live = [(key, entry) for key, entry in self.entries.items()
+                if now - entry.get("stored_at", 0) <= self.ttl]
+        live.sort(key=lambda item: item[1].get("last_used", 0), reverse=True)
+        self.entries = dict(live[:self.max_entries])
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.entries, f, indent=1, sort_keys=True)
+        os.replace(tmp_path, self.path)
@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""
+Compact record types for passed exams, Credly badges and catalog credentials.
+
+The fetchers used to build a dict with string keys such as ``"Exam Title"``
+for every row, which costs several hundred bytes per row before the values
+are counted.  The records here keep their values in slots instead:
+
+- :class:`ExamRecord` and :class:`BadgeRecord` are frozen slotted dataclasses
+  whose repeated values (exam codes and titles, issuers, badge names, dates)
+  are interned, so thousands of learners with the same exam share one string
+- :class:`CredentialRecord` holds the flattened values of a credential in a
+  tuple and shares one column index between all records with the same keys
+
+Every record is also a read-only mapping keyed by its CSV column names, so
+code written for the old dicts (``row.get("Exam Number")``, ``{**row}``,
+``csv.DictWriter``) keeps working.  The fetchers' CSV writers use
+:meth:`CSVRecord.row` instead, which returns the values in column order
+without any per-row lookups.  :func:`load_known` and :func:`load_learner_map`
+read those CSVs back for the daemon and the site generators.
+
+``benchmarks/records_bench.py`` compares the memory use with the dicts.
+"""
+import csv
+import json
+import os
+import sys
+from collections.abc import Mapping
+from dataclasses import dataclass
+from operator import attrgetter
+from typing import Any, Callable, ClassVar, Dict, Iterator, List, Optional, Tuple, Type
+
+
+def intern(value: Any) -> str:
+    """Return ``value`` as an interned string; only for values that repeat across many rows."""
+    try:
+        return sys.intern(value)
+    except TypeError:
+        # None from a JSON null, numbers, str subclasses
+        return sys.intern("" if value is None else str(value))
+
+
+class CSVRecord(Mapping):
+    """Base of the fixed-column records: a mapping from CSV column name to field value."""
+    __slots__ = ()
+
+    # CSV column -> attribute, in column order
+    COLUMNS: ClassVar[Dict[str, str]] = {}
+    _row: ClassVar[Callable[[Any], Tuple[str, ...]]]
+
+    def __init_subclass__(cls, **kwargs: Any) -> None:
+        super().__init_subclass__(**kwargs)
+        if cls.COLUMNS:
+            cls._row = attrgetter(*cls.COLUMNS.values())
+
+    @classmethod
+    def fieldnames(cls) -> List[str]:
+        """Return the CSV header of this record type."""
+        return list(cls.COLUMNS)
+
+    def row(self) -> Tuple[str, ...]:
+        """Return the field values in CSV column order."""
+        return self._row(self)
+
+    def __getitem__(self, column: str) -> str:
+        try:
+            attribute = self.COLUMNS[column]
+        except KeyError:
+            raise KeyError(column) from None
+        return getattr(self, attribute)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.COLUMNS)
+
+    def __len__(self) -> int:
+        return len(self.COLUMNS)
+
+
+@dataclass(frozen=True, slots=True)
+class ExamRecord(CSVRecord):
+    """One passed exam, as written to ``passed_exams.csv``."""
+    COLUMNS: ClassVar[Dict[str, str]] = {"Exam Title": "title", "Exam Number": "number", "Exam Date": "date"}
+
+    title: str
+    number: str
+    date: str
+
+    @classmethod
+    def create(cls, title: str, number: str, date: str) -> "ExamRecord":
+        """Return a record with interned values."""
+        return cls(intern(title), intern(number), intern(date))
+
+
+@dataclass(frozen=True, slots=True)
+class BadgeRecord(CSVRecord):
+    """One Credly badge, as written to ``credly_badges.csv``."""
+    COLUMNS: ClassVar[Dict[str, str]] = {"Badge Title": "title", "Issuer": "issuer", "Badge Date": "date"}
+
+    title: str
+    issuer: str
+    date: str
+
+    @classmethod
+    def create(cls, title: str, issuer: str, date: str) -> "BadgeRecord":
+        """Return a record with interned values."""
+        return cls(intern(title), intern(issuer), intern(date))
+
+
+def load_known(path: str, record_type: Type[CSVRecord], learner: Optional[str] = None) -> Dict[str, List[CSVRecord]]:
+    """Read the rows a fetcher already wrote to ``path``, per learner.
+
+    A CSV with the record type's own header belongs to ``learner``; one with
+    an extra leading column (``Share ID`` or ``Username``) is a combined CSV
+    keyed by that column.  A missing or unrecognised file gives no rows.
+    """
+    fieldnames = record_type.fieldnames()
+    known: Dict[str, List[CSVRecord]] = {}
+    if not os.path.exists(path):
+        return known
+    with open(path, newline="", encoding="utf-8") as f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if header == fieldnames and learner is not None:
+            known[learner] = [record_type.create(*row) for row in reader if len(row) == len(fieldnames)]
+        elif header and header[1:] == fieldnames:
+            for row in reader:
+                if len(row) == len(fieldnames) + 1:
+                    known.setdefault(row[0], []).append(record_type.create(*row[1:]))
+    return known
+
+
+def load_learner_map(path: str) -> Dict[str, str]:
+    """Read a CSV with ``Share ID`` and ``Username`` columns; return Credly username -> share ID."""
+    with open(path, encoding="utf-8", newline="") as f:
+        return {row["Username"].strip(): row["Share ID"].strip() for row in csv.DictReader(f)
+                if row.get("Username") and row.get("Share ID")}
+
+
+def flatten_value(value: Any) -> Any:
+    """Flatten one credential field for the CSV.
+
+    Lists become semicolon-separated strings (the ``display_name`` or ``uid``
+    of dictionaries, else their JSON); these are interned since facets such as
+    levels and roles repeat across the catalog.  Dictionaries are
+    JSON-serialized and primitive types are passed through.
+    """
+    if isinstance(value, list):
+        items: List[str] = []
+        for elem in value:
+            if isinstance(elem, dict):
+                if "display_name" in elem:
+                    items.append(str(elem["display_name"]))
+                elif "uid" in elem:
+                    items.append(str(elem["uid"]))
+                else:
+                    items.append(json.dumps(elem, ensure_ascii=False))
+            else:
+                items.append(str(elem))
+        return sys.intern(";".join(items))
+    if isinstance(value, dict):
+        return json.dumps(value, ensure_ascii=False)
+    return value
+
+
+# Key tuple -> column index shared by every credential with those keys
+_schemas: Dict[Tuple[str, ...], Dict[str, int]] = {}
+
+
+class CredentialRecord(Mapping):
+    """Flattened credential of the content browser catalog, keyed by its JSON field names.
+
+    The catalog has no fixed set of fields, so the values are kept in a tuple
+    next to a column index that all records with the same keys share.
+    """
+    __slots__ = ("_columns", "_values")
+
+    def __init__(self, columns: Dict[str, int], values: Tuple[Any, ...]) -> None:
+        self._columns = columns
+        self._values = values
+
+    @classmethod
+    def from_json(cls, record: Dict[str, Any]) -> "CredentialRecord":
+        """Flatten a raw credential record of the API (see :func:`flatten_value`)."""
+        keys = tuple(record)
+        columns = _schemas.get(keys)
+        if columns is None:
+            columns = _schemas.setdefault(keys, {intern(key): index for index, key in enumerate(keys)})
+        return cls(columns, tuple(flatten_value(value) for value in record.values()))
+
+    def __getitem__(self, key: str) -> Any:
+        return self._values[self._columns[key]]
+
+    def get(self, key: str, default: Any = None) -> Any:
+        index = self._columns.get(key)
+        return default if index is None else self._values[index]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._columns)
+
+    def __len__(self) -> int:
+        return len(self._columns)
+
+    def __repr__(self) -> str:
+        return f"CredentialRecord({dict(self)!r})"
@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+"""
+Run the daily update in one process.
+
+    python run_pipeline.py <share_id> [<credly_username>] [--locale <locale>]
+
+The stages and their dependencies are:
+
+    transcript ──────────────┬──> credly ──> (credly_badges.csv)
+    credly_fetch ────────────┘
+    transcript ──> recommendation ──> (partials/ai-recommendation.html)
+    catalog ──> (exam_catalog.json)
+    transcript, then credly, recommendation and catalog in any outcome ──> timeline ──> (timeline.json)
+
+Independent stages run concurrently and every stage starts as soon as the
+stages it depends on have succeeded, so the Credly badges download while the
+transcript is fetched and the recommender starts right after the transcript
+is written.  All HTTP requests share one pooled ``http_client`` session and
+one conditional HTTP cache.
+
+The outcome matches the separate steps of the update workflow: a failed
+transcript fails the run (exit code 1) and skips everything that depends on
+it, while a failed Credly fetch or recommendation is reported and the run
+carries on with the existing files.  When ``GITHUB_OUTPUT`` is set the
+per-stage results are written there under the step output names the workflow
+used before (``transcript_check_successful`` ...).
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+import ai_exam_recommender
+import build_timeline_data
+import fetch_credly_badges
+import passed_exams
+from exam_catalog import ExamCatalog
+from http_cache import add_cache_arguments, cache_from_args
+from http_client import add_client_arguments, configure_from_args, create_session, print_latency_summary
+from metrics import add_metrics_arguments, collect, registry
+
+# Step outputs written to GITHUB_OUTPUT, keyed by stage name
+WORKFLOW_OUTPUTS = {
+    "transcript": "transcript_check_successful",
+    "credly": "credly_check_successful",
+    "recommendation": "ai_recommendation_successful",
+    "timeline": "timeline_successful",
+}
+
+
+class StageFailed(Exception):
+    """Raised by a stage to report a handled failure without a traceback."""
+
+
+class Stage(NamedTuple):
+    """One unit of work: ``run`` receives the values returned by earlier stages.
+
+    ``after`` lists stages that must succeed first; ``wait_for`` lists stages
+    that only need to have finished, whatever their outcome.
+    """
+    name: str
+    run: Callable[[Dict[str, Any]], Any]
+    after: Tuple[str, ...] = ()
+    fatal: bool = True
+    wait_for: Tuple[str, ...] = ()
+
+
+class StageResult(NamedTuple):
+    status: str  # "ok", "failed" or "skipped"
+    value: Any
+    seconds: float
+
+
+def _run_stage(stage: Stage, values: Dict[str, Any]) -> StageResult:
+    start = time.perf_counter()
+    try:
+        value = stage.run(values)
+    except Exception as e:
+        message = str(e) if isinstance(e, StageFailed) else f"{type(e).__name__}: {e}"
+        print(f"[{stage.name}] {message}", file=sys.stderr)
+        return StageResult("failed", None, time.perf_counter() - start)
+    except SystemExit as e:
+        # Scripts run in-process exit through argparse or sys.exit; that ends the stage, not the pipeline
+        if e.code in (0, None):
+            return StageResult("ok", None, time.perf_counter() - start)
+        print(f"[{stage.name}] exited with status {e.code}", file=sys.stderr)
+        return StageResult("failed", None, time.perf_counter() - start)
+    return StageResult("ok", value, time.perf_counter() - start)
+
+
+def run_stages(stages: List[Stage], max_workers: int = 4) -> Dict[str, StageResult]:
+    """Run ``stages`` concurrently in dependency order.
+
+    A stage starts once every stage in its ``after`` has succeeded and every
+    stage in its ``wait_for`` has finished, and is skipped if any stage in its
+    ``after`` failed or was skipped.
+
+    :param stages: Stages to run; names must be unique
+    :param max_workers: Maximum stages running at once
+    :return: Result of every stage, in completion order
+    :raises ValueError: if a dependency is unknown or the stages form a cycle
+    """
+    names = {stage.name for stage in stages}
+    for stage in stages:
+        unknown = set(stage.after + stage.wait_for) - names
+        if unknown:
+            raise ValueError(f"Stage {stage.name} depends on unknown stages: {', '.join(sorted(unknown))}")
+
+    pending = {stage.name: stage for stage in stages}
+    results: Dict[str, StageResult] = {}
+    running = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        while pending or running:
+            changed = True
+            while changed:
+                changed = False
+                for name, stage in list(pending.items()):
+                    if any(dep in results and results[dep].status != "ok" for dep in stage.after):
+                        del pending[name]
+                        results[name] = StageResult("skipped", None, 0.0)
+                        print(f"[{name}] skipped", file=sys.stderr)
+                        changed = True
+                    elif all(dep in results for dep in stage.after + stage.wait_for):
+                        del pending[name]
+                        values = {done: result.value for done, result in results.items()}
+                        running[pool.submit(_run_stage, stage, values)] = name
+            if not running:
+                if pending:
+                    raise ValueError(f"Stages form a cycle: {', '.join(sorted(pending))}")
+                break
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                results[running.pop(future)] = future.result()
+    return results
+
+
+def build_stages(args: argparse.Namespace, cache, session) -> List[Stage]:
+    """Return the pipeline stages for the parsed command line arguments."""
+    history = ["--history-db", args.history_db] if args.history_db else []
+    transcript_args = passed_exams.build_parser().parse_args(
+        [args.share_id, "--locale", args.locale, "--output", args.transcript_output, "--no-timeline", *history]
+    )
+
+    def transcript(values: Dict[str, Any]) -> None:
+        if passed_exams.run_single(transcript_args, cache, session) != 0:
+            raise StageFailed("Transcript check failed")
+
+    def recommendation(values: Dict[str, Any]) -> None:
+        argv = ["--transcript", args.transcript_output, *args.recommender_arg]
+        if ai_exam_recommender.main(argv) != 0:
+            raise StageFailed("AI recommendation failed, continuing with default")
+
+    def catalog(values: Dict[str, Any]) -> None:
+        # Refreshes exam_catalog.json (at most daily) for the exam levels in timeline.json
+        if ExamCatalog.load(cache=cache) is None:
+            raise StageFailed("Exam catalog unavailable, exam levels are reported as unknown")
+
+    def timeline(values: Dict[str, Any]) -> None:
+        # The catalog stage already tried the network; only read the snapshot it left
+        if build_timeline_data.main(["--exams", args.transcript_output, "--badges", args.credly_output,
+                                     "--output", args.timeline_output, "--offline"]) != 0:
+            raise StageFailed("Timeline data build failed, the page falls back to the CSV files")
+
+    stages = [
+        Stage("transcript", transcript),
+        Stage("recommendation", recommendation, after=("transcript",), fatal=False),
+        Stage("catalog", catalog, fatal=False),
+    ]
+    if args.credly_username:
+        credly_args = fetch_credly_badges.build_parser().parse_args(
+            [args.credly_username, "--output", args.credly_output, "--no-timeline", *history]
+        )
+
+        def credly_fetch(values: Dict[str, Any]) -> List[Tuple[int, Dict]]:
+            return fetch_credly_badges.fetch_badge_pages(args.credly_username, session=session, cache=cache)
+
+        def credly(values: Dict[str, Any]) -> None:
+            # The CSV is only replaced once the transcript check succeeded, as in the workflow
+            if fetch_credly_badges.run(credly_args, cache, session, pages=values["credly_fetch"]) != 0:
+                raise StageFailed("Credly badges check failed, continuing with existing data")
+
+        stages += [
+            Stage("credly_fetch", credly_fetch, fatal=False),
+            Stage("credly", credly, after=("transcript", "credly_fetch"), fatal=False),
+        ]
+    # Built last so it picks up whatever the other stages managed to write
+    stages.append(Stage("timeline", timeline, after=("transcript",), fatal=False,
+                        wait_for=tuple(stage.name for stage in stages if stage.name != "transcript")))
+    return stages
+
+
+def write_workflow_outputs(results: Dict[str, StageResult], path: str) -> None:
+    """Append ``<output>=true|false`` lines for the workflow's later steps."""
+    with open(path, "a", encoding="utf-8") as f:
+        for stage, output in WORKFLOW_OUTPUTS.items():
+            if stage in results:
+                f.write(f"{output}={'true' if results[stage].status == 'ok' else 'false'}\n")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Fetch the transcript and Credly badges and refresh the AI recommendation.")
+    parser.add_argument("share_id", help="Transcript share identifier from the URL")
+    parser.add_argument("credly_username", nargs="?", help="Credly username; the Credly stages are skipped without it")
+    default_locale = os.environ.get("LOCALE") or "en-us"
+    parser.add_argument("--locale", default=default_locale,
+                        help=f"Locale to request the transcript (default: {default_locale})")
+    parser.add_argument("--transcript-output", default="passed_exams.csv",
+                        help="Passed exams CSV (default: passed_exams.csv)")
+    parser.add_argument("--credly-output", default="credly_badges.csv",
+                        help="Credly badges CSV (default: credly_badges.csv)")
+    parser.add_argument("--timeline-output", default=build_timeline_data.DEFAULT_OUTPUT,
+                        help=f"Timeline data for index.html (default: {build_timeline_data.DEFAULT_OUTPUT})")
+    parser.add_argument("--recommender-arg", action="append", default=[], metavar="ARG",
+                        help="Extra argument for ai_exam_recommender.py (repeatable)")
+    parser.add_argument("--history-db", metavar="PATH",
+                        help="Also append the exams and badges to this SQLite history store")
+    add_cache_arguments(parser)
+    add_client_arguments(parser)
+    add_metrics_arguments(parser)
+    args = parser.parse_args(argv)
+
+    cache = cache_from_args(args)
+    configure_from_args(args)
+    session = create_session()
+    stages = build_stages(args, cache, session)
+    start = time.perf_counter()
+    try:
+        with collect(args, "run_pipeline", cache):
+            results = run_stages(stages)
+            for name, result in results.items():
+                if result.status != "skipped":
+                    registry().add_stage(f"pipeline.{name}", result.seconds)
+    finally:
+        session.close()
+        if cache is not None:
+            cache.evict()
+            print(cache.summary(), file=sys.stderr)
+        print_latency_summary()
+
+    for stage in stages:
+        result = results[stage.name]
+        print(f"{stage.name:<15} {result.status:<8} {result.seconds:6.2f}s")
+    print(f"{'total':<15} {'':<8} {time.perf_counter() - start:6.2f}s")
+
+    if os.environ.get("GITHUB_OUTPUT"):
+        write_workflow_outputs(results, os.environ["GITHUB_OUTPUT"])
+    return 1 if any(stage.fatal and results[stage.name].status != "ok" for stage in stages) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,86 @@
+import pytest
+
+from credential_store import CredentialStore, SyncStats, content_hash, facet_values
+
+
+def credential(uid, title="Title", last_modified=None, **fields):
+    record = {"uid": uid, "title": title, **fields}
+    if last_modified is not None:
+        record["last_modified"] = last_modified
+    return record
+
+
+@pytest.fixture
+def store(tmp_path):
+    with CredentialStore(str(tmp_path / "credentials.db")) as store:
+        yield store
+
+
+def test_facet_values_normalises_strings_lists_and_dicts():
+    assert facet_values(None) == []
+    assert facet_values(" Azure ") == ["azure"]
+    assert facet_values(["A", {"display_name": "B"}, {"uid": "c"}, "", None]) == ["a", "b", "c"]
+
+
+def test_content_hash_ignores_key_order():
+    assert content_hash({"a": 1, "b": 2}) == content_hash({"b": 2, "a": 1})
+    assert content_hash({"a": 1}) != content_hash({"a": 2})
+
+
+def test_sync_counts_added_changed_removed_and_unchanged(store):
+    assert store.sync([credential("a"), credential("b"), credential("c")]) == SyncStats(3, 0, 0, 0)
+    stats = store.sync([credential("a"), credential("b", title="New")])
+    assert stats == SyncStats(added=0, changed=1, removed=1, unchanged=1)
+    assert store.count() == 2
+    assert store.get("b")["title"] == "New"
+    assert store.get("c") is None
+
+
+def test_sync_trusts_an_unchanged_last_modified(store):
+    store.sync([credential("a", last_modified="2024-01-01")])
+    # Same last_modified: the (different) content is not even compared
+    assert store.sync([credential("a", title="Other", last_modified="2024-01-01")]).unchanged == 1
+    assert store.get("a")["title"] == "Title"
+
+
+def test_sync_skips_duplicates_and_records_without_uid(store):
+    assert store.sync([credential("a"), credential("a", title="Dup"), {"title": "no uid"}]) == SyncStats(1, 0, 0, 0)
+    assert store.get("a")["title"] == "Title"
+
+
+def test_partial_sync_keeps_missing_records(store):
+    store.sync([credential("a"), credential("b")])
+    assert store.sync([credential("a")], remove_missing=False).removed == 0
+    assert store.count() == 2
+
+
+def test_failed_crawl_rolls_back(store):
+    store.sync([credential("a")])
+
+    def crawl():
+        yield credential("b")
+        raise RuntimeError("network down")
+
+    with pytest.raises(RuntimeError):
+        store.sync(crawl())
+    assert store.count() == 1
+    assert store.get("b") is None
+
+
+def test_query_matches_facets_case_insensitively(store):
+    store.sync([
+        credential("a", title="B cert", credential_types=["Certification"], products=["Azure"]),
+        credential("b", title="A cert", credential_types=["certification"], products=[{"display_name": "Azure"}]),
+        credential("c", title="Path", credential_types=["learning-path"], products=["Azure"]),
+    ])
+    assert [record["uid"] for record in store.query(type="CERTIFICATION", product="azure")] == ["b", "a"]
+    assert [record["uid"] for record in store.query(type="learning-path")] == ["c"]
+    with pytest.raises(ValueError):
+        list(store.query(colour="red"))
+
+
+def test_changed_record_replaces_its_facets(store):
+    store.sync([credential("a", products=["Azure"])])
+    store.sync([credential("a", products=["Dynamics"])])
+    assert list(store.query(product="azure")) == []
+    assert [record["uid"] for record in store.query(product="dynamics")] == ["a"]
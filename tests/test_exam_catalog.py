@@ -0,0 +1,89 @@
+import json
+import os
+
+import requests
+
+import exam_catalog
+from exam_catalog import ExamCatalog, is_retired
+
+
+def exam(code, levels=(), products=()):
+    return {"display_name": code, "levels": list(levels), "products": list(products)}
+
+
+def test_is_retired_matches_codes_and_families():
+    assert is_retired("AZ-900") is False
+    assert is_retired("AZ-103") is True
+    assert is_retired("MB6-999") is True
+    assert is_retired("98-999") is True
+    assert is_retired("") is False
+    # Exact codes must match the whole code, not a prefix of it
+    assert is_retired("AZ-1030") is False
+
+
+def test_is_retired_is_case_sensitive():
+    assert is_retired("DU-mmy") is True
+    assert is_retired("DU-MMY") is False
+    assert is_retired("az-103") is False
+
+
+def test_catalog_checks_retirement_on_the_raw_display_name():
+    catalog = ExamCatalog([exam("DU-mmy"), exam(" az-104 "), exam("AZ-103"), {"display_name": None}])
+    assert catalog.retired == {"DU-MMY", "AZ-103"}
+    assert catalog.active == {"AZ-104"}
+    assert "az-104" in catalog
+    assert catalog.is_active(" AZ-104") is True
+    assert catalog.is_active("DU-MMY") is False
+
+
+def test_codes_filters_by_level_product_and_status():
+    catalog = ExamCatalog([
+        exam("AZ-104", levels=["Intermediate"], products=["azure"]),
+        exam("AZ-900", levels=["Beginner"], products=["azure"]),
+        exam("MS-900", levels=["Beginner"], products=["m365"]),
+        exam("AZ-103", levels=["Intermediate"], products=["azure"]),
+    ])
+    assert catalog.codes(product="Azure") == ["AZ-104", "AZ-900"]
+    assert catalog.codes(level="beginner") == ["AZ-900", "MS-900"]
+    assert catalog.codes(active=False) == ["AZ-103"]
+    assert catalog.codes(level="intermediate", active=None) == ["AZ-103", "AZ-104"]
+
+
+def test_load_uses_a_fresh_snapshot_without_fetching(tmp_path, monkeypatch):
+    path = str(tmp_path / "catalog.json")
+    ExamCatalog.save_snapshot({"exams": [exam("AZ-104")]}, path)
+
+    def fail(*args, **kwargs):
+        raise AssertionError("fetched a fresh snapshot")
+
+    monkeypatch.setattr(exam_catalog, "fetch_catalog", fail)
+    catalog = ExamCatalog.load(path)
+    assert catalog.active == {"AZ-104"}
+
+
+def test_load_returns_none_for_a_stale_corrupt_snapshot_when_the_fetch_fails(tmp_path, monkeypatch):
+    path = tmp_path / "catalog.json"
+    path.write_text("{not json", encoding="utf-8")
+    os.utime(path, (0, 0))
+
+    def fail(*args, **kwargs):
+        raise requests.ConnectionError("offline")
+
+    monkeypatch.setattr(exam_catalog, "fetch_catalog", fail)
+    assert ExamCatalog.load(str(path)) is None
+
+
+def test_load_falls_back_to_a_stale_snapshot_when_the_fetch_fails(tmp_path, monkeypatch):
+    path = tmp_path / "catalog.json"
+    path.write_text(json.dumps({"fetched_at": 0, "exams": [exam("AZ-104")]}), encoding="utf-8")
+    os.utime(path, (0, 0))
+
+    def fail(*args, **kwargs):
+        raise requests.ConnectionError("offline")
+
+    monkeypatch.setattr(exam_catalog, "fetch_catalog", fail)
+    assert ExamCatalog.load(str(path)).active == {"AZ-104"}
+
+
+def test_load_offline_without_a_snapshot_returns_none(tmp_path):
+    assert ExamCatalog.load(str(tmp_path / "missing.json"), offline=True) is None
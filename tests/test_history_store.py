@@ -0,0 +1,105 @@
+import csv
+
+import pytest
+
+from history_store import BADGES, EXAMS, HistoryStore, SnapshotStats, main, parse_time, snapshot_hash
+
+
+def exam(number, date="2024-01-01", title=None):
+    return {"Exam Title": title or f"Exam {number}", "Exam Number": number, "Exam Date": date}
+
+
+@pytest.fixture
+def store(tmp_path):
+    with HistoryStore(str(tmp_path / "history.db")) as store:
+        yield store
+
+
+def codes(records):
+    return [record.code for record in records]
+
+
+def test_snapshot_hash_ignores_row_order():
+    assert snapshot_hash([("a", "", "", ""), ("b", "", "", "")]) == snapshot_hash([("b", "", "", ""), ("a", "", "", "")])
+
+
+def test_parse_time_defaults_to_utc():
+    assert parse_time("1970-01-02") == 86400
+    assert parse_time("1970-01-01T01:00:00Z") == 3600
+    assert parse_time("1970-01-01T02:00:00+01:00") == 3600
+
+
+def test_append_stores_only_the_delta(store):
+    assert store.append(EXAMS, "alice", [exam("AZ-900"), exam("AZ-104")], taken_at=100) == SnapshotStats(2, 0, 0)
+    # Same rows in another order, duplicated, plus a row without a number
+    rows = [exam("AZ-104"), exam("AZ-900"), exam("AZ-900"), exam("")]
+    assert store.append(EXAMS, "alice", rows, taken_at=200) == SnapshotStats(0, 0, 2)
+    assert store.append(EXAMS, "alice", [exam("AZ-104"), exam("AZ-305")], taken_at=300) == SnapshotStats(1, 1, 1)
+    assert store.count() == 3
+    assert store.conn.execute("SELECT COUNT(*) FROM snapshots").fetchone()[0] == 2
+
+
+def test_query_as_of_returns_earlier_states(store):
+    store.append(EXAMS, "alice", [exam("AZ-900")], taken_at=100)
+    store.append(EXAMS, "alice", [exam("AZ-104", "2024-02-01")], taken_at=200)
+    assert codes(store.query(as_of=150)) == ["AZ-900"]
+    assert codes(store.query(as_of=200)) == ["AZ-104"]
+    assert codes(store.query()) == ["AZ-104"]
+    removed = list(store.query(include_removed=True))
+    assert codes(removed) == ["AZ-104", "AZ-900"]
+    assert removed[1].removed_at == 200
+    assert codes(store.query(as_of=50)) == []
+
+
+def test_query_filters_by_code_learner_and_date(store):
+    store.append(EXAMS, "alice", [exam("AZ-900", "2023-05-01"), exam("AZ-104", "2024-03-01")], taken_at=100)
+    store.append(EXAMS, "bob", [exam("AZ-104", "2024-06-01")], taken_at=100)
+    store.append(BADGES, "alice", [{"Badge Title": "AZ-104 Badge", "Issuer": "Microsoft", "Badge Date": "2024-03-02"}],
+                 taken_at=100)
+    assert [(r.learner, r.earned_on) for r in store.query(code="az-104")] == [("bob", "2024-06-01"),
+                                                                              ("alice", "2024-03-01")]
+    assert codes(store.query(learner="alice")) == ["AZ-104", "AZ-900"]
+    assert codes(store.query(since="2024-01-01", until="2024-05-31")) == ["AZ-104"]
+    assert [(r.code, r.issuer) for r in store.query(BADGES)] == [("AZ-104 Badge", "Microsoft")]
+    assert store.count(EXAMS) == 3
+    assert store.count(BADGES) == 1
+
+
+def test_older_snapshots_are_rejected(store):
+    store.append(EXAMS, "alice", [exam("AZ-900")], taken_at=200)
+    with pytest.raises(ValueError, match="oldest first"):
+        store.append(EXAMS, "alice", [exam("AZ-104")], taken_at=100)
+    assert codes(store.query()) == ["AZ-900"]
+
+
+def test_unknown_kind_is_rejected(store):
+    with pytest.raises(ValueError, match="Unknown kind"):
+        store.append("certificates", "alice", [{"Exam Number": "AZ-900"}])
+
+
+def test_export_writes_the_fetcher_format(store, tmp_path):
+    store.append(EXAMS, "alice", [exam("AZ-900", "2023-05-01"), exam("AZ-104", "2024-03-01")], taken_at=100)
+    store.append(EXAMS, "bob", [exam("AZ-305", "2024-06-01")], taken_at=100)
+    single = tmp_path / "alice.csv"
+    assert store.export_csv(str(single), EXAMS, learner="alice") == 2
+    with open(single, encoding="utf-8", newline="") as f:
+        assert list(csv.DictReader(f)) == [exam("AZ-104", "2024-03-01"), exam("AZ-900", "2023-05-01")]
+    combined = tmp_path / "all.csv"
+    assert store.export_csv(str(combined), EXAMS) == 3
+    with open(combined, encoding="utf-8", newline="") as f:
+        assert [row["Share ID"] for row in csv.DictReader(f)] == ["bob", "alice", "alice"]
+
+
+def test_import_backfills_a_csv(tmp_path, capsys):
+    source = tmp_path / "passed_exams.csv"
+    with open(source, "w", encoding="utf-8", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=["Exam Title", "Exam Number", "Exam Date"])
+        writer.writeheader()
+        writer.writerow(exam("AZ-900"))
+    db = str(tmp_path / "history.db")
+    assert main([db, "--import", str(source), "--learner", "alice", "--taken-at", "2024-01-02"]) == 0
+    assert "1 added" in capsys.readouterr().out
+    # Backfilling an older snapshot afterwards fails without a traceback
+    assert main([db, "--import", str(source), "--learner", "alice", "--taken-at", "2023-01-01"]) == 1
+    with HistoryStore(db) as store:
+        assert [r.added_at for r in store.query()] == [parse_time("2024-01-02")]
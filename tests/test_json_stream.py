@@ -0,0 +1,133 @@
+import json
+
+import pytest
+
+import passed_exams
+from json_stream import JSONArrayStream
+
+DOCUMENT = {
+    "userName": "learner",
+    "modules": [{"passedExams": []}, {"title": "x[y]{z}\"w"}],
+    "certificationData": {
+        "PassedExams": [
+            {"examNumber": "AZ-900", "score": 912},
+            {"examNumber": "AZ-104", "title": "Azure é \"admin\""},
+            1234567,
+            -0.5e3,
+        ],
+        "tail": [1, 2, 3],
+    },
+}
+EXPECTED = DOCUMENT["certificationData"]["PassedExams"]
+
+
+def chunked(data, size):
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 7, 64, 100000])
+def test_chunk_boundaries_do_not_change_the_result(size):
+    data = json.dumps(DOCUMENT, ensure_ascii=False).encode("utf-8")
+    stream = JSONArrayStream(chunked(data, size), "passedExams")
+    assert list(stream) == EXPECTED
+    assert stream.path == ["certificationData", "PassedExams"]
+    assert stream.matched is True
+
+
+def test_text_chunks_are_accepted():
+    stream = JSONArrayStream(chunked(json.dumps(DOCUMENT), 5), "passedexams")
+    assert list(stream) == EXPECTED
+
+
+def test_reading_stops_after_the_array():
+    chunks = iter(['{"passedExams": [1, 2]', ', "rest": ['])
+
+    def source():
+        yield from chunks
+        raise AssertionError("read past the array")
+
+    assert list(JSONArrayStream(source(), "passedExams")) == [1, 2]
+
+
+def test_hinted_path_restricts_the_search():
+    data = json.dumps(DOCUMENT)
+    stream = JSONArrayStream(chunked(data, 4), "passedExams", path=["certificationData", "PassedExams"])
+    assert list(stream) == EXPECTED
+    assert stream.path == ["certificationData", "PassedExams"]
+    # An earlier list under the key elsewhere is ignored when a hint is given
+    stream = JSONArrayStream([data], "passedExams", path=["modules", 1, "passedExams"])
+    assert list(stream) == []
+    assert stream.matched is False
+
+
+def test_empty_list_at_the_hinted_path_is_a_match():
+    data = json.dumps({"certificationData": {"passedExams": []}, "later": {"passedExams": [1]}})
+    stream = JSONArrayStream([data], "passedExams", path=["certificationData", "passedExams"])
+    assert list(stream) == []
+    assert stream.matched is True
+    assert stream.path is None
+
+
+def test_empty_match_without_hint_continues_outside_its_object():
+    data = json.dumps({"a": {"passedExams": [], "other": {"passedExams": [9]}}, "b": {"passedExams": [1]}})
+    stream = JSONArrayStream([data], "passedExams")
+    assert list(stream) == [1]
+    assert stream.path == ["b", "passedExams"]
+
+
+def test_missing_key_leaves_the_stream_unmatched():
+    stream = JSONArrayStream([json.dumps({"exams": [1]})], "passedExams")
+    assert list(stream) == []
+    assert stream.matched is False
+    assert stream.path is None
+
+
+def test_truncated_array_raises():
+    with pytest.raises(ValueError):
+        list(JSONArrayStream(['{"passedExams": [1, 2'], "passedExams"))
+
+
+class FakeResponse:
+    def __init__(self, body):
+        self.body = body.encode("utf-8")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def raise_for_status(self):
+        pass
+
+    def iter_content(self, size):
+        return chunked(self.body, 3)
+
+
+class FakeSession:
+    def __init__(self, body):
+        self.body = body
+        self.requests = 0
+
+    def get(self, url, **kwargs):
+        self.requests += 1
+        return FakeResponse(self.body)
+
+
+def test_stream_passed_exams_does_not_refetch_for_an_empty_hinted_list():
+    session = FakeSession(json.dumps({"certificationData": {"passedExams": []}}))
+    exams, path = passed_exams.stream_passed_exams("id", session=session,
+                                                   path_hint=["certificationData", "passedExams"])
+    assert exams == []
+    assert path is None
+    assert session.requests == 1
+
+
+def test_stream_passed_exams_refetches_when_the_hinted_path_is_gone():
+    session = FakeSession(json.dumps({"moved": {"passedExams": [
+        {"examTitle": "Azure Fundamentals", "examNumber": "AZ-900", "examDateTaken": "2024-01-02T10:00:00Z"}]}}))
+    exams, path = passed_exams.stream_passed_exams("id", session=session,
+                                                   path_hint=["certificationData", "passedExams"])
+    assert [exam.row() for exam in exams] == [("Azure Fundamentals", "AZ-900", "2024-01-02")]
+    assert path == ["moved", "passedExams"]
+    assert session.requests == 2
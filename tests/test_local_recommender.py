@@ -0,0 +1,69 @@
+from datetime import date, timedelta
+
+import pytest
+
+from local_recommender import (DEFAULT_THRESHOLD, RECENCY_HALF_LIFE, Recommendation, parse_transcript,
+                               recommend, recommend_transcript)
+
+TODAY = date(2025, 6, 1)
+
+
+def days_ago(days):
+    return TODAY - timedelta(days=days)
+
+
+def test_a_fresh_progression_vote_is_trusted():
+    # SC-900 -> AZ-500 crosses families, so only the progression vote counts
+    result = recommend([("SC-900", TODAY)], ["AZ-500", "PL-300"], today=TODAY)
+    assert result.exam_code == "AZ-500"
+    assert result.confidence == pytest.approx(1 / 1.2)
+    assert result.confidence >= DEFAULT_THRESHOLD
+
+
+def test_a_year_old_progression_vote_is_still_trusted():
+    result = recommend([("SC-900", days_ago(RECENCY_HALF_LIFE))], ["AZ-500"], today=TODAY)
+    assert result.confidence == pytest.approx(0.5 / 0.7)
+    assert result.confidence >= DEFAULT_THRESHOLD
+
+
+@pytest.mark.parametrize("passed, priority", [
+    ([("AZ-900", TODAY)], ["AZ-305"]),  # a lone fresh family vote
+    ([("SC-900", days_ago(2 * RECENCY_HALF_LIFE))], ["AZ-500"]),  # a two-year-old progression vote
+])
+def test_a_weak_unopposed_vote_is_left_to_the_model(passed, priority):
+    # Without the prior both used to give a confidence of 1.0
+    result = recommend(passed, priority, today=TODAY)
+    assert result.exam_code == priority[0]
+    assert 0 < result.confidence < DEFAULT_THRESHOLD
+
+
+def test_no_votes_give_zero_confidence():
+    result = recommend([], ["AZ-104", "AZ-305"], today=TODAY)
+    assert result == Recommendation("AZ-104", 0.0, {"AZ-104": 0.0, "AZ-305": 0.0})
+
+
+def test_passed_exams_are_not_candidates():
+    assert recommend([("az-104", TODAY)], ["AZ-104"], today=TODAY) == Recommendation("-", 0.0, {})
+    result = recommend([("AZ-104", TODAY)], ["AZ-104", "az-305", "AZ-305"], today=TODAY)
+    assert list(result.scores) == ["AZ-305"]
+
+
+def test_ties_follow_the_priority_order():
+    # AZ-900 votes equally for AZ-204 and AZ-104
+    result = recommend([("AZ-900", TODAY)], ["AZ-204", "AZ-104"], today=TODAY)
+    assert result.scores["AZ-204"] == result.scores["AZ-104"]
+    assert result.exam_code == "AZ-204"
+
+
+def test_recent_exams_outweigh_old_ones():
+    passed = [("AZ-104", days_ago(3 * RECENCY_HALF_LIFE)), ("AZ-204", TODAY)]
+    assert recommend(passed, ["AZ-700", "AI-102"], today=TODAY).exam_code == "AI-102"
+
+
+def test_recommend_transcript_parses_the_csv():
+    transcript = ("Exam Title,Exam Number,Exam Date\n"
+                  "Security Fundamentals, sc-900 ,2025-06-01T10:00:00Z\n"
+                  "No number,,2025-01-01\n"
+                  "Undated,AZ-104,\n")
+    assert parse_transcript(transcript) == [("SC-900", TODAY), ("AZ-104", None)]
+    assert recommend_transcript(transcript, ["AZ-500"], today=TODAY).exam_code == "AZ-500"
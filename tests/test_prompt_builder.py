@@ -0,0 +1,99 @@
+from datetime import date, timedelta
+
+import ai_exam_recommender
+from prompt_builder import COMPACT_NOTE, TRUNCATED_NOTE, build_prompt, count_tokens, parse_exams
+
+SYSTEM = "Recommend the next exam from the priority list. Focus on the most recent exams."
+PRIORITY = ["AZ-305", "AZ-400", "SC-100"]
+TODAY = date(2025, 6, 1)
+
+
+def transcript(count, start=TODAY):
+    rows = ["Exam Title,Exam Number,Exam Date"]
+    rows.extend(f"A fairly long exam title number {i},EX-{i:03d},{start - timedelta(days=30 * i)}"
+                for i in range(count))
+    return "\n".join(rows) + "\n"
+
+
+def codes(prompt):
+    return [line.split(",")[0] for line in prompt.user.splitlines()[1:]]
+
+
+def test_compact_prompt_lists_codes_newest_first():
+    text = "Exam Title,Exam Number,Exam Date\n" + "Old,AZ-900,2020-01-05\nUndated,AI-900,\nNew,AZ-104,2024-03-04\n" * 5
+    prompt = build_prompt(SYSTEM, text, PRIORITY, budget=None)
+    assert prompt.system == SYSTEM + COMPACT_NOTE
+    assert prompt.user.startswith("Exam,Month\nAZ-104,2024-03\n")
+    assert [code for code, _ in parse_exams(text)][-5:] == ["AI-900"] * 5
+    assert prompt.tokens < prompt.original_tokens
+
+
+def test_bisection_keeps_the_most_recent_exams_that_fit():
+    text = transcript(200)
+    full = build_prompt(SYSTEM, text, PRIORITY, budget=None)
+    budget = full.tokens // 3
+    prompt = build_prompt(SYSTEM, text, PRIORITY, budget=budget)
+    kept = codes(prompt)
+    assert prompt.tokens <= budget
+    assert prompt.system == SYSTEM + COMPACT_NOTE + TRUNCATED_NOTE
+    assert kept == codes(full)[:len(kept)]
+    # One more exam would not have fitted
+    larger = build_prompt(SYSTEM, text, PRIORITY, budget=None, recent=len(kept) + 1)
+    assert larger.tokens > budget
+
+
+def test_the_latest_exam_is_kept_whatever_the_budget():
+    prompt = build_prompt(SYSTEM, transcript(50), PRIORITY, budget=1)
+    assert codes(prompt) == ["EX-000"]
+
+
+def test_recent_and_window_days_limit_the_exams():
+    text = transcript(20)
+    assert codes(build_prompt(SYSTEM, text, PRIORITY, budget=None, recent=3)) == ["EX-000", "EX-001", "EX-002"]
+    prompt = build_prompt(SYSTEM, text, PRIORITY, budget=None, window_days=65, today=TODAY)
+    assert codes(prompt) == ["EX-000", "EX-001", "EX-002"]
+
+
+def test_passed_exams_are_removed_from_the_candidates():
+    text = transcript(10) + "Solutions Architect,az-305,2025-05-01\n"
+    assert build_prompt(SYSTEM, text, PRIORITY, budget=None).candidates == ["AZ-400", "SC-100"]
+
+
+def test_short_transcripts_are_sent_unchanged():
+    text = "Exam Title,Exam Number,Exam Date\nX,AZ-900,2024-01-01\n"
+    prompt = build_prompt(SYSTEM, text, PRIORITY)
+    assert (prompt.system, prompt.user, prompt.candidates) == (SYSTEM, text, PRIORITY)
+    assert prompt.tokens == prompt.original_tokens
+
+
+def test_no_compact_sends_the_raw_transcript():
+    text = transcript(10)
+    prompt = build_prompt(SYSTEM, text, PRIORITY, compact=False)
+    assert (prompt.system, prompt.user, prompt.candidates) == (SYSTEM, text, PRIORITY)
+
+
+def test_no_candidates_give_an_empty_prompt():
+    text = transcript(3) + "".join(f"T,{exam},2025-01-01\n" for exam in PRIORITY)
+    prompt = build_prompt(SYSTEM, text, PRIORITY)
+    assert prompt.candidates == []
+    assert prompt.user == ""
+    assert prompt.tokens == 0
+    assert prompt.original_tokens == count_tokens(SYSTEM) + count_tokens(text) + count_tokens(",".join(PRIORITY))
+
+
+def test_recommender_answers_without_a_request_when_every_exam_is_passed(tmp_path, monkeypatch):
+    monkeypatch.delenv("OPENAI_API_KEY", raising=False)
+
+    def fail(*args, **kwargs):
+        raise AssertionError("sent a request")
+
+    monkeypatch.setattr(ai_exam_recommender, "build_request", fail)
+    transcript_path = tmp_path / "passed_exams.csv"
+    transcript_path.write_text(transcript(3) + "".join(f"T,{exam},2025-01-01\n" for exam in PRIORITY),
+                               encoding="utf-8")
+    priority_path = tmp_path / "priority.csv"
+    priority_path.write_text(",".join(PRIORITY), encoding="utf-8")
+    output = tmp_path / "recommendation.html"
+    assert ai_exam_recommender.main(["--transcript", str(transcript_path), "--priority", str(priority_path),
+                                     "--output", str(output), "--no-cache"]) == 0
+    assert output.read_text(encoding="utf-8") == '<span id="ai-recommendation">-</span>'
@@ -0,0 +1,67 @@
+import pytest
+
+import recommendation_cache
+from recommendation_cache import RecommendationCache, normalize_transcript, recommendation_key
+
+TRANSCRIPT = "Exam Title,Exam Number,Date\nAzure Fundamentals,AZ-900,2024-01-02\nAzure Administrator,AZ-104,2024-03-04\n"
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(recommendation_cache.time, "time", lambda: now[0])
+    return now
+
+
+def test_normalize_transcript_ignores_order_whitespace_and_line_endings():
+    reordered = ("Exam Title,Exam Number,Date\r\n\r\n Azure Administrator , AZ-104,2024-03-04\r\n"
+                 "Azure Fundamentals,AZ-900 ,2024-01-02\r\n")
+    assert normalize_transcript(reordered) == normalize_transcript(TRANSCRIPT)
+    assert normalize_transcript(TRANSCRIPT) == [
+        ["Azure Administrator", "AZ-104", "2024-03-04"], ["Azure Fundamentals", "AZ-900", "2024-01-02"]]
+
+
+def test_recommendation_key_depends_only_on_the_inputs():
+    key = recommendation_key(TRANSCRIPT, ["AZ-104", "AZ-305"], "gpt-4o", "prompt")
+    assert recommendation_key(TRANSCRIPT + "\n", [" az-305", "AZ-104", ""], "gpt-4o", "prompt") == key
+    assert recommendation_key(TRANSCRIPT, ["AZ-104"], "gpt-4o", "prompt") != key
+    assert recommendation_key(TRANSCRIPT, ["AZ-104", "AZ-305"], "gpt-4o-mini", "prompt") != key
+    assert recommendation_key(TRANSCRIPT, ["AZ-104", "AZ-305"], "gpt-4o", "other") != key
+
+
+def test_entries_survive_a_save_and_reload(tmp_path, clock):
+    path = str(tmp_path / "cache.json")
+    cache = RecommendationCache(path)
+    cache.put("key", "AZ-305")
+    cache.save()
+    assert RecommendationCache(path).get("key") == "AZ-305"
+    assert RecommendationCache(path).get("other") is None
+
+
+def test_expired_entries_are_misses(tmp_path, clock):
+    cache = RecommendationCache(str(tmp_path / "cache.json"), ttl=60)
+    cache.put("key", "AZ-305")
+    clock[0] += 61
+    assert cache.get("key") is None
+    assert "key" not in cache.entries
+
+
+def test_save_keeps_the_most_recently_used_entries(tmp_path, clock):
+    path = str(tmp_path / "cache.json")
+    cache = RecommendationCache(path, ttl=100, max_entries=2)
+    for key in ("a", "b", "c"):
+        cache.put(key, key.upper())
+        clock[0] += 1
+    cache.put("expired", "X")
+    cache.entries["expired"]["stored_at"] = 0
+    cache.get("a")
+    cache.save()
+    assert set(RecommendationCache(path).entries) == {"a", "c"}
+
+
+def test_corrupt_file_starts_empty(tmp_path):
+    path = tmp_path / "cache.json"
+    path.write_text("[not a dict", encoding="utf-8")
+    assert RecommendationCache(str(path)).entries == {}
+    path.write_text("[]", encoding="utf-8")
+    assert RecommendationCache(str(path)).entries == {}
@@ -0,0 +1,106 @@
+import csv
+import dataclasses
+
+import pytest
+
+from records import BadgeRecord, CredentialRecord, ExamRecord, flatten_value, intern, load_known, load_learner_map
+
+
+def test_intern_keeps_falsy_values():
+    assert intern(0) == "0"
+    assert intern(False) == "False"
+    assert intern(0.0) == "0.0"
+    assert intern(None) == ""
+    assert intern("") == ""
+
+
+def test_intern_shares_equal_strings():
+    first = intern("".join(["AZ-", "104"]))
+    second = intern("".join(["AZ", "-104"]))
+    assert first is second
+
+
+def test_records_from_json_keep_falsy_values():
+    record = ExamRecord.create("Title", 0, None)
+    assert record.row() == ("Title", "0", "")
+
+
+def test_records_are_read_only_mappings():
+    record = ExamRecord.create("Azure Administrator", "AZ-104", "2024-03-04")
+    assert record["Exam Number"] == "AZ-104"
+    assert record.get("Exam Date") == "2024-03-04"
+    assert record.get("Missing") is None
+    assert dict(record) == {"Exam Title": "Azure Administrator", "Exam Number": "AZ-104", "Exam Date": "2024-03-04"}
+    assert len(record) == 3
+    with pytest.raises(KeyError):
+        record["title"]
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        record.number = "AZ-305"
+
+
+def test_row_and_fieldnames_follow_the_csv_columns():
+    assert ExamRecord.fieldnames() == ["Exam Title", "Exam Number", "Exam Date"]
+    assert BadgeRecord.fieldnames() == ["Badge Title", "Issuer", "Badge Date"]
+    assert BadgeRecord.create("Badge", "Microsoft", "2024-01-01").row() == ("Badge", "Microsoft", "2024-01-01")
+
+
+def test_records_work_with_dict_writer(tmp_path):
+    path = tmp_path / "exams.csv"
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=ExamRecord.fieldnames())
+        writer.writeheader()
+        writer.writerow(ExamRecord.create("Title", "AZ-900", "2024-01-01"))
+    assert path.read_text(encoding="utf-8").splitlines() == ["Exam Title,Exam Number,Exam Date",
+                                                             "Title,AZ-900,2024-01-01"]
+
+
+def write_csv(path, rows):
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        csv.writer(f).writerows(rows)
+
+
+def test_load_known_reads_single_and_combined_csvs(tmp_path):
+    single = tmp_path / "single.csv"
+    write_csv(single, [ExamRecord.fieldnames(), ["T", "AZ-900", "2024-01-01"], ["short row"]])
+    assert load_known(str(single), ExamRecord, learner="alice") == {
+        "alice": [ExamRecord("T", "AZ-900", "2024-01-01")]}
+    # A single-learner CSV without a learner to file it under gives nothing
+    assert load_known(str(single), ExamRecord) == {}
+
+    combined = tmp_path / "combined.csv"
+    write_csv(combined, [["Username"] + BadgeRecord.fieldnames(),
+                         ["alice", "B1", "Microsoft", "2024-01-01"],
+                         ["bob", "B2", "GitHub", "2024-02-01"],
+                         ["alice", "B3", "Microsoft", "2024-03-01"]])
+    known = load_known(str(combined), BadgeRecord)
+    assert {learner: [record.title for record in records] for learner, records in known.items()} == {
+        "alice": ["B1", "B3"], "bob": ["B2"]}
+
+
+def test_load_known_ignores_missing_and_foreign_files(tmp_path):
+    assert load_known(str(tmp_path / "missing.csv"), ExamRecord, learner="alice") == {}
+    foreign = tmp_path / "foreign.csv"
+    write_csv(foreign, [BadgeRecord.fieldnames(), ["B", "Microsoft", "2024-01-01"]])
+    assert load_known(str(foreign), ExamRecord, learner="alice") == {}
+
+
+def test_load_learner_map(tmp_path):
+    path = tmp_path / "learners.csv"
+    write_csv(path, [["Share ID", "Username"], [" id1 ", " alice "], ["id2", ""], ["", "carol"]])
+    assert load_learner_map(str(path)) == {"alice": "id1"}
+
+
+def test_flatten_value():
+    assert flatten_value([{"display_name": "Azure"}, {"uid": "u1"}, {"x": 1}, 2]) == 'Azure;u1;{"x": 1};2'
+    assert flatten_value({"a": "é"}) == '{"a": "é"}'
+    assert flatten_value(0) == 0
+    assert flatten_value(None) is None
+
+
+def test_credential_records_share_a_schema():
+    first = CredentialRecord.from_json({"uid": "a", "levels": ["beginner"], "rating": 0})
+    second = CredentialRecord.from_json({"uid": "b", "levels": ["advanced"], "rating": 4})
+    assert first._columns is second._columns
+    assert dict(first) == {"uid": "a", "levels": "beginner", "rating": 0}
+    assert first.get("missing", "-") == "-"
+    assert second["levels"] == "advanced"
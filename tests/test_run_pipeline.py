@@ -0,0 +1,112 @@
+import threading
+
+import pytest
+
+from run_pipeline import Stage, StageFailed, WORKFLOW_OUTPUTS, run_stages, write_workflow_outputs
+
+
+def returning(value):
+    return lambda values: value
+
+
+def raising(error):
+    def run(values):
+        raise error
+    return run
+
+
+def statuses(results):
+    return {name: result.status for name, result in results.items()}
+
+
+def test_stages_receive_the_values_of_their_dependencies():
+    seen = {}
+
+    def consumer(values):
+        seen.update(values)
+        return values["a"] + values["b"]
+
+    results = run_stages([
+        Stage("sum", consumer, after=("a", "b")),
+        Stage("a", returning(1)),
+        Stage("b", returning(2), after=("a",)),
+    ])
+    assert list(results)[-1] == "sum"
+    assert results["sum"].value == 3
+    assert seen == {"a": 1, "b": 2}
+
+
+def test_independent_stages_run_concurrently():
+    barrier = threading.Barrier(2, timeout=5)
+
+    def meet(values):
+        return barrier.wait()
+
+    results = run_stages([Stage("a", meet), Stage("b", meet)], max_workers=2)
+    assert statuses(results) == {"a": "ok", "b": "ok"}
+
+
+def test_a_failure_skips_the_stages_after_it():
+    results = run_stages([
+        Stage("fetch", raising(StageFailed("fetch failed"))),
+        Stage("parse", returning(1), after=("fetch",)),
+        Stage("report", returning(2), after=("parse",)),
+        Stage("other", returning(3)),
+    ])
+    assert statuses(results) == {"fetch": "failed", "parse": "skipped", "report": "skipped", "other": "ok"}
+    assert results["parse"].value is None
+
+
+def test_wait_for_runs_after_a_failure():
+    order = []
+
+    def record(name, error=None):
+        def run(values):
+            order.append(name)
+            if error:
+                raise error
+        return run
+
+    results = run_stages([
+        Stage("summary", record("summary"), wait_for=("fetch",)),
+        Stage("fetch", record("fetch", StageFailed("down"))),
+    ])
+    assert order == ["fetch", "summary"]
+    assert statuses(results) == {"fetch": "failed", "summary": "ok"}
+
+
+@pytest.mark.parametrize("error, message", [
+    (StageFailed("Transcript check failed"), "[fetch] Transcript check failed"),
+    (KeyError("id"), "[fetch] KeyError: 'id'"),
+    (SystemExit(2), "[fetch] exited with status 2"),
+])
+def test_errors_mark_the_stage_failed(error, message, capsys):
+    results = run_stages([Stage("fetch", raising(error)), Stage("next", returning(1), after=("fetch",))])
+    assert statuses(results) == {"fetch": "failed", "next": "skipped"}
+    assert message in capsys.readouterr().err
+
+
+@pytest.mark.parametrize("code", [0, None])
+def test_a_successful_exit_is_ok(code):
+    results = run_stages([Stage("script", raising(SystemExit(code))), Stage("next", returning(1), after=("script",))])
+    assert statuses(results) == {"script": "ok", "next": "ok"}
+
+
+def test_unknown_dependencies_are_rejected():
+    with pytest.raises(ValueError, match="unknown stages: missing"):
+        run_stages([Stage("a", returning(1), wait_for=("missing",))])
+
+
+def test_cycles_are_rejected():
+    with pytest.raises(ValueError, match="cycle: a, b"):
+        run_stages([Stage("a", returning(1), after=("b",)), Stage("b", returning(1), after=("a",)),
+                    Stage("c", returning(1))])
+
+
+def test_workflow_outputs_report_each_known_stage(tmp_path):
+    results = run_stages([Stage("transcript", returning(1)), Stage("credly", raising(StageFailed("x"))),
+                          Stage("extra", returning(1))])
+    path = tmp_path / "outputs"
+    write_workflow_outputs(results, str(path))
+    assert path.read_text(encoding="utf-8").splitlines() == [
+        f"{WORKFLOW_OUTPUTS['transcript']}=true", f"{WORKFLOW_OUTPUTS['credly']}=false"]
@@ -0,0 +1,159 @@
+import argparse
+import threading
+from datetime import date
+
+import pytest
+
+import metrics
+from records import ExamRecord
+from watch_daemon import PollPolicy, Watcher, add_watch_arguments, content_hash, last_activity, policy_from_args
+
+TODAY = date(2025, 6, 1)
+# Poll again right away, so a run of a few polls takes no time
+IMMEDIATE = PollPolicy(min_interval=0.0, max_interval=0.0, backoff=1.0)
+
+AZ_900 = ExamRecord.create("Azure Fundamentals", "AZ-900", "2025-01-01")
+AZ_104 = ExamRecord.create("Azure Administrator", "AZ-104", "2025-05-01")
+
+
+@pytest.fixture(autouse=True)
+def reset_metrics():
+    metrics.registry().reset()
+    yield
+    metrics.registry().reset()
+
+
+def sequence(*results):
+    """Return a fetch function giving ``results`` in turn (raising exceptions), then the last one forever."""
+    calls = []
+
+    def fetch(learner):
+        calls.append(learner)
+        result = results[min(len(calls), len(results)) - 1]
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    return fetch
+
+
+def test_content_hash_ignores_row_order():
+    assert content_hash([("a", "1"), ("b", "2")]) == content_hash([("b", "2"), ("a", "1")])
+    assert content_hash([("a", "1")]) != content_hash([("a", "1"), ("b", "2")])
+
+
+def test_last_activity_is_the_newest_date():
+    assert last_activity([AZ_900, AZ_104, ExamRecord.create("Undated", "X", "")]) == "2025-05-01"
+    assert last_activity([]) is None
+
+
+def test_policy_backs_off_up_to_a_ceiling_that_grows_with_inactivity():
+    policy = PollPolicy(min_interval=60, max_interval=3600, backoff=2)
+    assert policy.ceiling("2025-05-31", TODAY) == 120
+    assert policy.ceiling("2020-01-01", TODAY) == 3600
+    assert policy.ceiling(None, TODAY) == 3600
+    assert policy.ceiling("2025-07-01", TODAY) == 60
+    assert policy.next_interval(60, False, "2025-05-31", TODAY) == 120
+    assert policy.next_interval(120, False, "2025-05-31", TODAY) == 120
+    assert policy.next_interval(1800, True, None, TODAY) == 60
+
+
+def test_only_changed_polls_are_reported():
+    changes = []
+    fetch = sequence([AZ_900], [AZ_900], [AZ_104, AZ_900], [AZ_900, AZ_104])
+    watcher = Watcher(["alice"], fetch, lambda learner, rows: changes.append((learner, rows)), IMMEDIATE)
+    stats = watcher.run(max_polls=4)
+    assert stats == (4, 2, 0)
+    assert changes == [("alice", [AZ_900]), ("alice", [AZ_104, AZ_900])]
+
+
+def test_known_rows_are_not_reported_again():
+    changes = []
+    watcher = Watcher(["alice", "bob"], sequence([AZ_900]), lambda learner, rows: changes.append(learner),
+                      IMMEDIATE, known={"alice": [AZ_900]})
+    assert watcher.run(max_polls=2).changes == 1
+    assert changes == ["bob"]
+
+
+def test_learners_are_polled_concurrently():
+    barrier = threading.Barrier(2, timeout=5)
+
+    def fetch(learner):
+        barrier.wait()
+        return [AZ_900]
+
+    stats = Watcher(["alice", "bob"], fetch, lambda learner, rows: None, IMMEDIATE, concurrency=2).run(max_polls=2)
+    assert stats == (2, 2, 0)
+
+
+def test_a_failing_fetch_keeps_the_interval():
+    policy = PollPolicy(min_interval=0.0, max_interval=10.0, backoff=2.0)
+    watcher = Watcher(["alice"], sequence(RuntimeError("down")), lambda learner, rows: None, policy)
+    watcher.states["alice"].interval = 0.0
+    assert watcher.run(max_polls=3) == (3, 0, 3)
+    assert watcher.states["alice"].interval == 0.0
+    assert metrics.registry().counters["watch_failures"] == 3
+
+
+def test_a_failing_on_change_is_retried_on_the_next_poll(capsys):
+    calls = []
+
+    def on_change(learner, rows):
+        calls.append(learner)
+        if len(calls) == 1:
+            raise OSError("disk full")
+
+    stats = Watcher(["alice"], sequence([AZ_900]), on_change, IMMEDIATE).run(max_polls=3)
+    # The second poll writes the change again, the third finds nothing new
+    assert calls == ["alice", "alice"]
+    assert stats == (3, 2, 1)
+    assert metrics.registry().counters["watch_failures"] == 1
+    assert "writing the change failed: disk full" in capsys.readouterr().err
+
+
+def test_a_failing_flush_is_retried_until_it_succeeds():
+    flushes = []
+
+    def flush():
+        flushes.append(len(flushes))
+        if len(flushes) == 1:
+            raise OSError("disk full")
+
+    fetch = sequence([AZ_900])
+    stats = Watcher(["alice"], fetch, lambda learner, rows: None, IMMEDIATE, flush=flush).run(max_polls=3)
+    # The first poll's change is flushed again after the second poll, then nothing is left to flush
+    assert flushes == [0, 1]
+    assert stats == (3, 1, 1)
+    assert metrics.registry().counters["watch_failures"] == 1
+
+
+def test_stop_ends_the_run():
+    stop = threading.Event()
+
+    def fetch(learner):
+        stop.set()
+        return [AZ_900]
+
+    changes = []
+    stats = Watcher(["alice"], fetch, lambda learner, rows: changes.append(learner), IMMEDIATE).run(stop)
+    assert stats.polls == 1
+    assert changes == ["alice"]
+
+
+def parser():
+    parser = argparse.ArgumentParser()
+    add_watch_arguments(parser)
+    return parser
+
+
+@pytest.mark.parametrize("rpm", ["0", "-5", "fast"])
+def test_rpm_must_be_positive(rpm, capsys):
+    with pytest.raises(SystemExit):
+        parser().parse_args(["--rpm", rpm])
+    assert "--rpm" in capsys.readouterr().err
+
+
+def test_policy_from_args_keeps_the_intervals_consistent():
+    args = parser().parse_args(["--min-interval", "600", "--max-interval", "60", "--backoff", "0.5", "--rpm", "1.5"])
+    assert args.rpm == 1.5
+    assert policy_from_args(args) == PollPolicy(600, 600, 1.0)
@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+"""
+Long-running watch mode for ``passed_exams.py`` and ``fetch_credly_badges.py``.
+
+The daily workflow re-fetches every profile at midnight whether or not it
+changed, so a new pass takes up to a day to show up.  With ``--watch`` the
+fetchers instead keep running and poll each learner on its own schedule:
+
+- **adaptive intervals**: a learner is polled again ``--min-interval`` after
+  a change; every unchanged poll multiplies the interval by ``--backoff``, up
+  to a ceiling that grows with the days since the learner's newest exam or
+  badge (``min_interval * (1 + quiet days)``, at most ``--max-interval``), so
+  recently active profiles stay on a short interval and dormant ones drift
+  to one poll a day.  Intervals get +/-10% jitter so learners added together
+  do not stay in lockstep.
+- **global rate budget**: every request of the daemon, across all learners
+  and worker threads, waits for an ``http_client.RateLimiter`` slot, so load
+  is spread evenly at ``--rpm`` requests per minute instead of bursting
+- **warm connections**: one pooled session is kept for the daemon's lifetime
+- **regeneration on change only**: the rows of each poll are hashed, and CSVs,
+  the history store and the dashboard (``--refresh-dashboard``) are only
+  written for learners whose hash changed.  The hashes are seeded from the
+  existing CSVs, so a restart does not rewrite anything either.
+
+    python passed_exams.py <share_id> --output passed_exams.csv --watch --refresh-dashboard
+    python passed_exams.py --bulk share_ids.txt --output-dir transcripts --watch --rpm 60
+    python fetch_credly_badges.py alice bob --output credly_badges.csv --watch
+
+The daemon stops on SIGINT or SIGTERM after the polls in flight.
+"""
+import argparse
+import hashlib
+import heapq
+import random
+import signal
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from datetime import date
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+from http_client import HTTPClient, RateLimiter, create_session, positive_float
+from metrics import count
+from records import CSVRecord
+
+DEFAULT_MIN_INTERVAL = 15 * 60.0
+DEFAULT_MAX_INTERVAL = 24 * 3600.0
+DEFAULT_BACKOFF = 2.0
+DEFAULT_RPM = 30.0
+JITTER = 0.1
+# Longest wait before a stop request is noticed
+TICK = 1.0
+
+
+def content_hash(rows: Iterable[Sequence[str]]) -> str:
+    """Return a hash of the rows' values that does not depend on their order."""
+    digest = hashlib.sha1()
+    for row in sorted("\x1f".join(row) for row in rows):
+        digest.update(row.encode("utf-8"))
+        digest.update(b"\x1e")
+    return digest.hexdigest()
+
+
+def last_activity(rows: Iterable[CSVRecord]) -> Optional[str]:
+    """Return the newest ``date`` of the rows, or None when none is dated."""
+    return max((row.date for row in rows if row.date), default=None)
+
+
+class PollPolicy(NamedTuple):
+    """How often a learner is polled; see the module docstring."""
+    min_interval: float = DEFAULT_MIN_INTERVAL
+    max_interval: float = DEFAULT_MAX_INTERVAL
+    backoff: float = DEFAULT_BACKOFF
+
+    def ceiling(self, activity: Optional[str], today: date) -> float:
+        """Return the longest interval for a learner whose newest exam or badge is dated ``activity``."""
+        try:
+            quiet_days = (today - date.fromisoformat(activity[:10])).days
+        except (TypeError, ValueError):
+            return self.max_interval
+        return min(self.max_interval, self.min_interval * (1 + max(0, quiet_days)))
+
+    def next_interval(self, interval: float, changed: bool, activity: Optional[str], today: date) -> float:
+        """Return the interval before the next poll of a learner that was just polled."""
+        if changed:
+            return self.min_interval
+        return max(self.min_interval, min(self.ceiling(activity, today), interval * self.backoff))
+
+
+class LearnerState:
+    """Schedule and last seen content of one watched learner."""
+    __slots__ = ("learner", "interval", "content_hash", "activity")
+
+    def __init__(self, learner: str, interval: float, content_hash: Optional[str] = None,
+                 activity: Optional[str] = None) -> None:
+        self.learner = learner
+        self.interval = interval
+        self.content_hash = content_hash
+        self.activity = activity
+
+
+class WatchStats(NamedTuple):
+    polls: int
+    changes: int
+    failures: int
+
+
+class Watcher:
+    """Polls learners on adaptive schedules and reports the ones whose rows changed.
+
+    ``fetch`` runs on ``concurrency`` worker threads and returns a learner's
+    rows; ``on_change`` and ``flush`` run on the thread calling :meth:`run`,
+    so they can use non-thread-safe resources such as a ``HistoryStore``.
+    """
+
+    def __init__(self, learners: Iterable[str], fetch: Callable[[str], List[CSVRecord]],
+                 on_change: Callable[[str, List[CSVRecord]], None], policy: PollPolicy = PollPolicy(),
+                 concurrency: int = 4, known: Optional[Dict[str, List[CSVRecord]]] = None,
+                 flush: Optional[Callable[[], None]] = None) -> None:
+        """Create a watcher.
+
+        :param learners: Learners to poll; all are polled once right away
+        :param fetch: Returns the current rows of a learner; exceptions count as failed polls
+        :param on_change: Called with a learner's rows when they differ from the previous poll
+        :param policy: Interval policy
+        :param concurrency: Maximum polls in flight
+        :param known: Rows already on disk per learner, so unchanged learners are not reported
+        :param flush: Called after each batch of ``on_change`` calls, e.g. to write a combined CSV
+        """
+        self.fetch = fetch
+        self.on_change = on_change
+        self.policy = policy
+        self.concurrency = max(1, concurrency)
+        self.flush = flush
+        known = known or {}
+        today = date.today()
+        self.states: Dict[str, LearnerState] = {}
+        for learner in dict.fromkeys(learners):
+            rows = known.get(learner)
+            if rows is None:
+                self.states[learner] = LearnerState(learner, policy.min_interval)
+            else:
+                activity = last_activity(rows)
+                self.states[learner] = LearnerState(learner, policy.ceiling(activity, today),
+                                                    content_hash(row.row() for row in rows), activity)
+
+    def _jittered(self, interval: float) -> float:
+        return interval * random.uniform(1 - JITTER, 1 + JITTER)
+
+    def _finish(self, state: LearnerState, future: Future) -> Tuple[bool, bool]:
+        """Record the outcome of one poll and return whether the learner changed and whether it failed."""
+        count("watch_polls")
+        try:
+            rows = future.result()
+        except Exception as e:  # noqa: BLE001 - one failing learner must not stop the daemon
+            count("watch_failures")
+            print(f"[{state.learner}] poll failed: {e}", file=sys.stderr, flush=True)
+            # Try again on the same interval rather than backing off further
+            return False, True
+        digest = content_hash(row.row() for row in rows)
+        changed = digest != state.content_hash
+        state.activity = last_activity(rows) or state.activity
+        state.interval = self.policy.next_interval(state.interval, changed, state.activity, date.today())
+        if not changed:
+            return False, False
+        count("watch_changes")
+        try:
+            self.on_change(state.learner, rows)
+        except Exception as e:  # noqa: BLE001 - a failed write must not stop the daemon either
+            count("watch_failures")
+            print(f"[{state.learner}] writing the change failed: {e}", file=sys.stderr, flush=True)
+            # Keep the old hash so the next poll (after min_interval) writes the change again
+            return True, True
+        state.content_hash = digest
+        return True, False
+
+    def _flush(self) -> bool:
+        """Call ``flush`` and return whether it succeeded."""
+        try:
+            self.flush()
+        except Exception as e:  # noqa: BLE001
+            count("watch_failures")
+            print(f"Writing the changes failed: {e}", file=sys.stderr, flush=True)
+            return False
+        return True
+
+    def run(self, stop: Optional[threading.Event] = None, max_polls: Optional[int] = None) -> WatchStats:
+        """Poll until ``stop`` is set (or ``max_polls`` polls have finished) and return the totals."""
+        stop = stop or threading.Event()
+        now = time.monotonic()
+        due: List[Tuple[float, str]] = [(now, learner) for learner in self.states]
+        heapq.heapify(due)
+        started = polls = changes = failures = 0
+        running: Dict[Future, LearnerState] = {}
+        # Set while changes are waiting for a successful flush
+        unflushed = False
+
+        def finish(futures: Iterable[Future], reschedule: bool) -> None:
+            nonlocal polls, changes, failures, unflushed
+            for future in futures:
+                state = running.pop(future)
+                polls += 1
+                changed, failed = self._finish(state, future)
+                changes += changed
+                failures += failed
+                unflushed = unflushed or changed
+                if reschedule:
+                    heapq.heappush(due, (time.monotonic() + self._jittered(state.interval), state.learner))
+            if unflushed and self.flush is not None:
+                unflushed = not self._flush()
+                failures += unflushed
+
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            while not stop.is_set() and (max_polls is None or polls < max_polls):
+                now = time.monotonic()
+                while (due and due[0][0] <= now and len(running) < self.concurrency
+                       and (max_polls is None or started < max_polls)):
+                    _, learner = heapq.heappop(due)
+                    running[pool.submit(self.fetch, learner)] = self.states[learner]
+                    started += 1
+                timeout = TICK
+                if due and len(running) < self.concurrency:
+                    timeout = min(TICK, max(0.0, due[0][0] - now))
+                if running:
+                    done, _ = wait(running, timeout=timeout, return_when=FIRST_COMPLETED)
+                    finish(done, reschedule=True)
+                else:
+                    stop.wait(timeout)
+            # Let the polls in flight finish so their learners are written
+            finish(list(running), reschedule=False)
+        return WatchStats(polls, changes, failures)
+
+
+def refresh_dashboard(exams_path: str = "passed_exams.csv", badges_path: str = "credly_badges.csv",
+                      recommend: bool = False) -> None:
+    """Rebuild what the dashboard shows after a change: the AI recommendation (if asked) and timeline.json."""
+    # Imported here so fetchers that never refresh the dashboard do not load the recommender
+    import ai_exam_recommender
+    import build_timeline_data
+
+    # The recommender raises (missing GITHUB_TOKEN, API errors, missing priority list) as well as
+    # returning non-zero; neither may stop the daemon
+    if recommend:
+        try:
+            if ai_exam_recommender.main(["--transcript", exams_path]) != 0:
+                raise RuntimeError("non-zero exit status")
+        except Exception as e:  # noqa: BLE001
+            count("watch_failures")
+            print(f"AI recommendation failed, keeping the previous one: {e!r}", file=sys.stderr, flush=True)
+    try:
+        if build_timeline_data.main(["--exams", exams_path, "--badges", badges_path]) != 0:
+            raise RuntimeError("non-zero exit status")
+    except Exception as e:  # noqa: BLE001
+        count("watch_failures")
+        print(f"Timeline data build failed: {e!r}", file=sys.stderr, flush=True)
+
+
+def add_watch_arguments(parser: argparse.ArgumentParser) -> None:
+    """Add the shared ``--watch`` command line options to ``parser``."""
+    group = parser.add_argument_group("watch", "Keep running and poll adaptively (see watch_daemon.py)")
+    group.add_argument("--watch", action="store_true", help="Poll the learners until interrupted")
+    group.add_argument("--min-interval", type=float, default=DEFAULT_MIN_INTERVAL, metavar="SECONDS",
+                       help=f"Interval after a change (default: {DEFAULT_MIN_INTERVAL:g})")
+    group.add_argument("--max-interval", type=float, default=DEFAULT_MAX_INTERVAL, metavar="SECONDS",
+                       help=f"Interval for dormant learners (default: {DEFAULT_MAX_INTERVAL:g})")
+    group.add_argument("--backoff", type=float, default=DEFAULT_BACKOFF,
+                       help=f"Interval factor after an unchanged poll (default: {DEFAULT_BACKOFF:g})")
+    group.add_argument("--rpm", type=positive_float, default=DEFAULT_RPM,
+                       help=f"Requests-per-minute budget shared by all learners (default: {DEFAULT_RPM:g})")
+    group.add_argument("--refresh-dashboard", action="store_true",
+                       help="Rebuild timeline.json (and the AI recommendation for transcripts) after a change")
+
+
+def policy_from_args(args: argparse.Namespace) -> PollPolicy:
+    """Return the poll policy of the options added by :func:`add_watch_arguments`."""
+    return PollPolicy(args.min_interval, max(args.min_interval, args.max_interval), max(1.0, args.backoff))
+
+
+def watch_session(args: argparse.Namespace, pool_size: int) -> HTTPClient:
+    """Return a pooled session whose requests share the ``--rpm`` budget."""
+    session = create_session(pool_size)
+    session.rate_limiter = RateLimiter(args.rpm / 60)
+    return session
+
+
+def run_daemon(watcher: Watcher) -> WatchStats:
+    """Run ``watcher`` until SIGINT or SIGTERM and print the totals."""
+    stop = threading.Event()
+    previous = {signum: signal.signal(signum, lambda *_: stop.set()) for signum in (signal.SIGINT, signal.SIGTERM)}
+    print(f"Watching {len(watcher.states)} learners; stop with Ctrl+C", flush=True)
+    try:
+        stats = watcher.run(stop)
+    finally:
+        for signum, handler in previous.items():
+            signal.signal(signum, handler)
+    print(f"Stopped after {stats.polls} polls: {stats.changes} changed, {stats.failures} failed", flush=True)
+    return stats